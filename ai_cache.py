@@ -0,0 +1,250 @@
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Dict, Optional
+
+import logic
+from models import wall_clock
+from storage import get_connection
+
+# Сколько ответов держать в памяти и сколько секунд ответ считается свежим
+CACHE_MAX_ENTRIES = 5000
+CACHE_TTL = 7 * 24 * 3600
+# Как часто удалять просроченные записи из таблицы
+PURGE_INTERVAL = 3600
+
+MONTHS_GENITIVE = [
+    'января', 'февраля', 'марта', 'апреля', 'мая', 'июня',
+    'июля', 'августа', 'сентября', 'октября', 'ноября', 'декабря'
+]
+
+# Абсолютные даты в ответе ИИ: 19.10, 19.10.2026, 2026-10-19, 19 октября
+ABSOLUTE_DATE_RE = re.compile(
+    r'\b(\d{4})-(\d{2})-(\d{2})\b'
+    r'|\b(\d{1,2})\.(\d{1,2})(?:\.(\d{4}))?\b'
+    r'|\b(\d{1,2}) (' + '|'.join(MONTHS_GENITIVE) + r')\b'
+)
+
+# Слова, привязывающие смысл к календарю ("к пятнице", "до конца месяца"):
+# сдвиг даты на тот же интервал для них неверен, такие ответы не кэшируются
+CALENDAR_ANCHORED_RE = re.compile(
+    r'понедельник|вторник|сред|четверг|пятниц|суббот|воскресень|выходн|'
+    r'месяц|недел|конц|числ|январ|феврал|март|апрел|ма[йя]|июн|июл|август|сентябр|октябр|ноябр|декабр'
+)
+
+# Время, отсчитанное от момента сообщения ("через полтора часа", "спустя
+# 20 минут"): ответ ИИ - конкретные часы, которые в другое время неверны,
+# поэтому такие ответы не кэшируются
+NOW_RELATIVE_RE = re.compile(r'\b(?:через|спустя|сейчас|скоро|попозже|позже|полчаса)\b')
+
+DATE_PLACEHOLDER = '{date}'
+
+
+def normalize_text(text: str) -> str:
+    """Ключ кэша: нижний регистр, без пунктуации и лишних пробелов"""
+    text = text.lower().replace('ё', 'е')
+    text = re.sub(r'[^\w:.\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip(' .')
+
+
+def _parse_absolute_date(match, today: date) -> Optional[date]:
+    try:
+        if match.group(1):
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        if match.group(4):
+            year = int(match.group(6)) if match.group(6) else today.year
+            return date(year, int(match.group(5)), int(match.group(4)))
+        return date(today.year, MONTHS_GENITIVE.index(match.group(8)) + 1, int(match.group(7)))
+    except ValueError:
+        return None
+
+
+def _format_date(date_format: str, value: date) -> str:
+    """Форматирует дату так же, как она была записана в исходном ответе"""
+    if date_format == 'iso':
+        return value.strftime('%Y-%m-%d')
+    if date_format == 'dotted_year':
+        return value.strftime('%d.%m.%Y')
+    if date_format == 'dotted':
+        return value.strftime('%d.%m')
+    return f"{value.day} {MONTHS_GENITIVE[value.month - 1]}"
+
+
+def to_relative(text: str, time_text: str, today: date):
+    """
+    Переводит время из ответа ИИ в относительную форму
+
+    Returns:
+        (шаблон, формат_даты, сдвиг_в_днях) или None, если ответ нельзя
+        безопасно переиспользовать в другой день или час
+    """
+    if NOW_RELATIVE_RE.search(text):
+        return None
+    matches = list(ABSOLUTE_DATE_RE.finditer(time_text))
+    if not matches:
+        return time_text, None, 0
+    if len(matches) > 1 or CALENDAR_ANCHORED_RE.search(text):
+        return None
+
+    match = matches[0]
+    value = _parse_absolute_date(match, today)
+    if value is None:
+        return None
+
+    if match.group(1):
+        date_format = 'iso'
+    elif match.group(4):
+        date_format = 'dotted_year' if match.group(6) else 'dotted'
+    else:
+        date_format = 'month_name'
+
+    template = time_text[:match.start()] + DATE_PLACEHOLDER + time_text[match.end():]
+    return template, date_format, (value - today).days
+
+
+def from_relative(template: str, date_format: Optional[str], offset: int, today: date) -> str:
+    """Восстанавливает время из относительной формы для текущей даты"""
+    if date_format is None:
+        return template
+    return template.replace(DATE_PLACEHOLDER, _format_date(date_format, today + timedelta(days=offset)))
+
+
+class ResponseCache:
+    """
+    Кэш ответов ИИ по нормализованному тексту
+
+    Горячие записи лежат в LRU в памяти, все записи - в таблице ai_cache,
+    поэтому кэш переживает перезапуск. Даты хранятся как сдвиг в днях от
+    дня запроса, чтобы "завтра (19.10)" завтра превратилось в "(20.10)".
+    День запроса берется по часам пользователя (его часовому поясу).
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: int = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.ai_calls = 0
+        self.ai_seconds = 0.0
+
+    def _connect(self):
+        return get_connection(logic.DB_PATH)
+
+    def _remember(self, key: str, entry):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, text: str, timezone: str = None) -> Optional[Dict[str, Any]]:
+        """Возвращает результат в формате process_natural_language или None; даты - от сегодня в поясе timezone"""
+        key = normalize_text(text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[5] + self.ttl > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                else:
+                    del self._memory[key]
+                    entry = None
+
+        if entry is None:
+            try:
+                entry = self._connect().execute(
+                    "SELECT description, time_template, date_format, day_offset, explanation, created_at "
+                    "FROM ai_cache WHERE key = ? AND created_at > ?",
+                    (key, int(now - self.ttl))
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"❌ Ошибка чтения кэша ИИ: {e}")
+                entry = None
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                return None
+            self._remember(key, entry)
+            with self._lock:
+                self.disk_hits += 1
+
+        description, template, date_format, offset, explanation, _ = entry
+        return {
+            'success': True,
+            'description': description,
+            'time': from_relative(template, date_format, offset, wall_clock(timezone).date()),
+            'explanation': explanation,
+            'source': 'cache'
+        }
+
+    def put(self, text: str, result: Dict[str, Any], timezone: str = None) -> bool:
+        """Сохраняет успешный ответ ИИ для пользователя из пояса timezone; возвращает False, если он не кэшируется"""
+        relative = to_relative(text.lower(), result['time'], wall_clock(timezone).date())
+        if relative is None:
+            return False
+
+        key = normalize_text(text)
+        template, date_format, offset = relative
+        now = int(time.time())
+        entry = (result['description'], template, date_format, offset, result.get('explanation', ''), now)
+        self._remember(key, entry)
+
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO ai_cache "
+                    "(key, description, time_template, date_format, day_offset, explanation, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key,) + entry
+                )
+                with self._lock:
+                    # Проверка и отметка под блокировкой: очистку запускает только один поток
+                    purge = now - self._last_purge > PURGE_INTERVAL
+                    if purge:
+                        self._last_purge = now
+                if purge:
+                    conn.execute("DELETE FROM ai_cache WHERE created_at <= ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка записи кэша ИИ: {e}")
+        return True
+
+    def record_ai_call(self, seconds: float):
+        """Учитывает длительность запроса к ИИ для оценки сэкономленного времени"""
+        with self._lock:
+            self.ai_calls += 1
+            self.ai_seconds += seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша: попадания, промахи и сэкономленное время"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            average_ai_latency = self.ai_seconds / self.ai_calls if self.ai_calls else 0.0
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'average_ai_latency': average_ai_latency,
+                'latency_saved': hits * average_ai_latency
+            }
+
+
+response_cache = ResponseCache()
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Статистика кэша ответов ИИ"""
+    return response_cache.get_stats()
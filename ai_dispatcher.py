@@ -0,0 +1,238 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Dict, List, Optional
+
+import ai_logic
+from ai_cache import response_cache
+from ai_usage import record_usage
+from metrics import observe, increment, OPENAI_REQUEST_SECONDS, AI_FAILURES
+
+# Сколько секунд ждать попутчиков для пакета после первого сообщения
+AI_BATCH_WINDOW = 0.05
+# Сколько запросов к OpenAI может выполняться одновременно
+AI_MAX_IN_FLIGHT = 4
+# При такой длине очереди новые сообщения сразу разбираются базовым анализатором
+AI_MAX_QUEUE = 200
+# Повторы при 429 от OpenAI: 0.5 с, 1 с, 2 с (+ случайная добавка)
+AI_MAX_RETRIES = 3
+AI_RETRY_BACKOFF = 0.5
+
+
+class _Pending:
+    __slots__ = ('text', 'user_id', 'timezone', 'future')
+
+    def __init__(self, text: str, user_id: int = None, timezone: str = None):
+        self.text = text
+        self.user_id = user_id
+        self.timezone = timezone
+        self.future = Future()
+
+
+class ExtractionDispatcher:
+    """
+    Диспетчер запросов к ИИ с пакетированием и ограничением нагрузки
+
+    Сообщения, пришедшие в течение AI_BATCH_WINDOW, отправляются одним
+    пакетным запросом (build_batch_request). Одновременно выполняется не
+    больше AI_MAX_IN_FLIGHT запросов; пока все заняты, очередь копится и
+    следующий пакет получается крупнее. В пакет попадают сообщения одного
+    часового пояса: запрос сообщает ИИ текущее время на часах пользователя.
+    На 429 запрос повторяется с
+    экспоненциальной задержкой, а при слишком длинной очереди сообщения
+    разбираются fallback_parsing без ожидания.
+    """
+
+    def __init__(self, window: float = AI_BATCH_WINDOW, max_batch: int = ai_logic.AI_BATCH_SIZE,
+                 max_in_flight: int = AI_MAX_IN_FLIGHT, max_queue: int = AI_MAX_QUEUE,
+                 max_retries: int = AI_MAX_RETRIES, backoff: float = AI_RETRY_BACKOFF):
+        self.window = window
+        self.max_batch = max_batch
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = None
+        self._thread = None
+        self._running = False
+        self.stats = {'requests': 0, 'items': 0, 'retries': 0, 'shed': 0, 'errors': 0}
+
+    def start(self):
+        """Запускает поток, собирающий пакеты"""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="ai")
+        self._thread = threading.Thread(target=self._run, name="ai-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает диспетчер; оставшиеся в очереди сообщения получают fallback"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        with self._cond:
+            pending, self._queue = list(self._queue), deque()
+        for item in pending:
+            if item.future.set_running_or_notify_cancel():
+                item.future.set_result(ai_logic.fallback_parsing(item.text))
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queue)
+
+    def submit(self, text: str, user_id: int = None, timezone: str = None) -> Future:
+        """Ставит сообщение в очередь; Future вернет результат в формате process_natural_language"""
+        item = _Pending(text, user_id, timezone)
+        with self._cond:
+            if self._running and len(self._queue) < self.max_queue:
+                self._queue.append(item)
+                self._cond.notify()
+                return item.future
+            self.stats['shed'] += 1
+
+        item.future.set_running_or_notify_cancel()
+        item.future.set_result(ai_logic.fallback_parsing(text))
+        return item.future
+
+    def extract(self, text: str, timeout: float = ai_logic.AI_RESPONSE_TIMEOUT,
+                user_id: int = None, timezone: str = None) -> Dict[str, Any]:
+        """Блокирующий вызов: ответ ИИ или fallback, если ответа нет дольше timeout"""
+        future = self.submit(text, user_id, timezone)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            return ai_logic.fallback_parsing(text)
+
+    def _next_batch(self) -> Optional[List[_Pending]]:
+        """Ждет первое сообщение и добирает пакет в течение окна; None при остановке"""
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait()
+            if not self._running:
+                return None
+            deadline = time.monotonic() + self.window
+            while self._running and len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+        # Свободного слота ждем вне блокировки: пока ждем, очередь растет
+        self._slots.acquire()
+        with self._cond:
+            batch = self._take_batch()
+        # Сообщения, которые уже перестали ждать (таймаут), не отправляем
+        return [item for item in batch if item.future.set_running_or_notify_cancel()]
+
+    def _take_batch(self) -> List[_Pending]:
+        """Забирает из очереди до max_batch сообщений того же пояса, что и первое; вызывается под блокировкой"""
+        batch, others = [], []
+        timezone = self._queue[0].timezone if self._queue else None
+        while self._queue and len(batch) < self.max_batch:
+            item = self._queue.popleft()
+            (batch if item.timezone == timezone else others).append(item)
+        # Сообщения других поясов остаются в начале очереди в прежнем порядке
+        self._queue.extendleft(reversed(others))
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            if not batch:
+                self._slots.release()
+                continue
+            self._executor.submit(self._process, batch)
+
+    def _process(self, batch: List[_Pending]):
+        texts = [item.text for item in batch]
+        try:
+            results = self._request(texts, [item.user_id for item in batch], batch[0].timezone)
+        except Exception as e:
+            print(f"❌ Ошибка ИИ обработки пакета: {e}")
+            increment(AI_FAILURES)
+            with self._cond:
+                self.stats['errors'] += 1
+            results = [ai_logic.fallback_parsing(text) for text in texts]
+        finally:
+            self._slots.release()
+
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+        for item, result in zip(batch, results):
+            if result.get('source') == 'ai':
+                response_cache.put(item.text, result, item.timezone)
+
+    def _request(self, texts: List[str], user_ids: List[int], timezone: str = None) -> List[Dict[str, Any]]:
+        """Один запрос к OpenAI с повторами при превышении лимитов; расход делится между user_ids"""
+        if len(texts) == 1:
+            request = ai_logic.build_request(texts[0], timezone)
+        else:
+            request = ai_logic.build_batch_request(texts, timezone)
+        # Повторами управляет диспетчер, а не клиент. openai уже загружен
+        # get_client(), поэтому импорт здесь ничего не стоит
+        import openai
+        client = ai_logic.get_client().with_options(max_retries=0)
+
+        for attempt in range(self.max_retries + 1):
+            try:
+                started = time.perf_counter()
+                response = client.chat.completions.create(**request)
+                elapsed = time.perf_counter() - started
+                response_cache.record_ai_call(elapsed / len(texts))
+                observe(OPENAI_REQUEST_SECONDS, "single" if len(texts) == 1 else "batch", elapsed)
+                record_usage(request['model'], "single" if len(texts) == 1 else "batch",
+                             response.usage, elapsed, user_ids)
+                break
+            except openai.RateLimitError as e:
+                if attempt == self.max_retries:
+                    raise
+                with self._cond:
+                    self.stats['retries'] += 1
+                time.sleep(self._retry_delay(e, attempt))
+
+        with self._cond:
+            self.stats['requests'] += 1
+            self.stats['items'] += len(texts)
+
+        content = response.choices[0].message.content
+        if len(texts) == 1:
+            return [ai_logic.parse_ai_response(texts[0], content)]
+        return ai_logic.parse_batch_response(texts, content)
+
+    def _retry_delay(self, error: 'openai.RateLimitError', attempt: int) -> float:
+        """Задержка перед повтором: Retry-After из ответа или экспонента со случайной добавкой"""
+        try:
+            return float(error.response.headers.get('retry-after'))
+        except (AttributeError, TypeError, ValueError):
+            delay = self.backoff * 2 ** attempt
+            return delay + random.uniform(0, delay / 2)
+
+
+def start_dispatcher(**kwargs) -> ExtractionDispatcher:
+    """Запускает диспетчер и направляет через него запросы process_natural_language"""
+    dispatcher = ExtractionDispatcher(**kwargs)
+    dispatcher.start()
+    ai_logic.dispatcher = dispatcher
+    return dispatcher
+
+
+def stop_dispatcher():
+    """Возвращает прямые запросы к ИИ и останавливает диспетчер"""
+    dispatcher, ai_logic.dispatcher = ai_logic.dispatcher, None
+    if dispatcher is not None:
+        dispatcher.stop()
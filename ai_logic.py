@@ -1,246 +1,525 @@
-import openai
+import asyncio
 import json
-import re
-from datetime import datetime, timedelta
-from typing import Dict, Any
-
-# Глобальная переменная для клиента OpenAI
+import os
+import threading
+import time as time_module
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from time_parser import parse_task, local_timezone_name, fallback_parser, FAST_PATH_CONFIDENCE
+from models import Task, wall_clock, to_epoch, WEEKDAYS_SHORT
+from ai_cache import response_cache
+from ai_usage import record_usage
+from metrics import observe, increment, OPENAI_REQUEST_SECONDS, AI_FAILURES, FALLBACK_PARSES, AI_RATE_LIMITED
+from rate_limit import UserRateLimiter
+
+# Глобальный клиент OpenAI. Пакет openai тяжелый (~0.5 с на импорт), поэтому
+# он загружается и клиент создается при первом запросе к ИИ (get_client), а
+# setup_ai только запоминает ключ и адрес
 client = None
+_api_key = None
+_base_url = None
+_client_lock = threading.Lock()
+# Диспетчер пакетных запросов (ai_dispatcher.start_dispatcher); без него запросы идут напрямую
+dispatcher = None
+# Лимит запросов к ИИ на пользователя (setup_rate_limit); без него лимита нет
+limiter = None
+
+# Пакетная обработка: сообщений в одном запросе и параллельных запросов
+AI_BATCH_SIZE = 20
+AI_BATCH_WORKERS = 4
+# Сколько ждать ответа через диспетчер, прежде чем вернуть результат базового анализатора
+AI_RESPONSE_TIMEOUT = 20.0
+
+# Основная модель и более дешевая для простых сообщений (пустая строка - всегда основная)
+AI_MODEL = os.getenv("AI_MODEL", "gpt-4.1")
+AI_SMALL_MODEL = os.getenv("AI_SMALL_MODEL", "gpt-4.1-mini")
+# Сообщение не длиннее стольких символов и в одну строку считается простым
+AI_SIMPLE_TEXT_LENGTH = 120
+# Лимит токенов ответа на одну задачу
+AI_MAX_TOKENS = 120
+# Ответ по JSON-схеме (response_format); 0 - для совместимых API без его поддержки
+AI_STRUCTURED_OUTPUT = os.getenv("AI_STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no")
+
+# Системный промпт не содержит ничего меняющегося (дата идет отдельным
+# сообщением после него), поэтому одинаков у всех запросов
+SYSTEM_PROMPT = (
+    "Извлеки задачу из сообщения на русском. description - что сделать, без слов о времени. "
+    "time - время словами пользователя (\"завтра в 14:00\", \"вечером\", \"к пятнице\"), "
+    "дату пиши как ДД.ММ, без времени - \"не указано\". explanation - не больше 10 слов. "
+    "Если задачи нет, success=false и причина в explanation. "
+    "Ответ - только JSON {\"success\", \"description\", \"time\", \"explanation\"}."
+)
+BATCH_PROMPT = (
+    "Вход - JSON-массив [{\"id\": N, \"text\": \"...\"}]. Разбери каждый text по тем же правилам и верни "
+    "{\"tasks\": [{\"id\": N, \"success\", \"description\", \"time\", \"explanation\"}]} для каждого id."
+)
+_TASK_PROPERTIES = {
+    'success': {'type': 'boolean'},
+    'description': {'type': 'string'},
+    'time': {'type': 'string'},
+    'explanation': {'type': 'string'},
+}
+TASK_SCHEMA = {
+    'type': 'object',
+    'properties': _TASK_PROPERTIES,
+    'required': list(_TASK_PROPERTIES),
+    'additionalProperties': False
+}
+BATCH_SCHEMA = {
+    'type': 'object',
+    'properties': {'tasks': {'type': 'array', 'items': {
+        'type': 'object',
+        'properties': {'id': {'type': 'integer'}, **_TASK_PROPERTIES},
+        'required': ['id', *_TASK_PROPERTIES],
+        'additionalProperties': False
+    }}},
+    'required': ['tasks'],
+    'additionalProperties': False
+}
+
+
+def setup_ai(api_key: str, base_url: str = None):
+    """
+    Настройка OpenAI: ключ и адрес API
+
+    Клиент создается при первом запросе к ИИ. Без ключа бот работает:
+    задачи разбираются локальным и базовым анализатором.
+    """
+    global client, _api_key, _base_url
+    with _client_lock:
+        _api_key, _base_url = api_key, base_url
+        client = None
+    if not api_key:
+        print("⚠️ OPENAI_API_KEY не найден в переменных окружения: задачи разбираются без ИИ")
+        return
+    print("✅ ИИ клиент настроен (подключение при первом запросе)")
 
 
-def setup_ai(api_key: str):
-    """Инициализация OpenAI клиента"""
+def get_client():
+    """OpenAI клиент; при первом вызове загружает openai. None, если ключ не задан"""
     global client
-    if not api_key:
-        raise ValueError("OPENAI_API_KEY не найден в переменных окружения")
+    if client is None and _api_key:
+        with _client_lock:
+            if client is None and _api_key:
+                import openai
+                client = openai.OpenAI(api_key=_api_key, base_url=_base_url)
+    return client
 
-    client = openai.OpenAI(api_key=api_key)
-    print("✅ ИИ клиент инициализирован успешно")
 
+def setup_rate_limit(tier_of=None, tiers: dict = None) -> UserRateLimiter:
+    """
+    Включает лимит запросов к ИИ на пользователя
 
-def process_natural_language(text: str) -> Dict[str, Any]:
+    Args:
+        tier_of: Функция tier_of(user_id) -> тариф из USER_RATE_TIERS
+        tiers: Свои тарифы вместо USER_RATE_TIERS
     """
-    Обрабатывает текст на естественном языке и извлекает задачу
+    global limiter
+    limiter = UserRateLimiter(tier_of, tiers)
+    return limiter
+
+
+def ai_allowed(user_id: int) -> bool:
+    """Можно ли сейчас обратиться к ИИ от имени пользователя (списывает токен лимита)"""
+    if limiter is None or user_id is None or limiter.allow(user_id):
+        return True
+    increment(AI_RATE_LIMITED)
+    return False
+
+
+def limited_parsing(text: str) -> Dict[str, Any]:
+    """Разбор без ИИ для пользователя, исчерпавшего лимит: сообщение не теряется"""
+    return {**fallback_parsing(text), 'explanation': 'Много сообщений подряд - разобрано без ИИ'}
+
+
+def choose_model(texts: List[str]) -> str:
+    """Модель для запроса: простые сообщения (короткие, в одну строку) отдаем меньшей модели"""
+    if AI_SMALL_MODEL and all(len(text) <= AI_SIMPLE_TEXT_LENGTH and '\n' not in text for text in texts):
+        return AI_SMALL_MODEL
+    return AI_MODEL
+
+
+def _now_message(timezone: str = None) -> Dict[str, str]:
+    """Текущее время на часах пользователя: от него ИИ считает "завтра", "через час" и т.п."""
+    now = wall_clock(timezone)
+    return {"role": "system", "content": f"Сейчас: {WEEKDAYS_SHORT[now.weekday()]} {now:%d.%m.%Y %H:%M}"}
+
+
+def _response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'json_schema', 'json_schema': {'name': name, 'strict': True, 'schema': schema}}
+
+
+def build_request(text: str, timezone: str = None) -> Dict[str, Any]:
+    """
+    Собирает параметры запроса к OpenAI для извлечения задачи
+
+    Сообщения идут от неизменного к меняющемуся: общий для всех запросов
+    системный промпт, затем текущее время, затем текст пользователя. Начало
+    запроса совпадает байт в байт, и провайдер может брать его из своего
+    кэша промптов. Ответ ограничен JSON-схемой TASK_SCHEMA.
 
     Args:
         text: Текст пользователя
+        timezone: Часовой пояс пользователя (по умолчанию пояс сервера)
+
+    Returns:
+        Аргументы для chat.completions.create
+    """
+    request = {
+        'model': choose_model([text]),
+        'messages': [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            _now_message(timezone),
+            {"role": "user", "content": text}
+        ],
+        'temperature': 0.3,
+        'max_tokens': AI_MAX_TOKENS
+    }
+    if AI_STRUCTURED_OUTPUT:
+        request['response_format'] = _response_format("task", TASK_SCHEMA)
+    return request
+
+
+def parse_ai_response(text: str, ai_response: str) -> Dict[str, Any]:
+    """
+    Разбирает ответ модели в результат обработки задачи
+
+    Args:
+        text: Исходный текст пользователя (для fallback парсинга)
+        ai_response: Содержимое ответа модели
 
     Returns:
         Dict с ключами: success, description, time, explanation, error
     """
-    if not client:
+    # Пытаемся распарсить JSON
+    try:
+        result = json.loads(ai_response.strip())
+    except json.JSONDecodeError:
+        # Если JSON некорректный, пытаемся извлечь информацию регулярными выражениями
+        return fallback_parsing(text)
+
+    return result_from_ai_item(result)
+
+
+def result_from_ai_item(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Проверяет объект задачи из ответа модели и приводит его к общему формату"""
+    if not isinstance(result, dict):
+        result = {}
+
+    # Проверяем обязательные поля
+    if not result.get('success'):
         return {
             'success': False,
-            'error': 'ИИ не инициализирован'
+            'error': result.get('explanation', 'ИИ не смог обработать задачу')
         }
 
-    try:
-        # Получаем текущую дату и время
-        current_datetime = datetime.now()
-        current_date_str = current_datetime.strftime("%Y-%m-%d")
-        current_time_str = current_datetime.strftime("%H:%M")
-        current_weekday = current_datetime.strftime("%A")
-
-        # Системный промпт для ИИ
-        system_prompt = f"""
-Ты - умный помощник для анализа задач на русском языке. Твоя задача - извлечь из текста пользователя описание задачи и время её выполнения.
-
-Текущая дата: {current_date_str}
-Текущее время: {current_time_str}
-День недели: {current_weekday}
-
-ВАЖНЫЕ ПРАВИЛА:
-1. Всегда отвечай ТОЛЬКО в формате JSON
-2. Если время не указано точно, используй логические предположения
-3. Для относительных дат (завтра, послезавтра, через неделю) рассчитывай точное время
-4. Время должно быть в удобном для чтения формате на русском языке
-
-Формат ответа (JSON):
-{{
-    "success": true/false,
-    "description": "описание задачи",
-    "time": "время выполнения",
-    "explanation": "краткое пояснение того, как ты понял задачу"
-}}
-
-Примеры обработки:
-- "Встреча с Иваном завтра в 14:00" → description: "Встреча с Иваном", time: "завтра в 14:00"
-- "Купить продукты вечером" → description: "Купить продукты", time: "вечером"
-- "Позвонить врачу на следующей неделе" → description: "Позвонить врачу", time: "на следующей неделе"
-- "Подготовить презентацию к пятнице" → description: "Подготовить презентацию", time: "к пятнице"
-
-Если не можешь понять задачу, верни success: false с объяснением проблемы.
-"""
-
-        # Отправляем запрос к OpenAI
-        response = client.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": text}
-            ],
-            temperature=0.3,
-            max_tokens=300
-        )
-
-        # Получаем ответ от ИИ
-        ai_response = response.choices[0].message.content.strip()
-
-        # Пытаемся распарсить JSON
-        try:
-            result = json.loads(ai_response)
-        except json.JSONDecodeError:
-            # Если JSON некорректный, пытаемся извлечь информацию регулярными выражениями
-            return fallback_parsing(text)
-
-        # Проверяем обязательные поля
-        if not result.get('success'):
-            return {
-                'success': False,
-                'error': result.get('explanation', 'ИИ не смог обработать задачу')
-            }
-
-        description = result.get('description', '').strip()
-        time = result.get('time', '').strip()
-
-        if not description:
-            return {
-                'success': False,
-                'error': 'Не удалось определить описание задачи'
-            }
-
-        if not time:
-            time = 'не указано'
+    description = str(result.get('description') or '').strip()
+    time = str(result.get('time') or '').strip()
 
+    if not description:
         return {
-            'success': True,
-            'description': description,
-            'time': time,
-            'explanation': result.get('explanation', '')
+            'success': False,
+            'error': 'Не удалось определить описание задачи'
         }
 
-    except Exception as e:
-        print(f"Ошибка ИИ обработки: {e}")
-        # Используем fallback парсинг
-        return fallback_parsing(text)
+    if not time:
+        time = 'не указано'
 
+    return {
+        'success': True,
+        'description': description,
+        'time': time,
+        'explanation': result.get('explanation', ''),
+        'source': 'ai'
+    }
 
-def fallback_parsing(text: str) -> Dict[str, Any]:
+
+def build_batch_request(texts: List[str], timezone: str = None) -> Dict[str, Any]:
     """
-    Базовая обработка текста без ИИ на случай ошибок
+    Собирает один запрос к OpenAI для нескольких сообщений сразу
+
+    Args:
+        texts: Тексты задач
+        timezone: Часовой пояс, общий для всех сообщений пакета
+
+    Returns:
+        Аргументы для chat.completions.create
     """
-    try:
-        # Простые паттерны для извлечения времени
-        time_patterns = [
-            r'(\d{1,2}:\d{2})',  # 14:30
-            r'\b(утром|днем|днём|вечером|ночью)\b',  # утром
-            r'\b(завтра|послезавтра|сегодня)\b',  # завтра
-            r'\b(в \d{1,2} утра|в \d{1,2} дня|в \d{1,2} вечера)\b',  # в 2 дня
-            r'\b(на следующей неделе|через неделю)\b',  # на следующей неделе
-            r'\b(в понедельник|во вторник|в среду|в четверг|в пятницу|в субботу|в воскресенье)\b',  # в пятницу
-            r'\b(к понедельнику|ко вторнику|к среде|к четвергу|к пятнице|к субботе|к воскресенью)\b'  # к пятнице
-        ]
-
-        found_time = "не указано"
-        description = text.strip()
-
-        # Ищем время в тексте
-        for pattern in time_patterns:
-            match = re.search(pattern, text.lower())
-            if match:
-                found_time = match.group(1)
-                # Убираем найденное время из описания
-                description = re.sub(pattern, '', text, flags=re.IGNORECASE).strip()
-                description = re.sub(r'\s+', ' ', description)  # Убираем лишние пробелы
-                break
-
-        # Очищаем описание от лишних слов
-        cleanup_patterns = [
-            r'\b(напомни|напоминай|напомнить)\b',
-            r'\b(мне|я должен|нужно)\b',
-            r'\b(в|на|к|до|после)\s*$'
-        ]
-
-        for pattern in cleanup_patterns:
-            description = re.sub(pattern, '', description, flags=re.IGNORECASE).strip()
-
-        if not description:
-            description = text.strip()
+    request = {
+        'model': choose_model(texts),
+        'messages': [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "system", "content": BATCH_PROMPT},
+            _now_message(timezone),
+            {"role": "user", "content": json.dumps(
+                [{"id": index, "text": text} for index, text in enumerate(texts)],
+                ensure_ascii=False
+            )}
+        ],
+        'temperature': 0.3,
+        'max_tokens': AI_MAX_TOKENS * len(texts)
+    }
+    if AI_STRUCTURED_OUTPUT:
+        request['response_format'] = _response_format("tasks", BATCH_SCHEMA)
+    return request
 
-        return {
-            'success': True,
-            'description': description,
-            'time': found_time,
-            'explanation': 'Обработано базовым анализатором'
-        }
 
+def parse_batch_response(texts: List[str], ai_response: str) -> List[Dict[str, Any]]:
+    """Разбирает ответ на пакетный запрос; нераспознанные элементы обрабатывает fallback парсингом"""
+    items = {}
+    try:
+        for item in json.loads(ai_response.strip()).get('tasks', []):
+            if isinstance(item, dict) and isinstance(item.get('id'), int):
+                items[item['id']] = item
+    except (json.JSONDecodeError, AttributeError):
+        pass
+
+    results = []
+    for index, text in enumerate(texts):
+        if index in items:
+            results.append(result_from_ai_item(items[index]))
+        else:
+            results.append(fallback_parsing(text))
+    return results
+
+
+def _process_ai_batch(texts: List[str], user_id: int = None, timezone: str = None) -> List[Dict[str, Any]]:
+    """Один пакетный запрос к OpenAI"""
+    try:
+        request = build_batch_request(texts, timezone)
+        started = time_module.perf_counter()
+        response = get_client().chat.completions.create(**request)
+        elapsed = time_module.perf_counter() - started
+        response_cache.record_ai_call(elapsed / len(texts))
+        observe(OPENAI_REQUEST_SECONDS, "batch", elapsed)
+        record_usage(request['model'], "batch", response.usage, elapsed, [user_id] * len(texts))
+        results = parse_batch_response(texts, response.choices[0].message.content)
     except Exception as e:
-        print(f"Ошибка fallback парсинга: {e}")
-        return {
-            'success': False,
-            'error': 'Не удалось обработать текст'
-        }
+        print(f"Ошибка пакетной ИИ обработки: {e}")
+        increment(AI_FAILURES)
+        return [fallback_parsing(text) for text in texts]
 
+    for text, result in zip(texts, results):
+        if result.get('source') == 'ai':
+            response_cache.put(text, result, timezone)
+    return results
 
-def enhance_time_description(time_str: str) -> str:
+
+def process_natural_language_batch(texts: List[str], timezone: str = None,
+                                   user_id: int = None) -> List[Dict[str, Any]]:
     """
-    Улучшает описание времени, делая его более понятным
+    Обрабатывает много сообщений: локальный парсер и кэш, затем пакеты к ИИ
+
+    Сообщения, не разобранные локально и не найденные в кэше, отправляются
+    пакетами по AI_BATCH_SIZE; пакеты выполняются параллельно.
+
+    Args:
+        texts: Тексты задач
+        timezone: Часовой пояс пользователя (по умолчанию пояс сервера)
+        user_id: Пользователь, на которого записывается расход ИИ
+
+    Returns:
+        Список результатов в формате process_natural_language в том же порядке
     """
-    current_date = datetime.now()
+    return [with_task(result, timezone) for result in _extract_batch(texts, timezone, user_id)]
+
+
+def _extract_batch(texts: List[str], timezone: str = None, user_id: int = None) -> List[Dict[str, Any]]:
+    results = [None] * len(texts)
+    pending = []
+    for index, text in enumerate(texts):
+        results[index] = local_parsing(text, timezone) or response_cache.get(text, timezone)
+        if results[index] is None:
+            pending.append(index)
+
+    if not pending:
+        return results
+
+    if get_client() is None:
+        for index in pending:
+            results[index] = fallback_parsing(texts[index])
+        return results
+
+    # Импорт файла - одно действие пользователя и один токен его лимита
+    if not ai_allowed(user_id):
+        for index in pending:
+            results[index] = limited_parsing(texts[index])
+        return results
+
+    batches = [pending[i:i + AI_BATCH_SIZE] for i in range(0, len(pending), AI_BATCH_SIZE)]
+    with ThreadPoolExecutor(max_workers=AI_BATCH_WORKERS) as executor:
+        batch_results = executor.map(lambda batch: _process_ai_batch([texts[i] for i in batch], user_id, timezone),
+                                     batches)
+        for batch, batch_result in zip(batches, batch_results):
+            for index, result in zip(batch, batch_result):
+                results[index] = result
+    return results
+
+
+def with_task(result: Dict[str, Any], timezone: str = None) -> Dict[str, Any]:
+    """
+    Добавляет к успешному результату разбора запись задачи (models.Task)
+
+    Время разбирается в абсолютный момент один раз - здесь, а не при каждом
+    показе, и в поясе пользователя. Результат копируется: один ответ
+    диспетчера может достаться нескольким ожидающим.
+    """
+    if not result.get('success') or 'task' in result:
+        return result
+    return {**result, 'task': Task.from_text(result['description'], result['time'], timezone=timezone)}
+
 
-    # Словарь для замены дней недели
-    weekday_mapping = {
-        'понедельник': 0, 'вторник': 1, 'среда': 2, 'четверг': 3,
-        'пятница': 4, 'суббота': 5, 'воскресенье': 6
+def local_parsing(text: str, timezone: str = None) -> Optional[Dict[str, Any]]:
+    """
+    Быстрый разбор частых формулировок без обращения к ИИ
+
+    "Сегодня" и "завтра" считаются по часам пользователя в поясе timezone.
+
+    Returns:
+        Результат в формате process_natural_language или None,
+        если уверенность локального парсера недостаточна
+    """
+    timezone = timezone or local_timezone_name()
+    parsed = parse_task(text, wall_clock(timezone))
+    if parsed['confidence'] < FAST_PATH_CONFIDENCE:
+        return None
+
+    due_at = parsed['due_at']
+    return {
+        'success': True,
+        'description': parsed['description'],
+        'time': parsed['time'],
+        'explanation': 'Распознано локальным анализатором',
+        'source': 'local',
+        # Время уже разобрано парсером - второй раз его не разбираем
+        'task': Task(parsed['description'], parsed['time'], to_epoch(due_at, timezone) if due_at else None,
+                     parsed['precision'], timezone)
     }
 
-    # Обработка относительных дат
-    if 'завтра' in time_str.lower():
-        tomorrow = current_date + timedelta(days=1)
-        return time_str.replace('завтра', f"завтра ({tomorrow.strftime('%d.%m')})")
 
-    elif 'послезавтра' in time_str.lower():
-        day_after_tomorrow = current_date + timedelta(days=2)
-        return time_str.replace('послезавтра', f"послезавтра ({day_after_tomorrow.strftime('%d.%m')})")
+def process_natural_language(text: str, timezone: str = None, user_id: int = None) -> Dict[str, Any]:
+    """
+    Обрабатывает текст на естественном языке и извлекает задачу
+
+    Сначала пробует локальный парсер, затем кэш ответов; ИИ вызывается,
+    только если ни то, ни другое не дало результата.
+
+    Args:
+        text: Текст пользователя
+        timezone: Часовой пояс пользователя (по умолчанию пояс сервера)
+        user_id: Пользователь, на которого записывается расход ИИ (таблица ai_usage)
+
+    Returns:
+        Dict с ключами: success, description, time, explanation, error и
+        task (models.Task с разобранным временем) при успехе
+    """
+    return with_task(_extract(text, timezone, user_id), timezone)
+
+
+def _extract(text: str, timezone: str = None, user_id: int = None) -> Dict[str, Any]:
+    local_result = local_parsing(text, timezone)
+    if local_result:
+        return local_result
+
+    cached_result = response_cache.get(text, timezone)
+    if cached_result:
+        return cached_result
+
+    ai_client = get_client()
+    if ai_client is None:
+        # Без OPENAI_API_KEY бот работает на базовом анализаторе
+        return fallback_parsing(text)
+
+    if not ai_allowed(user_id):
+        return limited_parsing(text)
+
+    if dispatcher is not None:
+        return dispatcher.extract(text, user_id=user_id, timezone=timezone)
 
-    elif 'через неделю' in time_str.lower():
-        next_week = current_date + timedelta(weeks=1)
-        return time_str.replace('через неделю', f"через неделю ({next_week.strftime('%d.%m')})")
+    try:
+        # Отправляем запрос к OpenAI
+        request = build_request(text, timezone)
+        started = time_module.perf_counter()
+        response = ai_client.chat.completions.create(**request)
+        elapsed = time_module.perf_counter() - started
+        response_cache.record_ai_call(elapsed)
+        observe(OPENAI_REQUEST_SECONDS, "single", elapsed)
+        record_usage(request['model'], "single", response.usage, elapsed, [user_id])
+
+        # Получаем ответ от ИИ
+        result = parse_ai_response(text, response.choices[0].message.content)
+        if result.get('source') == 'ai':
+            response_cache.put(text, result, timezone)
+        return result
 
-    return time_str
+    except Exception as e:
+        print(f"Ошибка ИИ обработки: {e}")
+        increment(AI_FAILURES)
+        # Используем fallback парсинг
+        return fallback_parsing(text)
 
 
-def test_ai_processing():
+async def process_natural_language_async(text: str, timezone: str = None, user_id: int = None) -> Dict[str, Any]:
     """
-    Функция для тестирования ИИ обработки
+    Асинхронный вариант process_natural_language
+
+    Ожидание ответа OpenAI не блокирует цикл событий, поэтому медленный
+    запрос одного пользователя не задерживает остальных. Запросы к ИИ идут
+    через диспетчер (ai_dispatcher): корутина ждет его Future, а пакетирование,
+    повторы после 429 и ограничение нагрузки общие с синхронным ботом.
     """
-    test_cases = [
-        "Встреча с Иваном завтра в 14:00",
-        "Купить продукты вечером",
-        "Позвонить врачу на следующей неделе",
-        "Подготовить презентацию к пятнице",
-        "Записаться к стоматологу через неделю",
-        "Сходить в спортзал утром",
-        "Оплатить счета до конца месяца"
-    ]
+    return with_task(await _extract_async(text, timezone, user_id), timezone)
+
+
+async def _extract_async(text: str, timezone: str = None, user_id: int = None) -> Dict[str, Any]:
+    local_result = local_parsing(text, timezone)
+    if local_result:
+        return local_result
+
+    if dispatcher is None:
+        # Без диспетчера синхронный запрос выполняется в потоке, не останавливая цикл событий
+        return await asyncio.to_thread(_extract, text, timezone, user_id)
 
-    print("🧪 Тестирование ИИ обработки:")
-    for test_text in test_cases:
-        result = process_natural_language(test_text)
-        print(f"\nВход: {test_text}")
-        print(f"Результат: {result}")
+    # Кэш может обратиться к SQLite, поэтому работает вне цикла событий
+    cached_result = await asyncio.to_thread(response_cache.get, text, timezone)
+    if cached_result:
+        return cached_result
 
+    if not _api_key:
+        return fallback_parsing(text)
+
+    if not ai_allowed(user_id):
+        return limited_parsing(text)
 
-if __name__ == "__main__":
-    # Для тестирования
-    import os
-    from dotenv import load_dotenv
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(dispatcher.submit(text, user_id, timezone)),
+                                      AI_RESPONSE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return fallback_parsing(text)
 
-    load_dotenv()
-    api_key = os.getenv("OPENAI_API_KEY")
 
-    if api_key:
-        setup_ai(api_key)
-        test_ai_processing()
-    else:
-        print("❌ OPENAI_API_KEY не найден")
\ No newline at end of file
+def fallback_parsing(text: str) -> Dict[str, Any]:
+    """
+    Базовая обработка текста без ИИ на случай ошибок
+
+    Находит все фрагменты времени ("завтра в 14:00" целиком, а не только
+    "14:00") одним проходом общего FallbackParser.
+    """
+    increment(FALLBACK_PARSES)
+    try:
+        description, fragments = fallback_parser.split(text)
+        return {
+            'success': True,
+            'description': description or text.strip(),
+            'time': ' '.join(fragments) or "не указано",
+            'explanation': 'Обработано базовым анализатором',
+            'source': 'fallback'
+        }
+
+    except Exception as e:
+        print(f"Ошибка fallback парсинга: {e}")
+        return {
+            'success': False,
+            'error': 'Не удалось обработать текст'
+        }
@@ -0,0 +1,138 @@
+import sqlite3
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import logic
+from storage import get_connection
+from metrics import increment, AI_PROMPT_TOKENS, AI_COMPLETION_TOKENS
+
+# Цены моделей в долларах за 1 млн токенов: (запрос, запрос из кэша провайдера, ответ).
+# Модель не из списка учитывается с нулевой стоимостью
+MODEL_PRICES = {
+    'gpt-4.1': (2.00, 0.50, 8.00),
+    'gpt-4.1-mini': (0.40, 0.10, 1.60),
+    'gpt-4.1-nano': (0.10, 0.025, 0.40),
+    'gpt-4o': (2.50, 1.25, 10.00),
+    'gpt-4o-mini': (0.15, 0.075, 0.60),
+}
+
+SQL_INSERT_USAGE = (
+    "INSERT INTO ai_usage (user_id, model, kind, items, share, prompt_tokens, cached_tokens, "
+    "completion_tokens, cost, latency_ms, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+SQL_USAGE_SUMMARY = (
+    "SELECT ROUND(SUM(share)), SUM(items), SUM(prompt_tokens), SUM(cached_tokens), "
+    "SUM(completion_tokens), SUM(cost), AVG(latency_ms) FROM ai_usage WHERE created_at >= ?"
+)
+SQL_TOP_USERS = (
+    "SELECT user_id, SUM(items), SUM(prompt_tokens + completion_tokens), SUM(cost) FROM ai_usage "
+    "WHERE created_at >= ? AND user_id IS NOT NULL GROUP BY user_id ORDER BY SUM(cost) DESC LIMIT ?"
+)
+SQL_USER_USAGE = (
+    "SELECT SUM(items), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) FROM ai_usage "
+    "WHERE user_id = ? AND created_at >= ?"
+)
+
+
+def _connect():
+    return get_connection(logic.DB_PATH)
+
+
+def request_cost(model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> float:
+    """Стоимость запроса в долларах; токены из кэша провайдера дешевле обычных"""
+    prompt_price, cached_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0, 0.0))
+    return ((prompt_tokens - cached_tokens) * prompt_price + cached_tokens * cached_price
+            + completion_tokens * completion_price) / 1_000_000
+
+
+def usage_tokens(usage) -> tuple:
+    """(prompt, cached, completion) из поля usage ответа OpenAI; нули, если его нет"""
+    if usage is None:
+        return 0, 0, 0
+    details = getattr(usage, 'prompt_tokens_details', None)
+    cached = getattr(details, 'cached_tokens', None) or 0
+    return usage.prompt_tokens or 0, cached, usage.completion_tokens or 0
+
+
+def record_usage(model: str, kind: str, usage, latency: float, user_ids: List[Optional[int]]) -> float:
+    """
+    Записывает расход одного запроса к ИИ
+
+    Пакетный запрос может содержать сообщения разных пользователей: токены
+    и стоимость делятся между ними пропорционально числу их сообщений, а
+    share хранит долю запроса, приходящуюся на строку.
+
+    Args:
+        model: Модель, ответившая на запрос
+        kind: "single" или "batch"
+        usage: Поле usage ответа OpenAI
+        latency: Время запроса в секундах
+        user_ids: Автор каждого сообщения запроса (None - неизвестен)
+
+    Returns:
+        Стоимость запроса в долларах
+    """
+    prompt_tokens, cached_tokens, completion_tokens = usage_tokens(usage)
+    increment(AI_PROMPT_TOKENS, prompt_tokens)
+    increment(AI_COMPLETION_TOKENS, completion_tokens)
+    cost = request_cost(model, prompt_tokens, cached_tokens, completion_tokens)
+    now = int(time.time())
+    latency_ms = int(latency * 1000)
+    total = len(user_ids) or 1
+
+    rows = []
+    for user_id, items in Counter(user_ids or [None]).items():
+        share = items / total
+        rows.append((user_id, model, kind, items, share, round(prompt_tokens * share),
+                     round(cached_tokens * share), round(completion_tokens * share), cost * share, latency_ms, now))
+    try:
+        conn = _connect()
+        with conn:
+            conn.executemany(SQL_INSERT_USAGE, rows)
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка записи расхода ИИ: {e}")
+    return cost
+
+
+def get_usage_summary(since: int = None, top: int = 3) -> Dict[str, Any]:
+    """
+    Расход ИИ с момента since (по умолчанию за сутки) и самые затратные пользователи
+    """
+    if since is None:
+        since = int(time.time()) - 86400
+    try:
+        conn = _connect()
+        requests, items, prompt, cached, completion, cost, latency = conn.execute(
+            SQL_USAGE_SUMMARY, (since,)
+        ).fetchone()
+        top_users = conn.execute(SQL_TOP_USERS, (since, top)).fetchall()
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка получения расхода ИИ: {e}")
+        requests, items, prompt, cached, completion, cost, latency, top_users = 0, 0, 0, 0, 0, 0.0, 0, []
+
+    return {
+        'requests': int(requests or 0),
+        'items': items or 0,
+        'prompt_tokens': prompt or 0,
+        'cached_tokens': cached or 0,
+        'completion_tokens': completion or 0,
+        'cost': cost or 0.0,
+        'latency_ms': latency or 0,
+        'top_users': top_users
+    }
+
+
+def get_user_usage(user_id: int, since: int = 0) -> Dict[str, Any]:
+    """Расход ИИ одного пользователя с момента since"""
+    try:
+        messages, prompt, completion, cost = _connect().execute(SQL_USER_USAGE, (user_id, since)).fetchone()
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка получения расхода ИИ: {e}")
+        messages, prompt, completion, cost = 0, 0, 0, 0.0
+    return {
+        'messages': messages or 0,
+        'prompt_tokens': prompt or 0,
+        'completion_tokens': completion or 0,
+        'cost': cost or 0.0
+    }
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from logic import archive_tasks, enable_incremental_vacuum, release_free_pages, ARCHIVE_BATCH_SIZE
+from metrics import increment, TASKS_ARCHIVED
+
+# Выполненная задача уходит в архив через сутки после отметки
+ARCHIVE_DONE_AFTER = 24 * 3600
+# Задача, время которой прошло больше 30 дней назад, тоже уходит в архив
+ARCHIVE_EXPIRED_AFTER = 30 * 24 * 3600
+# Как часто запускается архивация
+ARCHIVE_INTERVAL = 3600
+# Пауза между пачками, чтобы запись задач пользователей не ждала подряд несколько пачек
+ARCHIVE_BATCH_PAUSE = 0.05
+# Сколько свободных страниц (по 4 КБ) возвращается файловой системе за проход
+VACUUM_PAGES = 4096
+
+
+class Compactor:
+    """
+    Фоновая архивация задач и сжатие файла базы
+
+    Раз в interval секунд выполненные и давно прошедшие задачи пачками
+    переносятся из tasks в сжатый архив (logic.archive_tasks), после чего
+    освободившиеся страницы возвращаются файловой системе
+    (PRAGMA incremental_vacuum). Рабочая таблица и ее индексы остаются
+    маленькими, а файл не растет без конца.
+    """
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL, done_after: int = ARCHIVE_DONE_AFTER,
+                 expired_after: int = ARCHIVE_EXPIRED_AFTER, batch_size: int = ARCHIVE_BATCH_SIZE,
+                 vacuum_pages: int = VACUUM_PAGES, shard=None):
+        """
+        Args:
+            interval: Пауза между проходами в секундах
+            done_after: Через сколько секунд после отметки выполненная задача уходит в архив
+            expired_after: Через сколько секунд после своего времени задача уходит в архив
+            batch_size: Задач в одной транзакции переноса
+            vacuum_pages: Максимум страниц, освобождаемых за проход
+            shard: (номер, всего) - архивировать только пользователей своего шарда
+        """
+        self.interval = interval
+        self.done_after = done_after
+        self.expired_after = expired_after
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.shard = shard
+        self.stats = {'runs': 0, 'archived': 0, 'released_pages': 0}
+        self._vacuum_enabled = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> int:
+        """Один проход архивации; возвращает количество перенесенных задач"""
+        if not self._vacuum_enabled:
+            self._vacuum_enabled = enable_incremental_vacuum()
+
+        now = int(time.time())
+        archived = 0
+        while not self._stop.is_set():
+            moved = archive_tasks(now - self.done_after, now - self.expired_after, self.batch_size, self.shard)
+            archived += moved
+            if moved < self.batch_size:
+                break
+            self._stop.wait(ARCHIVE_BATCH_PAUSE)
+
+        released = release_free_pages(self.vacuum_pages) if self._vacuum_enabled else 0
+        if archived:
+            increment(TASKS_ARCHIVED, archived)
+        self.stats['runs'] += 1
+        self.stats['archived'] += archived
+        self.stats['released_pages'] += released
+        return archived
+
+    def start(self):
+        """
+        Запускает поток архивации
+
+        Старая база переводится в auto_vacuum=INCREMENTAL (один VACUUM) здесь,
+        до начала работы бота, а не на ходу.
+        """
+        if self._thread is not None:
+            return
+        self._vacuum_enabled = enable_incremental_vacuum()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает поток; начатая пачка успевает завершиться"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                archived = self.run_once()
+                if archived:
+                    print(f"🗃️ В архив перенесено задач: {archived}")
+            except Exception as e:
+                print(f"❌ Ошибка архивации задач: {e}")
+            self._stop.wait(self.interval)
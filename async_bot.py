@@ -0,0 +1,575 @@
+"""
+Асинхронная версия бота на AsyncTeleBot
+
+Обслуживает те же команды и кнопки, что и bot.py, но ожидание OpenAI и
+SQLite не блокирует обработку сообщений других пользователей:
+запросы к ИИ идут через асинхронный клиент, а работа с базой выполняется
+в отдельном пуле потоков.
+
+Запуск:
+    python async_bot.py
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from logic import (
+    init_db, add_task, get_tasks_page, search_tasks, find_duplicate, reschedule_task, get_tasks_count,
+    get_task, clear_tasks, complete_task, get_db_stats
+)
+from storage import close_all
+from state_store import create_state_store
+from metrics import (
+    timed, instrument_telegram, start_metrics_server, get_summary, HANDLER_SECONDS, METRICS_PORT
+)
+from ai_cache import get_cache_stats
+from ai_usage import get_usage_summary
+from task_cache import get_task_cache_stats
+from user_settings import get_user_timezone, set_user_timezone, parse_timezone
+from reminders import ReminderScheduler
+from rate_limit import TokenBucket
+from outbox import GLOBAL_SEND_RATE, GLOBAL_SEND_BURST
+from archive import Compactor
+from models import Task
+from bulk_import import (
+    split_lines, parse_document, import_tasks, SUPPORTED_EXTENSIONS, MAX_IMPORT_FILE_SIZE
+)
+from ai_logic import process_natural_language_async, setup_ai, setup_rate_limit
+from ai_dispatcher import start_dispatcher, stop_dispatcher
+from write_buffer import start_write_buffer, stop_write_buffer
+from ui import (
+    MENU_BUTTONS, BUTTON_ADD, BUTTON_LIST, BUTTON_SMART_ADD, BUTTON_CLEAR, BUTTON_HELP, BUTTON_CANCEL,
+    HELP_TEXT, TASK_DESCRIPTION_PROMPT, SMART_ADD_PROMPT, TASK_TIME_PROMPT, INVALID_TIME_TEXT,
+    NO_TASKS_TEXT, NO_TASKS_TO_CLEAR_TEXT, MEDIA_NOT_SUPPORTED_TEXT, SAVE_ERROR_TEXT, AI_ERROR_TEXT,
+    IMPORT_TOO_LARGE_TEXT, IMPORT_EMPTY_TEXT, SEARCH_PROMPT, NO_SEARCH_RESULTS_TEXT,
+    INVALID_TIMEZONE_TEXT, SETTINGS_ERROR_TEXT, timezone_keyboard, timezone_text, timezone_set_text,
+    DUPLICATE_EXPIRED_TEXT, TASK_DONE_TEXT, TASK_NOT_FOUND_TEXT, reminder_keyboard, parse_done_callback,
+    duplicate_keyboard, duplicate_text, task_merged_text,
+    main_keyboard, cancel_keyboard, clear_confirm_keyboard, welcome_text, tasks_page_view,
+    parse_tasks_page_callback, search_results_view, parse_search_callback,
+    clear_confirm_text, task_added_text, ai_success_text, ai_failure_text, import_result_text,
+    stats_text, validate_time
+)
+from dotenv import load_dotenv
+from telebot.util import extract_arguments
+from dataclasses import asdict, replace
+import os
+
+load_dotenv()
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+# ID администраторов (через запятую), которым доступна команда /stats
+ADMIN_IDS = {int(admin_id) for admin_id in os.getenv("ADMIN_IDS", "").split(",") if admin_id.strip()}
+# Пользователи с повышенным лимитом запросов к ИИ (через запятую)
+PREMIUM_IDS = {int(user_id) for user_id in os.getenv("PREMIUM_IDS", "").split(",") if user_id.strip()}
+# Потоки для запросов к SQLite (у каждого потока свое соединение)
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+# Групповой коммит вставок задач (см. write_buffer.py)
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+
+bot = AsyncTeleBot(BOT_TOKEN)
+
+
+def user_tier(user_id: int) -> str:
+    """Тариф лимита запросов к ИИ (rate_limit.USER_RATE_TIERS)"""
+    if user_id in ADMIN_IDS:
+        return 'admin'
+    return 'premium' if user_id in PREMIUM_IDS else 'default'
+
+
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+# Состояния диалогов (sqlite или memory, см. STATE_STORE). Обращения идут
+# через get_state/set_state/pop_state в пуле потоков базы: SQLite под
+# блокировкой может ждать до busy_timeout и остановил бы цикл событий
+user_states = create_state_store()
+
+
+reminder_scheduler = None
+
+
+async def run_db(func, *args):
+    """Выполняет синхронную функцию logic.py в пуле потоков базы данных"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, func, *args)
+
+
+async def get_state(user_id: int):
+    """Состояние диалога пользователя или None"""
+    return await run_db(user_states.get, user_id)
+
+
+async def set_state(user_id: int, state):
+    await run_db(user_states.__setitem__, user_id, state)
+
+
+async def pop_state(user_id: int):
+    """Удаляет состояние диалога; возвращает прежнее или None"""
+    return await run_db(user_states.pop, user_id, None)
+
+
+async def save_task(user_id: int, task: Task):
+    """Сохраняет задачу и планирует напоминание о ней; возвращает ID или False"""
+    task_id = await run_db(add_task, user_id, task)
+    if task_id and reminder_scheduler:
+        reminder_scheduler.schedule(task_id, user_id, task.description, task.time, task.due_at)
+    return task_id
+
+
+async def merge_task(user_id: int, task_id: int, task: Task):
+    """
+    Переносит похожую задачу на время task вместо добавления новой
+
+    Если в новом сообщении времени нет, у задачи остаются ее время и
+    напоминание. Возвращает итоговую задачу или None.
+    """
+    if task.due_at is None:
+        return await run_db(get_task, user_id, task_id)
+    if not await run_db(reschedule_task, user_id, task_id, task):
+        return None
+    if reminder_scheduler:
+        reminder_scheduler.schedule(task_id, user_id, task.description, task.time, task.due_at)
+    return task
+
+
+async def offer_merge(chat_id: int, user_id: int, task: Task) -> bool:
+    """Предлагает объединить задачу с похожей, если она есть; True - предложение отправлено"""
+    duplicate = await run_db(find_duplicate, user_id, task.description)
+    if duplicate is None:
+        return False
+    # Задача хранится с уже разобранным временем: "через 2 часа" считается
+    # от момента ввода, а не от нажатия кнопки
+    await set_state(user_id, {
+        'state': 'confirm_duplicate',
+        'task_id': duplicate[0],
+        'duplicate': duplicate[1],
+        'task': asdict(task)
+    })
+    await bot.send_message(chat_id, duplicate_text(duplicate, task), reply_markup=duplicate_keyboard())
+    return True
+
+
+@bot.message_handler(commands=['start'])
+@timed(HANDLER_SECONDS)
+async def start_command(message):
+    await bot.send_message(message.chat.id, welcome_text(message.from_user.first_name), reply_markup=main_keyboard())
+
+
+@bot.message_handler(commands=['help'])
+@timed(HANDLER_SECONDS)
+async def help_command(message):
+    await bot.send_message(message.chat.id, HELP_TEXT, reply_markup=main_keyboard())
+
+
+@bot.message_handler(commands=['stats'], func=lambda message: message.from_user.id in ADMIN_IDS)
+@timed(HANDLER_SECONDS)
+async def stats_command(message):
+    text = stats_text(get_summary(), await run_db(get_db_stats), get_cache_stats(), get_task_cache_stats(),
+                      await run_db(get_usage_summary))
+    await bot.send_message(message.chat.id, text, reply_markup=main_keyboard())
+
+
+@bot.message_handler(commands=['find'])
+@timed(HANDLER_SECONDS)
+async def find_command(message):
+    query = (extract_arguments(message.text) or "").strip()
+    if not query:
+        await set_state(message.from_user.id, "waiting_search_query")
+        await bot.send_message(message.chat.id, SEARCH_PROMPT, reply_markup=cancel_keyboard())
+        return
+    await show_search_results(message, query)
+
+
+@timed(HANDLER_SECONDS)
+async def show_search_results(message, query: str):
+    rows, has_more = await run_db(search_tasks, message.from_user.id, query)
+
+    if not rows:
+        await bot.send_message(message.chat.id, NO_SEARCH_RESULTS_TEXT, reply_markup=main_keyboard())
+        return
+
+    text, keyboard = search_results_view(query, rows, has_more, 0)
+    await bot.send_message(message.chat.id, text, reply_markup=keyboard or main_keyboard())
+
+
+@bot.message_handler(commands=['timezone'])
+@timed(HANDLER_SECONDS)
+async def timezone_command(message):
+    user_id = message.from_user.id
+    argument = (extract_arguments(message.text) or "").strip()
+    if not argument:
+        timezone = await run_db(get_user_timezone, user_id)
+        await bot.send_message(message.chat.id, timezone_text(timezone), reply_markup=timezone_keyboard())
+        return
+
+    timezone = parse_timezone(argument)
+    if timezone is None:
+        await bot.send_message(message.chat.id, INVALID_TIMEZONE_TEXT, reply_markup=main_keyboard())
+        return
+    await bot.send_message(message.chat.id, await change_timezone(user_id, timezone), reply_markup=main_keyboard())
+
+
+async def change_timezone(user_id: int, timezone: str) -> str:
+    """Сохраняет пояс пользователя и перепланирует напоминания его задач; возвращает ответ"""
+    moved = await run_db(set_user_timezone, user_id, timezone)
+    if moved is None:
+        return SETTINGS_ERROR_TEXT
+    if reminder_scheduler:
+        for task in moved:
+            reminder_scheduler.schedule(task.id, user_id, task.description, task.time, task.due_at)
+    return timezone_set_text(timezone, len(moved))
+
+
+@bot.message_handler(func=lambda message: message.text in MENU_BUTTONS)
+@timed(HANDLER_SECONDS)
+async def handle_menu_buttons(message):
+    user_id = message.from_user.id
+
+    if message.text == BUTTON_ADD:
+        await set_state(user_id, "waiting_task_description")
+        await bot.send_message(message.chat.id, TASK_DESCRIPTION_PROMPT, reply_markup=cancel_keyboard())
+
+    elif message.text == BUTTON_SMART_ADD:
+        await set_state(user_id, "waiting_ai_input")
+        await bot.send_message(message.chat.id, SMART_ADD_PROMPT, reply_markup=cancel_keyboard())
+
+    elif message.text == BUTTON_LIST:
+        await show_tasks(message)
+
+    elif message.text == BUTTON_CLEAR:
+        await confirm_clear(message)
+
+    elif message.text == BUTTON_HELP:
+        await help_command(message)
+
+
+@timed(HANDLER_SECONDS)
+async def show_tasks(message):
+    rows, has_more = await run_db(get_tasks_page, message.from_user.id)
+
+    if not rows:
+        await bot.send_message(message.chat.id, NO_TASKS_TEXT, reply_markup=main_keyboard())
+        return
+
+    text, keyboard = tasks_page_view(rows, has_more, 0)
+    await bot.send_message(message.chat.id, text, reply_markup=keyboard)
+
+
+@timed(HANDLER_SECONDS)
+async def confirm_clear(message):
+    count = await run_db(get_tasks_count, message.from_user.id)
+
+    if not count:
+        await bot.send_message(message.chat.id, NO_TASKS_TO_CLEAR_TEXT, reply_markup=main_keyboard())
+        return
+
+    await bot.send_message(message.chat.id, clear_confirm_text(count), reply_markup=clear_confirm_keyboard())
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("tasks:"))
+@timed(HANDLER_SECONDS)
+async def handle_tasks_page(call):
+    direction, page, cursor = parse_tasks_page_callback(call.data)
+    if cursor is None:
+        direction = "n"
+        rows, has_more = await run_db(get_tasks_page, call.from_user.id)
+    elif direction == "n":
+        rows, has_more = await run_db(get_tasks_page, call.from_user.id, cursor, None)
+    else:
+        rows, has_more = await run_db(get_tasks_page, call.from_user.id, None, cursor)
+
+    await bot.answer_callback_query(call.id)
+    if not rows:
+        return
+
+    text, keyboard = tasks_page_view(rows, has_more, page, backwards=direction == "p")
+    await bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=keyboard)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("find:"))
+@timed(HANDLER_SECONDS)
+async def handle_search_page(call):
+    page, query = parse_search_callback(call.data)
+    rows, has_more = await run_db(search_tasks, call.from_user.id, query, page)
+
+    await bot.answer_callback_query(call.id)
+    if not rows:
+        return
+
+    text, keyboard = search_results_view(query, rows, has_more, page)
+    await bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=keyboard)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("tz:"))
+@timed(HANDLER_SECONDS)
+async def handle_timezone_choice(call):
+    timezone = parse_timezone(call.data[3:])
+    await bot.answer_callback_query(call.id)
+    if timezone is None:
+        return
+    text = await change_timezone(call.from_user.id, timezone)
+    await bot.edit_message_text(text, call.message.chat.id, call.message.message_id)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("dup:"))
+@timed(HANDLER_SECONDS)
+async def handle_duplicate_choice(call):
+    user_id = call.from_user.id
+    state = await pop_state(user_id)
+    await bot.answer_callback_query(call.id)
+
+    if not isinstance(state, dict) or state['state'] != 'confirm_duplicate' or 'task' not in state:
+        await bot.edit_message_text(DUPLICATE_EXPIRED_TEXT, call.message.chat.id, call.message.message_id)
+        return
+
+    task = Task(**state['task'])
+    if call.data == "dup:merge":
+        task = replace(task, description=state['duplicate'])
+        merged = await merge_task(user_id, state['task_id'], task)
+        saved = merged is not None
+        text = task_merged_text(merged) if saved else None
+    else:
+        saved = await save_task(user_id, task)
+        text = task_added_text(task)
+
+    await bot.edit_message_text(text if saved else SAVE_ERROR_TEXT, call.message.chat.id, call.message.message_id)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("done:"))
+@timed(HANDLER_SECONDS)
+async def handle_task_done(call):
+    task_id = parse_done_callback(call.data)
+    completed = task_id is not None and await run_db(complete_task, call.from_user.id, task_id)
+    await bot.answer_callback_query(call.id, TASK_DONE_TEXT if completed else TASK_NOT_FOUND_TEXT)
+    if completed:
+        await bot.edit_message_text(f"{call.message.text}\n\n{TASK_DONE_TEXT}",
+                                    call.message.chat.id, call.message.message_id)
+
+
+@bot.callback_query_handler(func=lambda call: True)
+@timed(HANDLER_SECONDS)
+async def handle_callbacks(call):
+    user_id = call.from_user.id
+
+    if call.data == "confirm_clear":
+        await run_db(clear_tasks, user_id)
+        await bot.edit_message_text(
+            "✅ Все задачи удалены!",
+            call.message.chat.id,
+            call.message.message_id
+        )
+        await bot.send_message(call.message.chat.id,
+                               "Можете добавить новые задачи с помощью ИИ! 🤖",
+                               reply_markup=main_keyboard())
+
+    elif call.data == "cancel_clear":
+        await bot.edit_message_text(
+            "❌ Удаление отменено.",
+            call.message.chat.id,
+            call.message.message_id
+        )
+        await bot.send_message(call.message.chat.id,
+                               "Ваши задачи сохранены.",
+                               reply_markup=main_keyboard())
+
+
+@bot.message_handler(func=lambda message: message.text == BUTTON_CANCEL)
+@timed(HANDLER_SECONDS)
+async def handle_cancel(message):
+    await pop_state(message.from_user.id)
+
+    await bot.send_message(message.chat.id,
+                           "❌ Операция отменена.",
+                           reply_markup=main_keyboard())
+
+
+@bot.message_handler(content_types=['text'])
+@timed(HANDLER_SECONDS)
+async def handle_text(message):
+    user_id = message.from_user.id
+    state = await get_state(user_id)
+
+    if isinstance(state, dict) and state['state'] == 'confirm_duplicate':
+        # Пользователь не ответил на предложение объединить задачи и пишет дальше
+        await pop_state(user_id)
+        state = None
+
+    if state in (None, "waiting_ai_input"):
+        lines = split_lines(message.text)
+        if len(lines) > 1:
+            await run_import(message, [{'text': line} for line in lines])
+            return
+
+    if state is None:
+        # Текст без выбранного режима обрабатываем как умный ввод
+        await process_ai_input(message)
+        return
+
+    if state == "waiting_ai_input":
+        await process_ai_input(message)
+
+    elif state == "waiting_search_query":
+        await pop_state(user_id)
+        await show_search_results(message, message.text.strip())
+
+    elif state == "waiting_task_description":
+        await set_state(user_id, {
+            'state': 'waiting_task_time',
+            'description': message.text
+        })
+        await bot.send_message(message.chat.id, TASK_TIME_PROMPT, reply_markup=cancel_keyboard())
+
+    elif isinstance(state, dict) and state['state'] == 'waiting_task_time':
+        time_text = message.text.strip()
+
+        if validate_time(time_text):
+            task = Task.from_text(state['description'], time_text, timezone=await run_db(get_user_timezone, user_id))
+            await pop_state(user_id)
+            if await offer_merge(message.chat.id, user_id, task):
+                return
+            await save_task(user_id, task)
+
+            await bot.send_message(message.chat.id, task_added_text(task), reply_markup=main_keyboard())
+        else:
+            await bot.send_message(message.chat.id, INVALID_TIME_TEXT, reply_markup=cancel_keyboard())
+
+
+@timed(HANDLER_SECONDS)
+async def process_ai_input(message):
+    user_id = message.from_user.id
+    await pop_state(user_id)
+
+    try:
+        await bot.send_chat_action(message.chat.id, 'typing')
+
+        timezone = await run_db(get_user_timezone, user_id)
+        ai_result = await process_natural_language_async(message.text, timezone, user_id)
+
+        if ai_result['success']:
+            if await offer_merge(message.chat.id, user_id, ai_result['task']):
+                return
+            if await save_task(user_id, ai_result['task']):
+                await bot.send_message(message.chat.id, ai_success_text(ai_result), reply_markup=main_keyboard())
+            else:
+                await bot.send_message(message.chat.id, SAVE_ERROR_TEXT, reply_markup=main_keyboard())
+        else:
+            await bot.send_message(message.chat.id, ai_failure_text(ai_result), reply_markup=main_keyboard())
+
+    except Exception as e:
+        print(f"Ошибка обработки ИИ: {e}")
+        await bot.send_message(message.chat.id, AI_ERROR_TEXT, reply_markup=main_keyboard())
+
+
+@timed(HANDLER_SECONDS)
+async def run_import(message, items):
+    user_id = message.from_user.id
+
+    if not items:
+        await bot.send_message(message.chat.id, IMPORT_EMPTY_TEXT, reply_markup=main_keyboard())
+        return
+
+    try:
+        await bot.send_chat_action(message.chat.id, 'typing')
+        # Импорт сам распараллеливает запросы к ИИ в потоках - не держим цикл событий
+        result = await asyncio.to_thread(import_tasks, user_id, items)
+        if reminder_scheduler:
+            for task in result['tasks']:
+                reminder_scheduler.schedule(task.id, user_id, task.description, task.time, task.due_at)
+
+        await bot.send_message(message.chat.id, import_result_text(result), reply_markup=main_keyboard())
+    except Exception as e:
+        print(f"Ошибка импорта задач: {e}")
+        await bot.send_message(message.chat.id, AI_ERROR_TEXT, reply_markup=main_keyboard())
+
+
+@bot.message_handler(
+    content_types=['document'],
+    func=lambda message: (message.document.file_name or '').lower().endswith(SUPPORTED_EXTENSIONS))
+@timed(HANDLER_SECONDS)
+async def handle_import_document(message):
+    if message.document.file_size and message.document.file_size > MAX_IMPORT_FILE_SIZE:
+        await bot.send_message(message.chat.id, IMPORT_TOO_LARGE_TEXT, reply_markup=main_keyboard())
+        return
+
+    file_info = await bot.get_file(message.document.file_id)
+    content = await bot.download_file(file_info.file_path)
+    timezone = await run_db(get_user_timezone, message.from_user.id)
+    await run_import(message, parse_document(message.document.file_name, content, timezone))
+
+
+@bot.message_handler(content_types=['photo', 'video', 'audio', 'document', 'voice', 'sticker'])
+@timed(HANDLER_SECONDS)
+async def handle_media(message):
+    await bot.send_message(message.chat.id, MEDIA_NOT_SUPPORTED_TEXT, reply_markup=main_keyboard())
+
+
+def create_reminder_scheduler(loop):
+    """Планировщик работает в своем потоке и отправляет сообщения через цикл событий"""
+    # Очереди outbox у асинхронного бота нет, поэтому общий лимит Telegram соблюдается здесь
+    bucket = TokenBucket(GLOBAL_SEND_RATE, GLOBAL_SEND_BURST)
+
+    def send(chat_id, text, task_id):
+        bucket.consume()
+        asyncio.run_coroutine_threadsafe(
+            bot.send_message(chat_id, text, reply_markup=reminder_keyboard(task_id)), loop
+        ).result()
+
+    return ReminderScheduler(send)
+
+
+async def create_app():
+    """
+    Подготавливает бота к работе: адрес API, метрики, схема базы, ИИ и лимиты
+
+    Импорт модуля не меняет глобальный asyncio_helper telebot и не трогает
+    базу (его используют бенчмарки), все это происходит здесь.
+
+    Returns:
+        Экземпляр AsyncTeleBot с зарегистрированными обработчиками
+    """
+    if TELEGRAM_API_URL:
+        asyncio_helper.API_URL = TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
+    instrument_telegram(asyncio_helper)
+    await run_db(init_db)
+    # Запросы к ИИ выполняют потоки диспетчера и пакетного импорта; цикл событий ждет их Future
+    setup_ai(OPENAI_API_KEY, OPENAI_BASE_URL)
+    # Один пользователь не может занять ИИ для всех: сверх лимита - базовый анализатор
+    setup_rate_limit(user_tier)
+    return bot
+
+
+async def main():
+    global reminder_scheduler
+    await create_app()
+
+    reminder_scheduler = create_reminder_scheduler(asyncio.get_running_loop())
+    print(f"⏰ Загружено напоминаний: {await run_db(reminder_scheduler.load_pending)}")
+    reminder_scheduler.start()
+    compactor = Compactor()
+    await asyncio.to_thread(compactor.start)
+    start_dispatcher()
+    if WRITE_BEHIND:
+        start_write_buffer()
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
+
+    print("🤖 Асинхронный бот с ИИ запущен...")
+    try:
+        await bot.infinity_polling()
+    finally:
+        await asyncio.to_thread(stop_dispatcher)
+        await asyncio.to_thread(stop_write_buffer)
+        await run_db(reminder_scheduler.stop)
+        await asyncio.to_thread(compactor.stop)
+        await bot.close_session()
+        db_executor.shutdown()
+        close_all()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print(f"Ошибка: {e}")
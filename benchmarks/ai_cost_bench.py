@@ -0,0 +1,69 @@
+"""
+Бенчмарк расхода токенов на запросы к ИИ
+
+Сообщения, которые не разбираются локально, отправляются в заглушку
+OpenAI по одному и пакетом от нескольких пользователей. Заглушка
+оценивает usage по длине текста; расход читается из таблицы ai_usage,
+как его видит /stats.
+
+Запуск из корня репозитория:
+    python -m benchmarks.ai_cost_bench [сообщений] [пользователей]
+"""
+import os
+import sys
+import tempfile
+
+import ai_logic
+import logic
+import storage
+from ai_usage import get_usage_summary, get_user_usage
+from benchmarks.fakes import FakeOpenAIServer
+from benchmarks.parser_bench import load_corpus
+
+
+def report(name: str, summary):
+    requests = summary['requests'] or 1
+    print(f"{name}: запросов {summary['requests']}, сообщений {summary['items']}, "
+          f"токенов на запрос {summary['prompt_tokens'] / requests:.0f} + "
+          f"{summary['completion_tokens'] / requests:.0f}, ${summary['cost']:.5f}")
+
+
+def main():
+    messages = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    corpus = [text for text in load_corpus() if ai_logic.local_parsing(text) is None]
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=0) as fake:
+        logic.DB_PATH = os.path.join(tmp, "ai_cost.db")
+        logic.init_db()
+        ai_logic.setup_ai("fake-key", fake.base_url)
+
+        # Уникальные тексты, чтобы ответы не брались из кэша
+        texts = [f"{corpus[i % len(corpus)]} #{i}" for i in range(messages)]
+        print(f"\n💬 {messages} сообщений от {users} пользователей, "
+              f"модели: {ai_logic.AI_MODEL} / {ai_logic.AI_SMALL_MODEL or '-'}")
+
+        for index, text in enumerate(texts):
+            ai_logic.process_natural_language(text, user_id=index % users)
+        single = get_usage_summary(0)
+        report("🔹 По одному", single)
+
+        for user_id in range(users):
+            ai_logic.process_natural_language_batch([f"{text} (пакет)" for text in texts[user_id::users]],
+                                                    user_id=user_id)
+        total = get_usage_summary(0)
+        batch = {key: total[key] - single[key] for key in ('requests', 'items', 'prompt_tokens',
+                                                           'completion_tokens', 'cost')}
+        report("📦 Пакетами", batch)
+
+        print("👥 Расход по пользователям:")
+        for user_id in range(users):
+            usage = get_user_usage(user_id)
+            print(f"   {user_id}: сообщений {usage['messages']}, "
+                  f"токенов {usage['prompt_tokens']} + {usage['completion_tokens']}, ${usage['cost']:.5f}")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Бенчмарк архивации задач
+
+Заполняет базу задачами, большая часть которых давно прошла или
+выполнена, и выполняет один проход archive.Compactor. Измеряются время
+переноса, задержка записи новых задач во время архивации, размер рабочей
+таблицы, архива и файла до и после, и проверяется, что задачи читаются
+из архива без потерь.
+
+Запуск из корня репозитория:
+    python -m benchmarks.archive_bench [количество_задач]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import logic
+import storage
+from archive import Compactor
+from dedup import encode
+from models import Task
+
+USERS = 2000
+DAY = 24 * 3600
+
+
+def seed(conn, count: int, now: int):
+    """80% задач прошли 60 дней назад, 10% выполнены позавчера, 10% в будущем"""
+    rows = []
+    for i in range(count):
+        kind = i % 10
+        description = f"Задача {i}: позвонить клиенту и обсудить договор"
+        due_at = now + DAY + i if kind == 9 else now - 60 * DAY + i
+        done_at = now - 2 * DAY if kind == 8 else None
+        rows.append((i % USERS, description, "завтра в 10:00", due_at, "exact", "Europe/Moscow",
+                     encode(description), done_at))
+    with conn:
+        conn.executemany(
+            "INSERT INTO tasks (user_id, description, time, due_at, precision, timezone, vector, done_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+        )
+
+
+def report(name: str, stats):
+    print(f"{name}: задач {stats['total_tasks']:,}, в архиве {stats['archived_tasks']:,} "
+          f"({stats['archived_bytes'] / 1048576:.1f} МБ сжато); файл {stats['db_bytes'] / 1048576:.1f} МБ, "
+          f"задачи с индексами {stats['hot_bytes'] / 1048576:.1f} МБ, свободно {stats['free_bytes'] / 1048576:.1f} МБ")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logic.DB_PATH = os.path.join(tmp, "archive.db")
+        logic.init_db()
+        conn = storage.get_connection(logic.DB_PATH)
+        now = int(time.time())
+        seed(conn, count, now)
+        expected = {row[0]: row for row in conn.execute(
+            "SELECT id, description, time, due_at FROM tasks WHERE user_id = 1 AND (done_at IS NOT NULL OR due_at < ?)",
+            (now,)
+        )}
+        print(f"\n📚 Задач: {count:,}, пользователей {USERS:,}")
+        report("📦 До архивации", logic.get_db_stats())
+
+        # Пока идет архивация, другой поток добавляет задачи и меряет задержку
+        latencies = []
+        stop = threading.Event()
+
+        def writer():
+            while not stop.is_set():
+                started = time.perf_counter()
+                logic.add_task(USERS + 1, Task.from_text("Новая задача", "завтра в 9:00"))
+                latencies.append(time.perf_counter() - started)
+                time.sleep(0.005)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        compactor = Compactor(vacuum_pages=1 << 30)
+        started = time.perf_counter()
+        archived = compactor.run_once()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        thread.join()
+
+        print(f"🗃️ Перенесено {archived:,} задач за {elapsed:.2f} с ({archived / elapsed:,.0f} задач/с), "
+              f"освобождено страниц {compactor.stats['released_pages']:,}")
+        latencies.sort()
+        print(f"✍️ Запись во время архивации: {len(latencies)} задач, "
+              f"p50 {statistics.median(latencies) * 1000:.1f} мс, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} мс, макс {latencies[-1] * 1000:.1f} мс")
+        report("📦 После архивации", logic.get_db_stats())
+
+        restored = {task.id: (task.id, task.description, task.time, task.due_at)
+                    for task in logic.get_archived_tasks(1)}
+        status = "совпадают" if restored == expected else "РАСХОДЯТСЯ"
+        print(f"🔁 Архив пользователя 1: {len(restored)} задач, {status} с исходными")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
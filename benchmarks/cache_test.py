@@ -0,0 +1,102 @@
+"""
+Проверка кэша ответов ИИ (ai_cache.ResponseCache)
+
+1. Дата из ответа хранится как сдвиг от дня запроса и при повторе
+   пересчитывается от нового "сегодня", в том числе в другом поясе.
+2. Ответы на фразы, отсчитанные от момента сообщения или привязанные
+   к календарю, не кэшируются.
+3. Ответ переживает перезапуск: новый экземпляр читает его из таблицы.
+
+Запуск из корня репозитория (или python -m pytest benchmarks/cache_test.py):
+    python -m benchmarks.cache_test
+"""
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+
+import logic
+import storage
+from ai_cache import ResponseCache, to_relative, from_relative
+from models import wall_clock
+
+TODAY = date(2026, 10, 18)
+
+_tmp = None
+
+
+def setup_module(module=None):
+    """Временная база для таблицы ai_cache"""
+    global _tmp
+    _tmp = tempfile.mkdtemp()
+    logic.DB_PATH = os.path.join(_tmp, "cache_test.db")
+    logic.init_db()
+
+
+def teardown_module(module=None):
+    storage.close_all()
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+def _answer(time_text: str) -> dict:
+    return {'success': True, 'description': "Позвонить врачу", 'time': time_text, 'explanation': ''}
+
+
+def test_relative_date_replay():
+    relative = to_relative("позвонить врачу завтра", "завтра (19.10) в 10:00", TODAY)
+    assert relative == ("завтра ({date}) в 10:00", 'dotted', 1), relative
+    assert from_relative(*relative, TODAY + timedelta(days=2)) == "завтра (21.10) в 10:00"
+
+    relative = to_relative("позвонить врачу послезавтра", "2026-10-20 10:00", TODAY)
+    assert from_relative(*relative, date(2026, 12, 31)) == "2027-01-02 10:00"
+    relative = to_relative("позвонить врачу завтра", "19 октября в 10:00", TODAY)
+    assert from_relative(*relative, date(2026, 10, 31)) == "1 ноября в 10:00"
+    # Время без даты повторяется как есть
+    assert to_relative("позвонить врачу в 10 утра", "в 10:00", TODAY) == ("в 10:00", None, 0)
+
+
+def test_anchored_answers_are_not_cached():
+    for text in ("Позвонить врачу через полтора часа", "Позвонить врачу попозже",
+                 "Позвонить врачу в пятницу", "Позвонить врачу в конце месяца"):
+        assert to_relative(text.lower(), "23.10 в 10:00", TODAY) is None, text
+        assert not ResponseCache().put(text, _answer("23.10 в 10:00")), text
+    # Несколько дат в одном ответе не сводятся к одному сдвигу
+    assert to_relative("позвонить врачу дважды", "19.10 и 20.10", TODAY) is None
+
+
+def test_replay_uses_user_timezone():
+    cache = ResponseCache()
+    east, west = "Pacific/Kiritimati", "Pacific/Pago_Pago"
+    tomorrow = wall_clock(east).date() + timedelta(days=1)
+    assert cache.put("Позвонить врачу завтра", _answer(f"завтра ({tomorrow:%d.%m}) в 10:00"), timezone=east)
+
+    expected = wall_clock(west).date() + timedelta(days=1)
+    result = cache.get("позвонить врачу, завтра!", timezone=west)
+    assert result['time'] == f"завтра ({expected:%d.%m}) в 10:00", result
+    assert result['source'] == 'cache' and cache.memory_hits == 1
+
+
+def test_disk_replay_after_restart():
+    tomorrow = wall_clock(None).date() + timedelta(days=1)
+    assert ResponseCache().put("Записаться к врачу завтра", _answer(f"завтра ({tomorrow:%d.%m}) в 9:00"))
+
+    cache = ResponseCache()
+    result = cache.get("Записаться к врачу завтра")
+    assert result['time'] == f"завтра ({tomorrow:%d.%m}) в 9:00", result
+    assert cache.disk_hits == 1 and cache.misses == 0
+    assert cache.get("Записаться к стоматологу завтра") is None and cache.misses == 1
+
+
+def main():
+    setup_module()
+    try:
+        for test in (test_relative_date_replay, test_anchored_answers_are_not_cached,
+                     test_replay_uses_user_timezone, test_disk_replay_after_restart):
+            test()
+            print(f"✅ {test.__name__}")
+    finally:
+        teardown_module()
+
+
+if __name__ == "__main__":
+    main()
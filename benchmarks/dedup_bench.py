@@ -0,0 +1,108 @@
+"""
+Бенчмарк поиска похожих задач
+
+Для пользователей с разным числом задач измеряет find_duplicate в
+установившемся режиме: перед каждой проверкой добавляется новая задача,
+как при обычной работе бота, и ее вектор дописывается в кэш. Отдельно
+показаны построение вектора и холодная загрузка всех векторов
+пользователя, а также качество: сколько разных задач корпуса считается
+повторами и сколько настоящих повторов находится при прежнем правиле
+(близость >= 0.7) и при нынешнем (DUPLICATE_THRESHOLD и same_subject).
+
+Запуск из корня репозитория:
+    python -m benchmarks.dedup_bench
+"""
+import itertools
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import logic
+import storage
+from benchmarks.parser_bench import load_corpus
+from dedup import embed, same_subject, DUPLICATE_THRESHOLD
+from models import Task
+from time_parser import parse_task
+
+USER_SIZES = (100, 1000, 3000, 10000)
+REPEATS = 200
+# Прежний порог близости, без проверки отличающихся слов
+OLD_THRESHOLD = 0.7
+NAMES = ("Иваном", "Петром", "Олегом", "Анной")
+
+
+def _ms(timings):
+    timings = sorted(timings)
+    return statistics.median(timings) * 1000, timings[int(len(timings) * 0.99)] * 1000
+
+
+def quality(corpus):
+    """Ложные совпадения и найденные повторы при прежнем и нынешнем правиле"""
+    descriptions = sorted({parse_task(text)['description'] for text in corpus})
+    # Разные задачи: пары корпуса, шаблоны с разными номерами и именами
+    different = list(itertools.combinations(descriptions, 2))
+    different += [(f"{text} номер {i}", f"{text} номер {i + 1}") for i, text in enumerate(descriptions)]
+    different += [(f"Встреча с {first}", f"Встреча с {second}") for first, second in itertools.combinations(NAMES, 2)]
+    # Повторы: та же задача с добавленным словом и в другом регистре
+    same = [(text, f"{text} срочно") for text in descriptions]
+    same += [(text, text.lower()) for text in descriptions]
+
+    def rules(first, second):
+        score = float(embed(first) @ embed(second))
+        return score >= OLD_THRESHOLD, score >= DUPLICATE_THRESHOLD and same_subject(first, second)
+
+    false_old, false_new = map(sum, zip(*(rules(*pair) for pair in different)))
+    found_old, found_new = map(sum, zip(*(rules(*pair) for pair in same)))
+    print(f"🎯 Разные задачи, принятые за повтор: было {false_old}, стало {false_new} из {len(different)}")
+    print(f"   Найдено настоящих повторов: было {found_old}, стало {found_new} из {len(same)}")
+
+
+def main():
+    rng = random.Random(1)
+    corpus = load_corpus()
+    quality(corpus)
+
+    timings = []
+    for text in corpus[:REPEATS]:
+        started = time.perf_counter()
+        embed(text)
+        timings.append(time.perf_counter() - started)
+    p50, p99 = _ms(timings)
+    print(f"\n🧮 Вектор описания: p50 {p50:.3f} мс / p99 {p99:.3f} мс")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logic.DB_PATH = os.path.join(tmp, "dedup.db")
+        logic.init_db()
+
+        for user_id, size in enumerate(USER_SIZES, start=1):
+            logic.add_tasks_bulk(user_id, [Task.from_text(f"{rng.choice(corpus)} {i}", "завтра")
+                                           for i in range(size)])
+
+            started = time.perf_counter()
+            logic.find_duplicate(user_id, rng.choice(corpus))
+            cold = (time.perf_counter() - started) * 1000
+
+            checks, inserts, found = [], [], 0
+            for _ in range(REPEATS):
+                text = rng.choice(corpus)
+                started = time.perf_counter()
+                logic.add_task(user_id, Task.from_text(text, "завтра"))
+                inserts.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                found += logic.find_duplicate(user_id, text + " срочно") is not None
+                checks.append(time.perf_counter() - started)
+
+            p50, p99 = _ms(checks)
+            insert_p50, _ = _ms(inserts)
+            print(f"👤 {size:>6,} задач: проверка p50 {p50:.3f} мс / p99 {p99:.3f} мс, "
+                  f"холодная загрузка {cold:.1f} мс, вставка p50 {insert_p50:.3f} мс, "
+                  f"найдено похожих {found}/{REPEATS}")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Бенчмарк диспетчера запросов к ИИ при всплеске нагрузки
+
+Много пользователей одновременно отправляют сообщения, которые не
+разбираются локально. Сравниваются прямые запросы (каждое сообщение -
+свой запрос) и ExtractionDispatcher против заглушки OpenAI, которая
+отвечает 429 сверх заданного числа одновременных запросов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.dispatcher_bench [пользователей] [задержка_ИИ] [лимит_одновременных]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import ai_logic
+import logic
+import storage
+from ai_dispatcher import start_dispatcher, stop_dispatcher
+from benchmarks.fakes import FakeOpenAIServer
+from benchmarks.parser_bench import load_corpus
+
+
+def _percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def burst(texts):
+    """Все сообщения отправляются одновременно; возвращает (время, задержки, источники)"""
+    def handle(text):
+        started = time.perf_counter()
+        result = ai_logic.process_natural_language(text)
+        return time.perf_counter() - started, result.get('source', 'error')
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(texts)) as pool:
+        results = list(pool.map(handle, texts))
+    elapsed = time.perf_counter() - started
+    return elapsed, [latency for latency, _ in results], Counter(source for _, source in results)
+
+
+def report(name: str, fake: FakeOpenAIServer, elapsed: float, latencies, sources):
+    print(f"\n{name}: {elapsed:.2f} с, p50 {statistics.median(latencies):.2f} с, "
+          f"p99 {_percentile(latencies, 0.99):.2f} с")
+    print(f"   Запросов к ИИ: {fake.requests}, ответов 429: {fake.rate_limited}")
+    print(f"   Источники: {dict(sources)}")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    max_concurrent = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+    corpus = [text for text in load_corpus() if ai_logic.local_parsing(text) is None]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logic.DB_PATH = os.path.join(tmp, "dispatcher.db")
+        logic.init_db()
+        print(f"\n👥 {users} пользователей одновременно, задержка ИИ {latency} с, "
+              f"лимит {max_concurrent} одновременных запросов")
+
+        for name, use_dispatcher in (("🐢 Прямые запросы", False), ("📦 Диспетчер", True)):
+            # Уникальные тексты, чтобы ответы не брались из кэша
+            texts = [f"{corpus[i % len(corpus)]} #{name[-1]}{i}" for i in range(users)]
+            with FakeOpenAIServer(latency, max_concurrent) as fake:
+                ai_logic.setup_ai("fake-key", fake.base_url)
+                if use_dispatcher:
+                    start_dispatcher(max_in_flight=max_concurrent)
+                try:
+                    report(name, fake, *burst(texts))
+                finally:
+                    stop_dispatcher()
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Проверка ExtractionDispatcher против заглушки OpenAI
+
+1. Сообщения, пришедшие в пределах окна, уходят одним пакетным запросом.
+2. Запрос, получивший 429, повторяется после паузы и получает ответ ИИ.
+3. Сообщения сверх max_queue сразу разбираются fallback_parsing, а не
+   ждут в очереди.
+
+Запуск из корня репозитория (или python -m pytest benchmarks/dispatcher_test.py):
+    python -m benchmarks.dispatcher_test
+"""
+import os
+import shutil
+import tempfile
+import time
+
+import ai_logic
+import logic
+import storage
+from ai_dispatcher import ExtractionDispatcher
+from benchmarks.fakes import FakeOpenAIServer
+
+TEXTS = [f"Позвонить клиенту номер {i} насчет договора" for i in range(10)]
+
+_tmp = None
+
+
+def setup_module(module=None):
+    """Временная база для кэша ответов и учета расхода ИИ"""
+    global _tmp
+    _tmp = tempfile.mkdtemp()
+    logic.DB_PATH = os.path.join(_tmp, "dispatcher_test.db")
+    logic.init_db()
+
+
+def teardown_module(module=None):
+    storage.close_all()
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+def _with_dispatcher(fake: FakeOpenAIServer, **kwargs) -> ExtractionDispatcher:
+    ai_logic.setup_ai("fake-key", fake.base_url)
+    dispatcher = ExtractionDispatcher(**kwargs)
+    dispatcher.start()
+    return dispatcher
+
+
+def test_window_forms_one_batch():
+    with FakeOpenAIServer(latency=0.05) as fake:
+        dispatcher = _with_dispatcher(fake, window=0.3, max_in_flight=1)
+        try:
+            futures = [dispatcher.submit(text) for text in TEXTS[:5]]
+            results = [future.result(timeout=10) for future in futures]
+        finally:
+            dispatcher.stop()
+
+    assert fake.requests == 1, f"ожидался один запрос, отправлено {fake.requests}"
+    assert dispatcher.stats['requests'] == 1 and dispatcher.stats['items'] == 5, dispatcher.stats
+    assert all(result['source'] == 'ai' for result in results), results
+
+
+def test_rate_limited_request_is_retried():
+    backoff = 0.1
+    # Заглушка пропускает один запрос за раз: второй одновременный получит 429
+    with FakeOpenAIServer(latency=0.3, max_concurrent=1) as fake:
+        dispatcher = _with_dispatcher(fake, window=0, max_batch=1, max_in_flight=2,
+                                      max_retries=5, backoff=backoff)
+        try:
+            started = time.perf_counter()
+            futures = [dispatcher.submit(text) for text in TEXTS[:2]]
+            results = [future.result(timeout=10) for future in futures]
+            elapsed = time.perf_counter() - started
+        finally:
+            dispatcher.stop()
+
+    assert fake.rate_limited >= 1, "заглушка не ответила 429"
+    assert dispatcher.stats['retries'] == fake.rate_limited, (dispatcher.stats, fake.rate_limited)
+    assert dispatcher.stats['errors'] == 0, dispatcher.stats
+    assert all(result['source'] == 'ai' for result in results), results
+    # Повтор ждал паузу, а второй ответ пришел после первого
+    assert elapsed >= fake.latency + backoff, elapsed
+
+
+def test_queue_overflow_falls_back():
+    max_queue = 2
+    with FakeOpenAIServer(latency=1.0) as fake:
+        dispatcher = _with_dispatcher(fake, window=0, max_batch=1, max_in_flight=1, max_queue=max_queue)
+        try:
+            first = dispatcher.submit(TEXTS[0])
+            # Первое сообщение уходит в запрос, освобождая место в очереди
+            deadline = time.monotonic() + 5
+            while len(dispatcher) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            futures = [dispatcher.submit(text) for text in TEXTS[1:]]
+            shed = [future for future in futures if future.done()]
+            shed_results = [future.result(timeout=0) for future in shed]
+            queued = [future for future in futures if future not in shed]
+        finally:
+            dispatcher.stop()
+
+    assert len(queued) == max_queue, f"в очереди {len(queued)} сообщений вместо {max_queue}"
+    assert len(shed) == len(TEXTS) - 1 - max_queue == dispatcher.stats['shed'], dispatcher.stats
+    assert all(result['source'] == 'fallback' for result in shed_results), shed_results
+    assert first.result(timeout=0)['source'] == 'ai'
+
+
+def main():
+    setup_module()
+    try:
+        for test in (test_window_forms_one_batch, test_rate_limited_request_is_retried,
+                     test_queue_overflow_falls_back):
+            test()
+            print(f"✅ {test.__name__}")
+    finally:
+        teardown_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Локальные заглушки внешних API для бенчмарков
+
+FakeOpenAIServer отвечает на /v1/chat/completions в формате OpenAI с
+настраиваемой задержкой; ответы строятся базовым анализатором бота, а
+usage оценивается по длине текста (CHARS_PER_TOKEN).
+FakeTelegramServer отвечает на любой метод Bot API и считает вызовы.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ai_logic import fallback_parsing
+
+# Примерно столько символов русского текста приходится на один токен
+CHARS_PER_TOKEN = 3
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def _completion(content: str, prompt_tokens: int) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "fake",
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content}
+        }],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": _tokens(content),
+                  "total_tokens": prompt_tokens + _tokens(content)}
+    }
+
+
+def _answer(user_content: str) -> str:
+    """Имитирует ответ модели на одиночный или пакетный запрос"""
+    try:
+        items = json.loads(user_content)
+    except json.JSONDecodeError:
+        items = None
+
+    if isinstance(items, list):
+        tasks = []
+        for item in items:
+            result = fallback_parsing(item['text'])
+            tasks.append({"id": item['id'], "success": True, "description": result['description'],
+                          "time": result['time'], "explanation": "fake"})
+        return json.dumps({"tasks": tasks}, ensure_ascii=False)
+
+    result = fallback_parsing(user_content)
+    return json.dumps({"success": True, "description": result['description'],
+                       "time": result['time'], "explanation": "fake"}, ensure_ascii=False)
+
+
+class FakeOpenAIServer:
+    """
+    HTTP-заглушка OpenAI Chat Completions с задержкой latency секунд на запрос
+
+    Если задан max_concurrent, запросы сверх этого числа одновременных
+    получают 429 (как при превышении лимита OpenAI); их считает rate_limited.
+    """
+
+    def __init__(self, latency: float = 0.5, max_concurrent: int = None):
+        self.latency = latency
+        self.max_concurrent = max_concurrent
+        self.requests = 0
+        self.rate_limited = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                with server._lock:
+                    limited = server.max_concurrent is not None and server._in_flight >= server.max_concurrent
+                    if limited:
+                        server.rate_limited += 1
+                    else:
+                        server.requests += 1
+                        server._in_flight += 1
+                if limited:
+                    payload = json.dumps({"error": {"message": "Rate limit reached", "type": "requests",
+                                                    "code": "rate_limit_exceeded"}}).encode()
+                    self.send_response(429)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+                try:
+                    time.sleep(server.latency)
+                    content = _answer(body['messages'][-1]['content'])
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+                prompt_tokens = sum(_tokens(message['content']) for message in body['messages'])
+                payload = json.dumps(_completion(content, prompt_tokens)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+class FakeTelegramServer:
+    """
+    HTTP-заглушка Telegram Bot API с задержкой latency секунд на запрос
+
+    Используется вместе с TELEGRAM_API_URL; calls считает вызовы по методам.
+    """
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                method = self.path.split('?', 1)[0].rsplit('/', 1)[-1]
+                with server._lock:
+                    server.calls[method] += 1
+                time.sleep(server.latency)
+                result = True
+                if method.startswith(('send', 'edit')):
+                    result = {"message_id": 1, "date": int(time.time()),
+                              "chat": {"id": 1, "type": "private"}, "text": ""}
+                payload = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def count(self, method: str) -> int:
+        with self._lock:
+            return self.calls[method]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
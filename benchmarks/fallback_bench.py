@@ -0,0 +1,91 @@
+"""
+Бенчмарк базового анализатора (fallback) на 100 тыс. сообщений
+
+Корпус собирается из benchmarks/corpus.txt с разными именами, чтобы
+сообщения не повторялись. Сравнивается прежний разбор (список шаблонов,
+собираемый при каждом вызове, и первое совпадение) и FallbackParser с
+одним заранее скомпилированным выражением. Затем тот же корпус
+разбирается из нескольких потоков общим парсером, и результаты
+сверяются с однопоточными.
+
+Запуск из корня репозитория:
+    python -m benchmarks.fallback_bench [количество_сообщений] [потоков]
+"""
+import itertools
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.parser_bench import load_corpus
+from time_parser import fallback_parser
+
+NAMES = ("Иваном", "Петром", "Олей", "командой", "клиентом", "врачом", "мастером", "соседом")
+
+
+def legacy_fallback(text: str):
+    """Прежний fallback_parsing: шаблоны на каждый вызов, первое совпадение, несколько re.sub"""
+    time_patterns = [
+        r'(\d{1,2}:\d{2})',
+        r'\b(утром|днем|днём|вечером|ночью)\b',
+        r'\b(завтра|послезавтра|сегодня)\b',
+        r'\b(в \d{1,2} утра|в \d{1,2} дня|в \d{1,2} вечера)\b',
+        r'\b(на следующей неделе|через неделю)\b',
+        r'\b(в понедельник|во вторник|в среду|в четверг|в пятницу|в субботу|в воскресенье)\b',
+        r'\b(к понедельнику|ко вторнику|к среде|к четвергу|к пятнице|к субботе|к воскресенью)\b'
+    ]
+    found_time = "не указано"
+    description = text.strip()
+    for pattern in time_patterns:
+        match = re.search(pattern, text.lower())
+        if match:
+            found_time = match.group(1)
+            description = re.sub(pattern, '', text, flags=re.IGNORECASE).strip()
+            description = re.sub(r'\s+', ' ', description)
+            break
+    cleanup_patterns = [
+        r'\b(напомни|напоминай|напомнить)\b',
+        r'\b(мне|я должен|нужно)\b',
+        r'\b(в|на|к|до|после)\s*$'
+    ]
+    for pattern in cleanup_patterns:
+        description = re.sub(pattern, '', description, flags=re.IGNORECASE).strip()
+    return description or text.strip(), found_time
+
+
+def timed(name: str, func, corpus):
+    started = time.perf_counter()
+    results = [func(text) for text in corpus]
+    elapsed = time.perf_counter() - started
+    print(f"⏱ {name}: {elapsed:.2f} с, {len(corpus) / elapsed:,.0f} сообщений/с, "
+          f"{elapsed / len(corpus) * 1e6:.1f} мкс на сообщение")
+    return results
+
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    corpus = [text for text, _ in zip(itertools.cycle(load_corpus()), range(size))]
+    corpus = [f"{text} ({NAMES[index % len(NAMES)]} {index})" for index, text in enumerate(corpus)]
+    print(f"\n📚 Сообщений: {len(corpus):,}")
+
+    legacy = timed("прежний разбор", legacy_fallback, corpus)
+    single = timed("FallbackParser", fallback_parser.split, corpus)
+
+    with_time = sum(1 for _, fragments in single if fragments)
+    legacy_with_time = sum(1 for _, found in legacy if found != "не указано")
+    combined = sum(1 for _, fragments in single if len(fragments) > 1)
+    print(f"🕐 Время найдено: было {legacy_with_time:,}, стало {with_time:,}; "
+          f"из нескольких фрагментов (дата + часы): {combined:,}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        parallel = list(executor.map(fallback_parser.split, corpus, chunksize=1000))
+    elapsed = time.perf_counter() - started
+    status = "совпадают" if parallel == single else "РАСХОДЯТСЯ"
+    print(f"🧵 {threads} потоков, общий парсер: {elapsed:.2f} с, результаты {status} с однопоточными")
+
+
+if __name__ == "__main__":
+    main()
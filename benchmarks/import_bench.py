@@ -0,0 +1,49 @@
+"""
+Бенчмарк пакетного импорта задач
+
+Импортирует N строк (корпус повторяется с уникальными номерами, чтобы
+часть строк не разбиралась локально) через заглушку OpenAI с задержкой.
+
+Запуск из корня репозитория:
+    python -m benchmarks.import_bench [строк] [задержка_ИИ_в_секундах]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import ai_logic
+import logic
+import storage
+from benchmarks.fakes import FakeOpenAIServer
+from benchmarks.parser_bench import load_corpus
+from bulk_import import import_tasks
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+    corpus = load_corpus()
+    items = [{'text': f"{corpus[i % len(corpus)]} #{i}"} for i in range(lines)]
+
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency) as fake:
+        logic.DB_PATH = os.path.join(tmp, "import.db")
+        logic.init_db()
+        ai_logic.setup_ai("fake-key", fake.base_url)
+
+        started = time.perf_counter()
+        result = import_tasks(1, items)
+        elapsed = time.perf_counter() - started
+
+        print(f"\n📥 Импортировано {len(result['tasks'])} из {lines} строк за {elapsed:.2f} с")
+        print(f"   Источники: {result['sources']}")
+        print(f"   Запросов к ИИ: {fake.requests} (задержка {latency} с каждый)")
+        print(f"   Без пакетов и параллелизма только ИИ занял бы ~"
+              f"{(lines - result['sources'].get('local', 0)) * latency:.0f} с")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
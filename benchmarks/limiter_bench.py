@@ -0,0 +1,100 @@
+"""
+Бенчмарк лимита запросов к ИИ на пользователя
+
+1. Десятки тысяч активных пользователей: скорость проверки лимита и
+   память ведер.
+2. Вытеснение: ведра простаивающих пользователей удаляются сами.
+3. Спам: один пользователь шлет сотни сообщений подряд, остальные по
+   одному. Сверх лимита сообщения спамера разбираются базовым
+   анализатором, а запросы к ИИ остальных не страдают.
+
+Запуск из корня репозитория:
+    python -m benchmarks.limiter_bench [активных_пользователей]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+
+import ai_logic
+import logic
+import storage
+from ai_usage import get_user_usage
+from benchmarks.fakes import FakeOpenAIServer
+from benchmarks.parser_bench import load_corpus
+from rate_limit import UserRateLimiter
+
+SPAMMER_ID = 1
+SPAM_MESSAGES = 300
+OTHER_USERS = 50
+
+
+def bench_many_users(users: int):
+    limiter = UserRateLimiter(lambda user_id: 'premium' if user_id % 10 == 0 else 'default')
+    rng = random.Random(1)
+    calls = [rng.randrange(users) for _ in range(users * 5)]
+
+    tracemalloc.start()
+    for user_id in range(users):
+        limiter.allow(user_id)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for user_id in calls:
+        limiter.allow(user_id)
+    elapsed = time.perf_counter() - started
+    print(f"\n👥 {users:,} активных пользователей: {len(calls) / elapsed:,.0f} проверок/с "
+          f"({elapsed / len(calls) * 1e6:.2f} мкс), память {memory / users:.0f} байт на пользователя")
+    print(f"   Пропущено {limiter.stats['allowed']:,}, ограничено {limiter.stats['limited']:,}")
+
+
+def bench_eviction(users: int):
+    # Быстрый тариф: ведро наполняется за 0.1 с
+    limiter = UserRateLimiter(tiers={'default': (6000, 10)})
+    for user_id in range(users):
+        limiter.allow(user_id)
+    before = len(limiter)
+    time.sleep(limiter.idle_ttl * 2)
+    limiter.allow(users)
+    print(f"🧹 Вытеснение: ведер {before:,} -> {len(limiter):,} после простоя {limiter.idle_ttl * 2:.1f} с")
+
+
+def bench_spam():
+    corpus = [text for text in load_corpus() if ai_logic.local_parsing(text) is None]
+    with tempfile.TemporaryDirectory() as tmp, FakeOpenAIServer(latency=0) as fake:
+        logic.DB_PATH = os.path.join(tmp, "limiter.db")
+        logic.init_db()
+        ai_logic.setup_ai("fake-key", fake.base_url)
+        limiter = ai_logic.setup_rate_limit()
+
+        sources = Counter()
+        for i in range(SPAM_MESSAGES):
+            text = f"{corpus[i % len(corpus)]} спам {i}"
+            sources[ai_logic.process_natural_language(text, user_id=SPAMMER_ID).get('source')] += 1
+        others = Counter()
+        for user_id in range(2, OTHER_USERS + 2):
+            text = f"{corpus[user_id % len(corpus)]} от {user_id}"
+            others[ai_logic.process_natural_language(text, user_id=user_id).get('source')] += 1
+
+        print(f"🚫 Спамер: {SPAM_MESSAGES} сообщений, источники {dict(sources)}, "
+              f"запросов к ИИ {get_user_usage(SPAMMER_ID)['messages']}")
+        print(f"🙂 Остальные {OTHER_USERS}: источники {dict(others)}; "
+              f"всего запросов к заглушке {fake.requests}, ограничено {limiter.stats['limited']}")
+
+        ai_logic.limiter = None
+        storage.close_all()
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    bench_many_users(users)
+    bench_eviction(users)
+    bench_spam()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Бенчмарк очереди исходящих сообщений
+
+Заглушка Telegram отвечает с задержкой и возвращает 429, если бот
+превышает ~30 запросов в секунду или шлет в один чат чаще лимита.
+Обработчики (16 потоков, как у бота) отвечают на всплеск сообщений:
+"печатает" и ответ. Сравниваются прямые вызовы bot.* из обработчиков и
+Outbox: время обработчиков, число 429 и доставленных сообщений.
+
+Запуск из корня репозитория:
+    python -m benchmarks.outbox_bench [количество_обновлений]
+"""
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot.apihelper import ApiTelegramException
+
+from outbox import Outbox
+
+API_LATENCY = 0.02
+API_GLOBAL_LIMIT = 30
+API_CHAT_LIMIT = 3
+HANDLER_THREADS = 16
+CHATS = 100
+
+
+class FakeTelegram:
+    """Бот-заглушка: лимиты Telegram по скользящему окну в 1 с (на бота) и 3 с (на чат)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sent = deque()
+        self._chat_sent = {}
+        self.messages = 0
+        self.actions = 0
+        self.too_many = 0
+
+    def _request(self, chat_id, counted: bool):
+        time.sleep(API_LATENCY)
+        with self._lock:
+            now = time.monotonic()
+            while self._sent and self._sent[0] < now - 1:
+                self._sent.popleft()
+            chat = self._chat_sent.setdefault(chat_id, deque())
+            while chat and chat[0] < now - 3:
+                chat.popleft()
+            if len(self._sent) >= API_GLOBAL_LIMIT or (counted and len(chat) >= API_CHAT_LIMIT):
+                self.too_many += 1
+                raise ApiTelegramException("sendMessage", None, {
+                    'error_code': 429, 'description': "Too Many Requests: retry after 1",
+                    'parameters': {'retry_after': 1}
+                })
+            self._sent.append(now)
+            if counted:
+                chat.append(now)
+
+    def send_message(self, chat_id, text, **kwargs):
+        self._request(chat_id, True)
+        with self._lock:
+            self.messages += 1
+
+    def send_chat_action(self, chat_id, action, **kwargs):
+        self._request(chat_id, False)
+        with self._lock:
+            self.actions += 1
+
+
+def run(updates: int, use_outbox: bool):
+    bot = FakeTelegram()
+    outbox = Outbox(bot)
+    if use_outbox:
+        outbox.start()
+    sender = outbox if use_outbox else bot
+    durations = []
+
+    def handle(index):
+        chat_id = index % CHATS
+        started = time.perf_counter()
+        try:
+            sender.send_chat_action(chat_id, 'typing')
+            sender.send_message(chat_id, f"Ответ {index}")
+        except ApiTelegramException:
+            pass
+        durations.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(HANDLER_THREADS) as executor:
+        list(executor.map(handle, range(updates)))
+    handled = time.perf_counter() - started
+    outbox.stop()
+    delivered = time.perf_counter() - started
+
+    durations.sort()
+    name = "Outbox" if use_outbox else "напрямую"
+    print(f"\n📤 {name}: обработчики {handled:.2f} с "
+          f"(p50 {durations[len(durations) // 2] * 1000:.2f} мс, "
+          f"p99 {durations[int(len(durations) * 0.99)] * 1000:.2f} мс), всё доставлено за {delivered:.2f} с")
+    print(f"   сообщений {bot.messages}/{updates}, \"печатает\" {bot.actions}, "
+          f"ответов 429: {bot.too_many}, пропущено \"печатает\": {outbox.stats['coalesced']}")
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    print(f"Обновлений: {updates}, чатов: {CHATS}, задержка API {API_LATENCY * 1000:.0f} мс")
+    run(updates, use_outbox=False)
+    run(updates, use_outbox=True)
+
+
+if __name__ == "__main__":
+    main()
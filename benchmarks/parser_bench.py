@@ -0,0 +1,55 @@
+"""
+Бенчмарк локального парсера задач
+
+Прогоняет корпус типичных сообщений через parse_task и показывает,
+какая доля разбирается без ИИ и сколько стоит разбор одного сообщения.
+
+Запуск из корня репозитория:
+    python -m benchmarks.parser_bench [повторов] [--verbose]
+"""
+import os
+import statistics
+import sys
+import time
+
+from time_parser import parse_task, FAST_PATH_CONFIDENCE
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus.txt")
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as corpus:
+        return [line.strip() for line in corpus if line.strip()]
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    repeats = int(args[0]) if args else 200
+    verbose = "--verbose" in sys.argv
+
+    corpus = load_corpus()
+    hits = 0
+    for text in corpus:
+        result = parse_task(text)
+        hit = result['confidence'] >= FAST_PATH_CONFIDENCE
+        hits += hit
+        if verbose:
+            mark = "⚡" if hit else "🤖"
+            print(f"{mark} {result['confidence']:.2f} {text!r} -> {result['description']!r} / {result['time']!r}")
+
+    timings = []
+    for _ in range(repeats):
+        for text in corpus:
+            started = time.perf_counter()
+            parse_task(text)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+
+    print(f"\n📚 Сообщений в корпусе: {len(corpus)}")
+    print(f"⚡ Разобрано локально: {hits} ({hits / len(corpus):.0%}), остальное уходит в ИИ")
+    print(f"⏱ Разбор одного сообщения: медиана {statistics.median(timings) * 1e6:.1f} мкс, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f} мкс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Проверка локального разбора задач (time_parser.parse_task)
+
+Запуск из корня репозитория (или python -m pytest benchmarks/parser_test.py):
+    python -m benchmarks.parser_test
+"""
+from datetime import datetime
+
+from ai_logic import fallback_parsing
+from time_parser import parse_task, FAST_PATH_CONFIDENCE
+
+# Воскресенье, 18.10.2026, полдень
+NOW = datetime(2026, 10, 18, 12, 0)
+
+
+def test_quantity_is_not_a_date():
+    for text in ("Купить 2.5 кг яблок", "Поставить тесто на 2.5 часа", "Встреча 25.12"):
+        parsed = parse_task(text, NOW)
+        assert parsed['description'] == text, parsed
+        assert parsed['due_at'] is None and parsed['confidence'] < FAST_PATH_CONFIDENCE, parsed
+    assert fallback_parsing("Купить 2.5 кг яблок")['description'] == "Купить 2.5 кг яблок"
+
+    parsed = parse_task("Купить 2.5 кг яблок завтра", NOW)
+    assert parsed['description'] == "Купить 2.5 кг яблок", parsed
+    assert parsed['due_at'] == datetime(2026, 10, 19, 9, 0), parsed
+
+
+def test_date_after_preposition_or_with_year():
+    parsed = parse_task("Сдать отчет к 25.12", NOW)
+    assert (parsed['description'], parsed['due_at']) == ("Сдать отчет", datetime(2026, 12, 25, 9, 0)), parsed
+    parsed = parse_task("Сдать отчет 25.12.2026", NOW)
+    assert (parsed['description'], parsed['due_at']) == ("Сдать отчет", datetime(2026, 12, 25, 9, 0)), parsed
+    # Несуществующая дата не дает уверенного разбора
+    assert parse_task("Сдать отчет до 31.02", NOW)['confidence'] < FAST_PATH_CONFIDENCE
+
+
+def test_passed_weekday_moves_to_next_week():
+    # Сегодня воскресенье, 12:00: утро уже прошло, 15:00 - еще нет
+    assert parse_task("В воскресенье утром пробежка", NOW)['due_at'] == datetime(2026, 10, 25, 9, 0)
+    assert parse_task("В воскресенье в 15:00 пробежка", NOW)['due_at'] == datetime(2026, 10, 18, 15, 0)
+    friday_afternoon = datetime(2026, 10, 23, 15, 0)
+    assert parse_task("Сдать отчет в пятницу", friday_afternoon)['due_at'] == datetime(2026, 10, 30, 9, 0)
+    assert parse_task("Сдать отчет в пятницу", NOW)['due_at'] == datetime(2026, 10, 23, 9, 0)
+
+
+def test_clock_and_relative_forms():
+    cases = {
+        "Встреча с Иваном завтра в 14:00": ("Встреча с Иваном", datetime(2026, 10, 19, 14, 0), 'exact'),
+        "Сдать отчет через 2 часа": ("Сдать отчет", datetime(2026, 10, 18, 14, 0), 'exact'),
+        "Проверить почту через 30 минут": ("Проверить почту", datetime(2026, 10, 18, 12, 30), 'exact'),
+        "Позвонить в банк в 2 дня": ("Позвонить в банк", datetime(2026, 10, 18, 14, 0), 'exact'),
+        # Время без даты, которое сегодня уже прошло, - завтра
+        "Созвон в 11:30": ("Созвон", datetime(2026, 10, 19, 11, 30), 'exact'),
+        "Напомни мне позвонить маме в 10 утра": ("Позвонить маме", datetime(2026, 10, 19, 10, 0), 'exact'),
+        "Забрать посылку послезавтра": ("Забрать посылку", datetime(2026, 10, 20, 9, 0), 'day'),
+    }
+    for text, (description, due_at, precision) in cases.items():
+        parsed = parse_task(text, NOW)
+        assert (parsed['description'], parsed['due_at'], parsed['precision']) == (description, due_at, precision), parsed
+        assert parsed['confidence'] >= FAST_PATH_CONFIDENCE, parsed
+
+
+def test_vague_time_goes_to_ai():
+    # Часть суток без даты понятна, но час выбран по умолчанию
+    parsed = parse_task("Купить хлеб вечером", NOW)
+    assert parsed['due_at'] == datetime(2026, 10, 18, 19, 0) and parsed['precision'] == 'part_of_day'
+    assert parsed['confidence'] >= FAST_PATH_CONFIDENCE
+    for text in ("Оплатить счета до конца месяца", "Сходить в магазин", "Обновить резюме на выходных"):
+        assert parse_task(text, NOW)['confidence'] < FAST_PATH_CONFIDENCE, text
+
+
+def main():
+    for test in (test_quantity_is_not_a_date, test_date_after_preposition_or_with_year,
+                 test_passed_weekday_moves_to_next_week, test_clock_and_relative_forms,
+                 test_vague_time_goes_to_ai):
+        test()
+        print(f"✅ {test.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Бенчмарк планировщика напоминаний
+
+Загружает много ожидающих напоминаний, проверяет, что в простое поток
+планировщика не тратит процессор, и измеряет скорость отправки пачки
+наступивших напоминаний с учетом лимитов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.reminders_bench [количество_напоминаний]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import logic
+import storage
+from outbox import GLOBAL_SEND_RATE, GLOBAL_SEND_BURST
+from rate_limit import TokenBucket
+from reminders import ReminderScheduler
+
+
+def main():
+    pending = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    burst = 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        logic.DB_PATH = os.path.join(tmp, "reminders.db")
+        logic.init_db()
+
+        now = int(time.time())
+        conn = storage.get_connection(logic.DB_PATH)
+        with conn:
+            # Далекие напоминания и пачка, наступающая через 2 секунды
+            conn.executemany(
+                "INSERT INTO tasks (user_id, description, time, due_at) VALUES (?, ?, ?, ?)",
+                [(i % 5000, f"Задача {i}", "позже", now + 3600 + i) for i in range(pending)]
+            )
+            conn.executemany(
+                "INSERT INTO tasks (user_id, description, time, due_at) VALUES (?, ?, ?, ?)",
+                [(100000 + i, f"Срочная {i}", "сейчас", now + 2) for i in range(burst)]
+            )
+
+        delivered = []
+        done = threading.Event()
+        # Общий лимит бота, как в очереди отправки
+        bucket = TokenBucket(GLOBAL_SEND_RATE, GLOBAL_SEND_BURST)
+
+        def send(chat_id, text, task_id):
+            bucket.consume()
+            delivered.append(chat_id)
+            if len(delivered) == burst:
+                done.set()
+
+        scheduler = ReminderScheduler(send)
+        started = time.perf_counter()
+        loaded = scheduler.load_pending()
+        print(f"\n📥 Загружено {loaded:,} напоминаний за {time.perf_counter() - started:.3f} с")
+
+        scheduler.start()
+        cpu_before = time.process_time()
+        time.sleep(1.5)
+        idle_cpu = time.process_time() - cpu_before
+        print(f"💤 Процессорное время за 1.5 с простоя: {idle_cpu * 1000:.1f} мс")
+
+        burst_started = time.perf_counter()
+        done.wait(timeout=60)
+        elapsed = time.perf_counter() - burst_started
+        print(f"📨 Отправлено {len(delivered)} из {burst} наступивших напоминаний "
+              f"за {elapsed:.2f} с после начала ожидания (лимит {GLOBAL_SEND_RATE} сообщений/с)")
+
+        scheduler.stop()
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
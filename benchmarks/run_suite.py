@@ -0,0 +1,338 @@
+"""
+Сквозной набор бенчмарков бота без доступа в сеть
+
+Бот (bot.py) работает против локальных заглушек Telegram Bot API и
+OpenAI с настраиваемой задержкой. Для каждого сценария измеряются
+пропускная способность, p50/p99 задержки операции и пик памяти
+(tracemalloc, отдельным прогоном, чтобы не искажать время). Результаты
+сохраняются в JSON в benchmarks/results/ и сравниваются с предыдущим
+запуском, поэтому регрессии между коммитами сразу видны.
+
+Сценарии:
+    add_list_clear   - пользователи добавляют задачи, смотрят список и очищают его
+    smart_add_burst  - всплеск одновременных умных добавлений через ИИ
+    bulk_import      - импорт списков задач, вставленных сообщением
+    browse_list      - листание длинного списка задач кнопками
+
+Запуск из корня репозитория:
+    python -m benchmarks.run_suite [--scenario ИМЯ ...] [--telegram-latency С] [--ai-latency С]
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeOpenAIServer, FakeTelegramServer
+from benchmarks.parser_bench import load_corpus
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+# Одинаковая нагрузка от запуска к запуску
+SEED = 20261018
+# Изменение больше этой доли считается регрессией при сравнении
+REGRESSION_THRESHOLD = 0.2
+
+
+class Workload:
+    """Генератор обновлений Telegram и прогон их через обработчики бота"""
+
+    def __init__(self, app):
+        self.app = app
+        self._update_id = 0
+
+    def _next_id(self) -> int:
+        self._update_id += 1
+        return self._update_id
+
+    def message(self, user_id: int, text: str):
+        return self.app.telebot.types.Update.de_json({
+            "update_id": self._next_id(),
+            "message": {
+                "message_id": self._update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+                "text": text
+            }
+        })
+
+    def callback(self, user_id: int, data: str):
+        return self.app.telebot.types.Update.de_json({
+            "update_id": self._next_id(),
+            "callback_query": {
+                "id": str(self._update_id),
+                "chat_instance": "bench",
+                "data": data,
+                "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+                "message": {"message_id": 1, "date": int(time.time()),
+                            "chat": {"id": user_id, "type": "private"}, "text": ""}
+            }
+        })
+
+    def run(self, updates) -> float:
+        """Обрабатывает обновления одной операции по порядку; возвращает время в секундах"""
+        started = time.perf_counter()
+        for update in updates:
+            self.app.bot.process_new_updates([update])
+        return time.perf_counter() - started
+
+
+def _run_concurrently(operations, threads: int):
+    """operations - список списков обновлений; каждая операция выполняется целиком в одном потоке"""
+    def run(item):
+        workload, updates = item
+        return workload.run(updates)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return list(pool.map(run, operations))
+
+
+def scenario_add_list_clear(app, args):
+    """Смесь: 60% добавлений с указанием времени, 30% просмотров списка, 10% очисток"""
+    rng = random.Random(SEED)
+    workload = Workload(app)
+    per_user = []
+    for user_id in range(1, args.users + 1):
+        operations = []
+        for step in range(args.operations):
+            roll = rng.random()
+            if roll < 0.6:
+                operations.append([
+                    workload.message(user_id, app.BUTTON_ADD),
+                    workload.message(user_id, f"Задача {step} пользователя {user_id}"),
+                    workload.message(user_id, rng.choice(["10:00", "утром", "вечером", "завтра в 15:30"])),
+                ])
+            elif roll < 0.9:
+                operations.append([workload.message(user_id, app.BUTTON_LIST)])
+            else:
+                operations.append([
+                    workload.message(user_id, app.BUTTON_CLEAR),
+                    workload.callback(user_id, "confirm_clear"),
+                ])
+        per_user.append(operations)
+
+    # Операции одного пользователя идут по порядку, пользователи - параллельно
+    def run_user(operations):
+        return [workload.run(updates) for updates in operations]
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        return [latency for latencies in pool.map(run_user, per_user) for latency in latencies]
+
+
+def scenario_smart_add_burst(app, args):
+    """Все пользователи одновременно отправляют задачу, которую локальный парсер не разбирает"""
+    corpus = [text for text in load_corpus() if app.ai_logic.local_parsing(text) is None]
+    workload = Workload(app)
+    operations = [
+        (workload, [workload.message(user_id, f"{corpus[user_id % len(corpus)]} №{user_id}-{time.time_ns()}")])
+        for user_id in range(1, args.burst + 1)
+    ]
+    return _run_concurrently(operations, args.burst)
+
+
+def scenario_bulk_import(app, args):
+    """Каждый пользователь вставляет список задач одним сообщением"""
+    corpus = load_corpus()
+    workload = Workload(app)
+    operations = []
+    for user_id in range(1, args.imports + 1):
+        lines = [f"{corpus[(user_id + i) % len(corpus)]} #{user_id}-{i}" for i in range(args.import_lines)]
+        operations.append((workload, [workload.message(user_id, "\n".join(lines))]))
+    return _run_concurrently(operations, args.threads)
+
+
+def scenario_browse_list(app, args):
+    """Пользователь с длинным списком открывает его и листает страницы вперед"""
+    user_id = 1
+    app.logic.add_tasks_bulk(user_id, [app.logic.Task.from_text(f"Задача {i}", "завтра в 10:00")
+                                             for i in range(args.list_size)])
+    workload = Workload(app)
+    rows, _ = app.logic.get_tasks_page(user_id)
+    latencies = [workload.run([workload.message(user_id, app.BUTTON_LIST)])]
+    page = 0
+    while True:
+        rows, has_more = app.logic.get_tasks_page(user_id, after=(rows[-1].sort_key, rows[-1].id))
+        if not rows:
+            break
+        page += 1
+        last = rows[-1]
+        data = f"tasks:n:{page}:{last.id}:{last.sort_key}"
+        latencies.append(workload.run([workload.callback(user_id, data)]))
+        if not has_more:
+            break
+    return latencies
+
+
+SCENARIOS = {
+    "add_list_clear": scenario_add_list_clear,
+    "smart_add_burst": scenario_smart_add_burst,
+    "bulk_import": scenario_bulk_import,
+    "browse_list": scenario_browse_list,
+}
+
+
+def _percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def _prepare_database(app, tmp: str, name: str):
+    app.logic.DB_PATH = os.path.join(tmp, f"{name}.db")
+    app.storage.close_all()
+    app.logic.init_db()
+
+
+def run_scenario(app, name: str, args, tmp: str, telegram, openai_server):
+    """Прогон для времени, затем отдельный прогон под tracemalloc для памяти"""
+    _prepare_database(app, tmp, name)
+    telegram_before, ai_before = sum(telegram.calls.values()), openai_server.requests
+    started = time.perf_counter()
+    latencies = SCENARIOS[name](app, args)
+    elapsed = time.perf_counter() - started
+    telegram_calls = sum(telegram.calls.values()) - telegram_before
+    ai_requests = openai_server.requests - ai_before
+
+    peak = None
+    if not args.no_memory:
+        _prepare_database(app, tmp, f"{name}_memory")
+        tracemalloc.start()
+        SCENARIOS[name](app, args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "operations": len(latencies),
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "peak_memory_mb": round(peak / 1024 / 1024, 2) if peak is not None else None,
+        "telegram_calls": telegram_calls,
+        "ai_requests": ai_requests,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _previous_results(exclude: str):
+    files = sorted(path for path in glob.glob(os.path.join(RESULTS_DIR, "*.json")) if path != exclude)
+    if not files:
+        return None, None
+    with open(files[-1], encoding="utf-8") as previous:
+        return files[-1], json.load(previous)
+
+
+def compare(current, previous):
+    """Печатает изменение p50/p99/пропускной способности относительно прошлого запуска"""
+    for name, result in current["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before:
+            continue
+        changes = []
+        for key, higher_is_better in (("throughput", True), ("p50_ms", False), ("p99_ms", False)):
+            if not before.get(key):
+                continue
+            change = (result[key] - before[key]) / before[key]
+            worse = change < -REGRESSION_THRESHOLD if higher_is_better else change > REGRESSION_THRESHOLD
+            changes.append(f"{key} {change:+.0%}{' ⚠️' if worse else ''}")
+        print(f"   {name}: {', '.join(changes)}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Сквозной набор бенчмарков бота")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Сценарий (можно несколько); по умолчанию все")
+    parser.add_argument("--telegram-latency", type=float, default=0.02)
+    parser.add_argument("--ai-latency", type=float, default=0.5)
+    parser.add_argument("--users", type=int, default=20, help="Пользователей в add_list_clear")
+    parser.add_argument("--operations", type=int, default=20, help="Операций на пользователя в add_list_clear")
+    parser.add_argument("--threads", type=int, default=16, help="Параллельных потоков обработки")
+    parser.add_argument("--burst", type=int, default=100, help="Одновременных сообщений в smart_add_burst")
+    parser.add_argument("--imports", type=int, default=5, help="Списков в bulk_import")
+    parser.add_argument("--import-lines", type=int, default=100, help="Строк в каждом списке")
+    parser.add_argument("--list-size", type=int, default=2000, help="Задач в browse_list")
+    parser.add_argument("--no-memory", action="store_true", help="Не измерять память")
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/<время>-<коммит>.json)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scenarios = args.scenario or list(SCENARIOS)
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeTelegramServer(args.telegram_latency) as telegram, \
+            FakeOpenAIServer(args.ai_latency) as openai_server:
+        os.environ.update({
+            "BOT_TOKEN": "123456:fake",
+            "OPENAI_API_KEY": "fake",
+            "TELEGRAM_API_URL": telegram.base_url,
+            "OPENAI_BASE_URL": openai_server.base_url,
+            "STATE_STORE": "sqlite",
+        })
+
+        # Модули бота импортируются только после настройки окружения и пути к базе
+        import logic
+        logic.DB_PATH = os.path.join(tmp, "startup.db")
+        import ai_logic
+        import bot
+        import storage
+        import telebot
+        from ai_dispatcher import start_dispatcher, stop_dispatcher
+
+        bot.create_app()
+        app = SimpleNamespace(bot=bot.bot, logic=logic, storage=storage, ai_logic=ai_logic,
+                            telebot=telebot, BUTTON_ADD=bot.BUTTON_ADD,
+                            BUTTON_LIST=bot.BUTTON_LIST, BUTTON_CLEAR=bot.BUTTON_CLEAR)
+        # Параллелизм задает сам набор: обработчики выполняются в потоке вызова
+        bot.bot.threaded = False
+        start_dispatcher()
+
+        results = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "config": {key: value for key, value in vars(args).items() if key not in ("scenario", "output")},
+            "scenarios": {},
+        }
+        try:
+            for name in scenarios:
+                result = run_scenario(app, name, args, tmp, telegram, openai_server)
+                results["scenarios"][name] = result
+                memory = f", память {result['peak_memory_mb']} МБ" if result['peak_memory_mb'] is not None else ""
+                print(f"\n🏁 {name}: {result['operations']} операций за {result['seconds']:.2f} с, "
+                      f"{result['throughput']:.1f} оп/с, p50 {result['p50_ms']:.1f} мс, "
+                      f"p99 {result['p99_ms']:.1f} мс{memory}")
+        finally:
+            stop_dispatcher()
+            storage.close_all()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json")
+    previous_path, previous = _previous_results(output)
+    with open(output, "w", encoding="utf-8") as result_file:
+        json.dump(results, result_file, ensure_ascii=False, indent=2)
+    print(f"\n💾 Результаты сохранены в {output}")
+
+    if previous:
+        print(f"📊 Сравнение с {os.path.basename(previous_path)} (коммит {previous.get('commit')}):")
+        compare(results, previous)
+
+
+if __name__ == "__main__":
+    main()
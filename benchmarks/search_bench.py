@@ -0,0 +1,72 @@
+"""
+Бенчмарк полнотекстового поиска задач
+
+Заполняет базу задачами одного активного пользователя и фоном чужих
+задач, затем сравнивает search_tasks (FTS5) с перебором LIKE '%...%',
+который для ранжирования должен прочитать все задачи пользователя.
+Корпус из нескольких десятков шаблонов - худший случай: каждое слово
+встречается в сотнях задач.
+
+Запуск из корня репозитория:
+    python -m benchmarks.search_bench [задач_пользователя] [задач_остальных]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import logic
+import storage
+from benchmarks.parser_bench import load_corpus
+
+QUERIES = ["молоко", "встреча с Иваном", "презентацию", "позвонить маме", "отчет", "стоматолог"]
+REPEATS = 50
+
+
+def _timings(func):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, sorted(timings)[int(len(timings) * 0.99)] * 1000
+
+
+def main():
+    own = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    others = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+
+    rng = random.Random(1)
+    corpus = load_corpus()
+    with tempfile.TemporaryDirectory() as tmp:
+        logic.DB_PATH = os.path.join(tmp, "search.db")
+        logic.init_db()
+        conn = storage.get_connection(logic.DB_PATH)
+
+        started = time.perf_counter()
+        with conn:
+            conn.executemany(
+                "INSERT INTO tasks (user_id, description, time) VALUES (?, ?, 'завтра')",
+                ((1 if i < own else 2 + i % 1000, f"{rng.choice(corpus)} {i}") for i in range(own + others))
+            )
+        print(f"\n📥 {own:,} задач пользователя и {others:,} чужих вставлены за "
+              f"{time.perf_counter() - started:.1f} с (вместе с индексом)")
+
+        for query in QUERIES:
+            rows, _ = logic.search_tasks(1, query)
+            fts = _timings(lambda: logic.search_tasks(1, query))
+            like = _timings(lambda: conn.execute(
+                "SELECT id, description FROM tasks WHERE user_id = ? AND description LIKE ?",
+                (1, f"%{query.split()[0][:-1]}%")).fetchall())
+            print(f"🔎 {query!r}: {len(rows)} на первой странице, FTS5 p50 {fts[0]:.2f} мс / p99 {fts[1]:.2f} мс, "
+                  f"LIKE p50 {like[0]:.2f} мс")
+            if rows:
+                print(f"   первый результат: {rows[0].description!r}")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
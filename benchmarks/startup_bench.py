@@ -0,0 +1,83 @@
+"""
+Бенчмарк холодного запуска бота
+
+Каждый замер - отдельный процесс Python, поэтому модули и кэши
+интерпретатора не переиспользуются. Измеряются:
+1. импорт bot.py;
+2. bot.create_app() на новой базе (миграции) и на уже созданной;
+3. первый запрос к ИИ: загрузка openai и создание клиента, отложенные
+   из запуска.
+
+Запуск из корня репозитория:
+    python -m benchmarks.startup_bench [повторов]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+START_APP = """
+import json, sys, time
+started = time.perf_counter()
+import bot
+imported = time.perf_counter()
+bot.create_app()
+ready = time.perf_counter()
+print(json.dumps({"import": imported - started, "create_app": ready - imported,
+                  "openai_loaded": "openai" in sys.modules}))
+"""
+
+FIRST_AI_REQUEST = """
+import json, time
+import ai_logic
+ai_logic.setup_ai("fake-key")
+started = time.perf_counter()
+ai_logic.get_client()
+print(json.dumps({"client": time.perf_counter() - started}))
+"""
+
+
+def run_python(code: str, cwd: str):
+    """Выполняет код в новом процессе; возвращает (время процесса целиком, вывод JSON)"""
+    env = dict(os.environ, PYTHONPATH=ROOT, BOT_TOKEN="123456:fake", OPENAI_API_KEY="fake")
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    elapsed = time.perf_counter() - started
+    return elapsed, json.loads(output.strip().splitlines()[-1])
+
+
+def median_ms(values) -> str:
+    return f"{statistics.median(values) * 1000:.0f} мс"
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fresh = []
+        for index in range(runs):
+            workdir = os.path.join(tmp, f"fresh{index}")
+            os.mkdir(workdir)
+            fresh.append(run_python(START_APP, workdir))
+        existing = [run_python(START_APP, os.path.join(tmp, "fresh0")) for _ in range(runs)]
+        first_ai = [run_python(FIRST_AI_REQUEST, tmp)[1]['client'] for _ in range(runs)]
+
+    print(f"\n🚀 Холодный запуск, медиана {runs} процессов:")
+    print(f"   импорт bot.py: {median_ms([result['import'] for _, result in existing])}")
+    print(f"   create_app() на новой базе: {median_ms([result['create_app'] for _, result in fresh])}, "
+          f"на существующей: {median_ms([result['create_app'] for _, result in existing])}")
+    print(f"   процесс целиком (интерпретатор + импорт + create_app): "
+          f"{median_ms([elapsed for elapsed, _ in existing])}")
+    loaded = any(result['openai_loaded'] for _, result in fresh + existing)
+    print(f"   openai загружен при запуске: {'да' if loaded else 'нет'}")
+    print(f"🤖 Первый запрос к ИИ: загрузка openai и клиент {median_ms(first_ai)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Бенчмарк хранилищ состояний диалогов
+
+Эмулирует пользователей, которые начали добавление задачи и ушли:
+для каждого записывается состояние, которое никто не удаляет. Для
+хранилища в памяти измеряется пик памяти (он должен упереться в
+STATE_MAX_ENTRIES), для SQLite - скорость операций.
+
+Запуск из корня репозитория:
+    python -m benchmarks.state_bench [количество_пользователей]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import logic
+from state_store import MemoryStateStore, SQLiteStateStore, STATE_MAX_ENTRIES
+
+
+def bench_memory(users: int):
+    store = MemoryStateStore()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for user_id in range(users):
+        store[user_id] = {'state': 'waiting_task_time', 'description': f"Задача {user_id}"}
+        if user_id % 10 == 0:
+            store.get(user_id // 2)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"🧠 Память: {users:,} пользователей за {elapsed:.2f} с, "
+          f"в хранилище {len(store):,} (лимит {STATE_MAX_ENTRIES:,}), пик {peak / 1024 / 1024:.1f} МБ")
+
+
+def bench_sqlite(users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        logic.DB_PATH = os.path.join(tmp, "states.db")
+        logic.init_db()
+        store = SQLiteStateStore()
+
+        started = time.perf_counter()
+        for user_id in range(users):
+            store[user_id] = {'state': 'waiting_task_time', 'description': f"Задача {user_id}"}
+        write_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for user_id in range(users):
+            store.get(user_id)
+        read_elapsed = time.perf_counter() - started
+
+        print(f"💾 SQLite: запись {users / write_elapsed:,.0f}/с, чтение {users / read_elapsed:,.0f}/с")
+
+        # Перезапуск: новое хранилище видит те же состояния
+        assert SQLiteStateStore().get(users - 1)['state'] == 'waiting_task_time'
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    bench_memory(users)
+    bench_sqlite(min(users, 20000))
+
+
+if __name__ == "__main__":
+    main()
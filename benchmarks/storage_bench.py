@@ -0,0 +1,106 @@
+"""
+Микро-бенчмарк слоя хранения: операции в секунду до и после пула соединений
+
+Запуск из корня репозитория:
+    python -m benchmarks.storage_bench [количество_операций]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import logic
+import storage
+from models import Task
+from task_cache import task_cache
+
+
+def legacy_add_task(db_path: str, user_id: int, description: str, time_text: str):
+    """Старый путь: новое соединение и rollback-журнал на каждый вызов"""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO tasks (user_id, description, time) VALUES (?, ?, ?)",
+        (user_id, description.strip(), time_text.strip())
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_get_tasks_count(db_path: str, user_id: int):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM tasks WHERE user_id = ?", (user_id,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+def legacy_init(db_path: str):
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        time TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    conn.commit()
+    conn.close()
+
+
+def measure(label: str, operations: int, func):
+    """Выполняет func(i) operations раз и печатает ops/sec"""
+    started = time.perf_counter()
+    for i in range(operations):
+        func(i)
+    elapsed = time.perf_counter() - started
+    rate = operations / elapsed if elapsed else float('inf')
+    print(f"{label:<32} {rate:>12,.0f} ops/sec")
+    return rate
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        pooled_path = os.path.join(tmp, "pooled.db")
+
+        legacy_init(legacy_path)
+        logic.DB_PATH = pooled_path
+        logic.init_db()
+
+        print(f"\n📊 {operations} операций на сценарий\n")
+        before_add = measure("add_task (до)", operations,
+                             lambda i: legacy_add_task(legacy_path, i % 100, f"Задача {i}", "вечером"))
+        after_add = measure("add_task (после)", operations,
+                            lambda i: logic.add_task(i % 100, Task.from_text(f"Задача {i}", "вечером")))
+        before_count = measure("get_tasks_count (до)", operations,
+                               lambda i: legacy_get_tasks_count(legacy_path, i % 100))
+        # Кэш задач сбрасывается перед каждым вызовом, чтобы мерить именно запрос к базе
+        after_count = measure("get_tasks_count (после)", operations,
+                              lambda i: (task_cache.clear(), logic.get_tasks_count(i % 100)))
+        cached_count = measure("get_tasks_count (кэш задач)", operations,
+                               lambda i: logic.get_tasks_count(i % 100))
+        cold_page = measure("get_tasks_page (без кэша)", operations,
+                            lambda i: (task_cache.clear(), logic.get_tasks_page(i % 100)))
+        cached_page = measure("get_tasks_page (кэш задач)", operations,
+                              lambda i: logic.get_tasks_page(i % 100))
+
+        print(f"\nУскорение add_task: x{after_add / before_add:.1f}")
+        print(f"Ускорение get_tasks_count: x{after_count / before_count:.1f}, "
+              f"с кэшем x{cached_count / before_count:.1f}")
+        print(f"Ускорение первой страницы за счет кэша: x{cached_page / cold_page:.1f}")
+        stats = task_cache.get_stats()
+        print(f"Кэш задач: попаданий {stats['hit_rate']:.0%}, пользователей {stats['users']}, "
+              f"{stats['memory_bytes'] / 1024:.0f} КБ")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Проверка поиска похожих задач, их объединения и постраничного списка
+
+1. find_duplicate находит ту же задачу в другой форме слов, но не путает
+   задачи, отличающиеся номером.
+2. Объединение без времени оставляет задаче ее время, со временем -
+   переносит ее и снова планирует напоминание.
+3. get_tasks_page проходит все задачи вперед и назад по курсорам без
+   пропусков и повторов.
+
+Запуск из корня репозитория (или python -m pytest benchmarks/tasks_test.py):
+    python -m benchmarks.tasks_test
+"""
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+
+import bot
+import logic
+import storage
+from models import Task
+
+TIMEZONE = "Europe/Moscow"
+USER_DUPLICATES = 1
+USER_PAGES = 2
+
+_tmp = None
+
+
+def setup_module(module=None):
+    """Временная база для задач"""
+    global _tmp
+    _tmp = tempfile.mkdtemp()
+    logic.DB_PATH = os.path.join(_tmp, "tasks_test.db")
+    logic.init_db()
+
+
+def teardown_module(module=None):
+    storage.close_all()
+    shutil.rmtree(_tmp, ignore_errors=True)
+
+
+def _task(description: str, time_text: str) -> Task:
+    return Task.from_text(description, time_text, timezone=TIMEZONE)
+
+
+def test_find_duplicate():
+    task_id = logic.add_task(USER_DUPLICATES, _task("Записаться к врачу", "завтра в 10:00"))
+    logic.add_task(USER_DUPLICATES, _task("Позвонить клиенту номер 4", "завтра в 12:00"))
+
+    duplicate = logic.find_duplicate(USER_DUPLICATES, "Запись к врачу")
+    assert duplicate is not None and duplicate[0] == task_id, duplicate
+    assert logic.find_duplicate(USER_DUPLICATES, "Позвонить клиенту номер 5") is None
+    assert logic.find_duplicate(USER_DUPLICATES, "Купить хлеб") is None
+
+
+def test_merge_without_time_keeps_due_at():
+    original = _task("Забрать посылку", "завтра в 18:00")
+    task_id = logic.add_task(USER_DUPLICATES, original)
+
+    merged = bot.merge_task(USER_DUPLICATES, task_id, _task("Забрать посылку", ""))
+    assert merged is not None and merged.id == task_id, merged
+    assert (merged.time, merged.due_at) == (original.time, original.due_at), merged
+    assert logic.get_task(USER_DUPLICATES, task_id).due_at == original.due_at
+
+
+def test_merge_with_time_reschedules():
+    task_id = logic.add_task(USER_DUPLICATES, _task("Оплатить интернет", "завтра в 9:00"))
+    later = _task("Оплатить интернет", "послезавтра в 20:00")
+
+    merged = bot.merge_task(USER_DUPLICATES, task_id, later)
+    assert merged is later
+    stored = logic.get_task(USER_DUPLICATES, task_id)
+    assert (stored.time, stored.due_at) == (later.time, later.due_at), stored
+    assert (later.due_at, task_id) in [entry[:2] for entry in bot.reminder_scheduler._heap]
+    assert bot.merge_task(USER_DUPLICATES, task_id + 1000, later) is None
+
+
+def test_tasks_page_both_directions():
+    start = datetime(2030, 1, 1, 9, 0)
+    # Задачи добавлены не по порядку времени; две задачи с одинаковым временем
+    # и несколько без времени проверяют второй ключ курсора (id)
+    dated = [_task(f"Задача {i}", (start + timedelta(hours=(i * 7) % 45)).strftime("%d.%m.%Y %H:%M"))
+             for i in range(45)]
+    dated.append(_task("Задача в то же время", start.strftime("%d.%m.%Y %H:%M")))
+    undated = [_task(f"Задача без времени {i}", "") for i in range(5)]
+    assert all(task.due_at is not None for task in dated)
+    logic.add_tasks_bulk(USER_PAGES, dated + undated)
+    expected = [task.id for task in sorted(dated + undated, key=lambda task: (task.sort_key, task.id))]
+    limit = 20
+
+    forward, cursor, has_more = [], None, True
+    while has_more:
+        page, has_more = logic.get_tasks_page(USER_PAGES, after=cursor, limit=limit)
+        forward.append([task.id for task in page])
+        cursor = (page[-1].sort_key, page[-1].id)
+    assert [len(page) for page in forward] == [20, 20, 11], forward
+    assert sum(forward, []) == expected
+
+    backward, cursor, has_more = [], cursor, True
+    while has_more:
+        page, has_more = logic.get_tasks_page(USER_PAGES, before=cursor, limit=limit)
+        backward.insert(0, [task.id for task in page])
+        cursor = (page[0].sort_key, page[0].id)
+    # Назад от последней задачи: она сама не входит, страницы идут по возрастанию
+    assert [len(page) for page in backward] == [10, 20, 20], backward
+    assert sum(backward, []) == expected[:-1]
+
+    first_page, has_more = logic.get_tasks_page(USER_PAGES)
+    assert [task.id for task in first_page] == expected[:logic.TASKS_PAGE_SIZE] and has_more
+
+
+def main():
+    setup_module()
+    try:
+        for test in (test_find_duplicate, test_merge_without_time_keeps_due_at,
+                     test_merge_with_time_reschedules, test_tasks_page_both_directions):
+            test()
+            print(f"✅ {test.__name__}")
+    finally:
+        teardown_module()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Нагрузочный бенчмарк режима webhook
+
+Поднимает заглушки Telegram и OpenAI, запускает WebhookDispatcher с
+разным числом процессов и отправляет ему синтетические обновления от
+многих пользователей. Пропускная способность считается по числу
+отправленных ботом ответов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.webhook_bench [обновлений] [задержка_telegram]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeOpenAIServer, FakeTelegramServer
+
+WORKER_COUNTS = (1, 2, 4)
+USERS = 200
+CLIENT_THREADS = 32
+
+
+def _update(update_id: int, user_id: int, text: str) -> bytes:
+    return json.dumps({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "User"},
+            "text": text
+        }
+    }).encode()
+
+
+def _post(url: str, body: bytes):
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def _wait_for(telegram: FakeTelegramServer, expected: int, timeout: float = 120.0) -> bool:
+    deadline = time.time() + timeout
+    while telegram.count('sendMessage') < expected:
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def run_once(workers: int, updates: int, telegram: FakeTelegramServer) -> float:
+    from webhook import WebhookDispatcher
+
+    dispatcher = WebhookDispatcher(workers=workers, host='127.0.0.1', port=0, secret=None)
+    dispatcher.start()
+    server = threading.Thread(target=dispatcher.serve_forever, daemon=True)
+    server.start()
+    url = f"http://127.0.0.1:{dispatcher.port}/"
+
+    try:
+        # Прогрев: каждый процесс импортирует бота и отвечает на /start
+        base = telegram.count('sendMessage')
+        for user_id in range(workers):
+            _post(url, _update(user_id, user_id, "/start"))
+        _wait_for(telegram, base + workers)
+
+        base = telegram.count('sendMessage')
+        bodies = [_update(1000 + i, i % USERS, f"Купить молоко {i} завтра в 10:00") for i in range(updates)]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CLIENT_THREADS) as pool:
+            list(pool.map(lambda body: _post(url, body), bodies))
+        if not _wait_for(telegram, base + updates):
+            print("⚠️ Не все обновления обработаны")
+        return updates / (time.perf_counter() - started)
+    finally:
+        dispatcher.stop()
+
+
+def main():
+    updates = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+
+    with FakeTelegramServer(latency) as telegram, FakeOpenAIServer(0.5) as openai_server:
+        os.environ.update({
+            "BOT_TOKEN": "123456:fake",
+            "TELEGRAM_API_URL": telegram.base_url,
+            "OPENAI_API_KEY": "fake",
+            "OPENAI_BASE_URL": openai_server.base_url,
+            "STATE_STORE": "sqlite",
+        })
+        print(f"\n📨 {updates} обновлений от {USERS} пользователей, задержка Telegram {latency * 1000:.0f} мс")
+        for workers in WORKER_COUNTS:
+            with tempfile.TemporaryDirectory() as tmp:
+                cwd = os.getcwd()
+                # logic.DB_PATH относительный: процессы работают с базой во временном каталоге
+                os.chdir(tmp)
+                try:
+                    rate = run_once(workers, updates, telegram)
+                finally:
+                    os.chdir(cwd)
+            print(f"⚙️ Процессов: {workers}: {rate:,.1f} обновлений/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Бенчмарк вставки задач: прямая запись против буфера с групповым коммитом
+
+Несколько потоков (как потоки обработчиков бота) вызывают add_task.
+Прямая запись делает транзакцию и коммит на каждую задачу, буфер -
+одну транзакцию на пачку. Сравнение выполняется для synchronous=NORMAL
+(режим по умолчанию) и FULL (fsync на каждый коммит).
+
+Запуск из корня репозитория:
+    python -m benchmarks.write_bench [вставок_на_поток]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import logic
+import storage
+from models import Task
+from write_buffer import start_write_buffer, stop_write_buffer
+
+THREAD_COUNTS = (1, 4, 16)
+SYNCHRONOUS = ("NORMAL", "FULL")
+
+
+def _run(threads: int, per_thread: int, synchronous: str, buffered: bool):
+    """Возвращает (вставок в секунду, p50 мс, p99 мс)"""
+    latencies = [[] for _ in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index: int):
+        logic._connect().execute(f"PRAGMA synchronous={synchronous}")
+        barrier.wait()
+        for i in range(per_thread):
+            started = time.perf_counter()
+            if not logic.add_task(1000 + index, Task.from_text(f"Задача {index}-{i}", "завтра в 10:00")):
+                raise RuntimeError("вставка не удалась")
+            latencies[index].append(time.perf_counter() - started)
+        storage.close_connection()
+
+    if buffered:
+        start_write_buffer(synchronous=synchronous)
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if buffered:
+        stop_write_buffer()
+
+    timings = sorted(value for values in latencies for value in values)
+    return (len(timings) / elapsed, statistics.median(timings) * 1000,
+            timings[int(len(timings) * 0.99)] * 1000)
+
+
+def main():
+    per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    # Во временном каталоге рядом с репозиторием: tmpfs не показал бы цену fsync
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        logic.DB_PATH = os.path.join(tmp, "write.db")
+        logic.init_db()
+
+        print()
+        for synchronous in SYNCHRONOUS:
+            for threads in THREAD_COUNTS:
+                direct = _run(threads, per_thread, synchronous, buffered=False)
+                buffered = _run(threads, per_thread, synchronous, buffered=True)
+                print(f"💾 synchronous={synchronous:<6} потоков {threads:>2}: "
+                      f"напрямую {direct[0]:>7,.0f}/с (p50 {direct[1]:.2f} мс, p99 {direct[2]:.2f} мс), "
+                      f"буфер {buffered[0]:>7,.0f}/с (p50 {buffered[1]:.2f} мс, p99 {buffered[2]:.2f} мс)")
+
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
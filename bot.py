@@ -1,299 +1,532 @@
 import telebot
-from telebot import types
-from logic import init_db, add_task, get_tasks, clear_tasks
-from ai_logic import process_natural_language, setup_ai
-from datetime import datetime
+from telebot import apihelper
+from logic import (
+    init_db, add_task, get_tasks_count, get_tasks_page, search_tasks, find_duplicate, reschedule_task,
+    get_task, clear_tasks, complete_task, get_db_stats
+)
+from storage import close_all
+from state_store import create_state_store
+from metrics import (
+    timed, instrument_telegram, start_metrics_server, get_summary, HANDLER_SECONDS, METRICS_PORT
+)
+from ai_cache import get_cache_stats
+from ai_usage import get_usage_summary
+from task_cache import get_task_cache_stats
+from user_settings import get_user_timezone, set_user_timezone, parse_timezone
+from reminders import ReminderScheduler
+from archive import Compactor
+from outbox import Outbox
+from models import Task
+from bulk_import import (
+    split_lines, parse_document, import_tasks, SUPPORTED_EXTENSIONS, MAX_IMPORT_FILE_SIZE
+)
+from ai_logic import process_natural_language, setup_ai, setup_rate_limit
+from ai_dispatcher import start_dispatcher, stop_dispatcher
+from write_buffer import start_write_buffer, stop_write_buffer
+from ui import (
+    MENU_BUTTONS, BUTTON_ADD, BUTTON_LIST, BUTTON_SMART_ADD, BUTTON_CLEAR, BUTTON_HELP, BUTTON_CANCEL,
+    HELP_TEXT, TASK_DESCRIPTION_PROMPT, SMART_ADD_PROMPT, TASK_TIME_PROMPT, INVALID_TIME_TEXT,
+    NO_TASKS_TEXT, NO_TASKS_TO_CLEAR_TEXT, MEDIA_NOT_SUPPORTED_TEXT, SAVE_ERROR_TEXT, AI_ERROR_TEXT,
+    IMPORT_TOO_LARGE_TEXT, IMPORT_EMPTY_TEXT, SEARCH_PROMPT, NO_SEARCH_RESULTS_TEXT,
+    INVALID_TIMEZONE_TEXT, SETTINGS_ERROR_TEXT, timezone_keyboard, timezone_text, timezone_set_text,
+    DUPLICATE_EXPIRED_TEXT, TASK_DONE_TEXT, TASK_NOT_FOUND_TEXT, reminder_keyboard, parse_done_callback,
+    duplicate_keyboard, duplicate_text, task_merged_text,
+    main_keyboard, cancel_keyboard, clear_confirm_keyboard, welcome_text, tasks_page_view,
+    parse_tasks_page_callback, search_results_view, parse_search_callback,
+    clear_confirm_text, task_added_text, ai_success_text, ai_failure_text, import_result_text,
+    stats_text, validate_time
+)
 from dotenv import load_dotenv
-import re
+from telebot.util import extract_arguments
+from dataclasses import asdict, replace
 import os
 
 load_dotenv()
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Необязательные адреса API (например, локальные заглушки для тестов)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
+# ID администраторов (через запятую), которым доступна команда /stats
+ADMIN_IDS = {int(admin_id) for admin_id in os.getenv("ADMIN_IDS", "").split(",") if admin_id.strip()}
+# Пользователи с повышенным лимитом запросов к ИИ (через запятую)
+PREMIUM_IDS = {int(user_id) for user_id in os.getenv("PREMIUM_IDS", "").split(",") if user_id.strip()}
+# Групповой коммит вставок задач (см. write_buffer.py)
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "").lower() in ("1", "true", "yes")
+# Потоки обработчиков: пока одни ждут ИИ, другие принимают сообщения
+BOT_THREADS = int(os.getenv("BOT_THREADS", "16"))
+
+bot = telebot.TeleBot(BOT_TOKEN, num_threads=BOT_THREADS)
+
+
+def user_tier(user_id: int) -> str:
+    """Тариф лимита запросов к ИИ (rate_limit.USER_RATE_TIERS)"""
+    if user_id in ADMIN_IDS:
+        return 'admin'
+    return 'premium' if user_id in PREMIUM_IDS else 'default'
+
+
+# Состояния диалогов (sqlite или memory, см. STATE_STORE)
+user_states = create_state_store()
+
+# Исходящие сообщения: обработчики не ждут HTTP, лимиты Telegram соблюдаются
+# в одном месте (см. outbox.py)
+outbox = Outbox(bot)
+
+reminder_scheduler = ReminderScheduler(
+    lambda chat_id, text, task_id: outbox.send_message(chat_id, text, reply_markup=reminder_keyboard(task_id))
+)
+
+# Выполненные и давно прошедшие задачи уходят в сжатый архив (см. archive.py)
+compactor = Compactor()
+
+
+def save_task(user_id: int, task: Task):
+    """Сохраняет задачу и планирует напоминание о ней; возвращает ID или False"""
+    task_id = add_task(user_id, task)
+    if task_id:
+        reminder_scheduler.schedule(task_id, user_id, task.description, task.time, task.due_at)
+    return task_id
+
+
+def merge_task(user_id: int, task_id: int, task: Task):
+    """
+    Переносит похожую задачу на время task вместо добавления новой
+
+    Если в новом сообщении времени нет, у задачи остаются ее время и
+    напоминание. Возвращает итоговую задачу или None.
+    """
+    if task.due_at is None:
+        return get_task(user_id, task_id)
+    if not reschedule_task(user_id, task_id, task):
+        return None
+    reminder_scheduler.schedule(task_id, user_id, task.description, task.time, task.due_at)
+    return task
+
+
+def offer_merge(chat_id: int, user_id: int, task: Task) -> bool:
+    """Предлагает объединить задачу с похожей, если она есть; True - предложение отправлено"""
+    duplicate = find_duplicate(user_id, task.description)
+    if duplicate is None:
+        return False
+    # Задача хранится с уже разобранным временем: "через 2 часа" считается
+    # от момента ввода, а не от нажатия кнопки
+    user_states[user_id] = {
+        'state': 'confirm_duplicate',
+        'task_id': duplicate[0],
+        'duplicate': duplicate[1],
+        'task': asdict(task)
+    }
+    outbox.send_message(chat_id, duplicate_text(duplicate, task), reply_markup=duplicate_keyboard())
+    return True
 
-bot = telebot.TeleBot(BOT_TOKEN)
 
-# Инициализация
-init_db()
-setup_ai(OPENAI_API_KEY)
+@bot.message_handler(commands=['start'])
+@timed(HANDLER_SECONDS)
+def start_command(message):
+    outbox.send_message(message.chat.id, welcome_text(message.from_user.first_name), reply_markup=main_keyboard())
 
-user_states = {}
 
+@bot.message_handler(commands=['help'])
+@timed(HANDLER_SECONDS)
+def help_command(message):
+    outbox.send_message(message.chat.id, HELP_TEXT, reply_markup=main_keyboard())
 
-def main_keyboard():
-    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    keyboard.row("➕ Добавить задачу", "📋 Мои задачи")
-    keyboard.row("🤖 Умное добавление", "🗑️ Очистить все")
-    keyboard.row("ℹ️ Помощь")
-    return keyboard
 
+@bot.message_handler(commands=['stats'], func=lambda message: message.from_user.id in ADMIN_IDS)
+@timed(HANDLER_SECONDS)
+def stats_command(message):
+    text = stats_text(get_summary(), get_db_stats(), get_cache_stats(), get_task_cache_stats(),
+                      get_usage_summary())
+    outbox.send_message(message.chat.id, text, reply_markup=main_keyboard())
 
-def cancel_keyboard():
-    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    keyboard.row("❌ Отмена")
-    return keyboard
 
+@bot.message_handler(commands=['find'])
+@timed(HANDLER_SECONDS)
+def find_command(message):
+    query = (extract_arguments(message.text) or "").strip()
+    if not query:
+        user_states[message.from_user.id] = "waiting_search_query"
+        outbox.send_message(message.chat.id, SEARCH_PROMPT, reply_markup=cancel_keyboard())
+        return
+    show_search_results(message, query)
 
-@bot.message_handler(commands=['start'])
-def start_command(message):
-    user_name = message.from_user.first_name
-    welcome_text = f"Привет, {user_name}! 👋\n\n"
-    welcome_text += "Я умный бот-ежедневник с поддержкой ИИ! 🤖\n"
-    welcome_text += "Я могу понимать естественный язык и автоматически создавать задачи.\n\n"
-    welcome_text += "Попробуйте написать что-то вроде:\n"
-    welcome_text += "• 'Напомни встретиться с Иваном завтра в 14:00'\n"
-    welcome_text += "• 'Позвони врачу на следующей неделе'\n"
-    welcome_text += "• 'Купить продукты вечером'\n\n"
-    welcome_text += "Выберите действие из меню:"
 
-    bot.send_message(message.chat.id, welcome_text, reply_markup=main_keyboard())
+@timed(HANDLER_SECONDS)
+def show_search_results(message, query: str):
+    rows, has_more = search_tasks(message.from_user.id, query)
 
+    if not rows:
+        outbox.send_message(message.chat.id, NO_SEARCH_RESULTS_TEXT, reply_markup=main_keyboard())
+        return
 
-@bot.message_handler(commands=['help'])
-def help_command(message):
-    help_text = "🤖 Как пользоваться умным ботом:\n\n"
-    help_text += "➕ Добавить задачу - классическое добавление с указанием времени\n"
-    help_text += "🤖 Умное добавление - опишите задачу естественным языком\n"
-    help_text += "📋 Мои задачи - посмотреть все ваши задачи\n"
-    help_text += "🗑️ Очистить все - удалить все задачи\n"
-    help_text += "ℹ️ Помощь - показать это сообщение\n\n"
-    help_text += "🧠 Примеры умного добавления:\n"
-    help_text += "• 'Встреча с клиентом завтра в 15:30'\n"
-    help_text += "• 'Купить молоко по дороге домой'\n"
-    help_text += "• 'Позвонить маме в выходные'\n"
-    help_text += "• 'Подготовить презентацию к понедельнику'\n"
-    help_text += "• 'Записаться к стоматологу через неделю'\n\n"
-    help_text += "ИИ автоматически определит описание задачи и время!"
-
-    bot.send_message(message.chat.id, help_text, reply_markup=main_keyboard())
+    text, keyboard = search_results_view(query, rows, has_more, 0)
+    outbox.send_message(message.chat.id, text, reply_markup=keyboard or main_keyboard())
 
 
-@bot.message_handler(
-    func=lambda message: message.text in ["➕ Добавить задачу", "📋 Мои задачи", "🤖 Умное добавление", "🗑️ Очистить все",
-                                          "ℹ️ Помощь"])
+@bot.message_handler(commands=['timezone'])
+@timed(HANDLER_SECONDS)
+def timezone_command(message):
+    user_id = message.from_user.id
+    argument = (extract_arguments(message.text) or "").strip()
+    if not argument:
+        timezone = get_user_timezone(user_id)
+        outbox.send_message(message.chat.id, timezone_text(timezone), reply_markup=timezone_keyboard())
+        return
+
+    timezone = parse_timezone(argument)
+    if timezone is None:
+        outbox.send_message(message.chat.id, INVALID_TIMEZONE_TEXT, reply_markup=main_keyboard())
+        return
+    outbox.send_message(message.chat.id, change_timezone(user_id, timezone), reply_markup=main_keyboard())
+
+
+def change_timezone(user_id: int, timezone: str) -> str:
+    """Сохраняет пояс пользователя и перепланирует напоминания его задач; возвращает ответ"""
+    moved = set_user_timezone(user_id, timezone)
+    if moved is None:
+        return SETTINGS_ERROR_TEXT
+    for task in moved:
+        reminder_scheduler.schedule(task.id, user_id, task.description, task.time, task.due_at)
+    return timezone_set_text(timezone, len(moved))
+
+
+@bot.message_handler(func=lambda message: message.text in MENU_BUTTONS)
+@timed(HANDLER_SECONDS)
 def handle_menu_buttons(message):
     user_id = message.from_user.id
 
-    if message.text == "➕ Добавить задачу":
+    if message.text == BUTTON_ADD:
         user_states[user_id] = "waiting_task_description"
-        bot.send_message(message.chat.id,
-                         "📝 Введите описание задачи:",
-                         reply_markup=cancel_keyboard())
+        outbox.send_message(message.chat.id, TASK_DESCRIPTION_PROMPT, reply_markup=cancel_keyboard())
 
-    elif message.text == "🤖 Умное добавление":
+    elif message.text == BUTTON_SMART_ADD:
         user_states[user_id] = "waiting_ai_input"
-        bot.send_message(message.chat.id,
-                         "🧠 Опишите задачу естественным языком!\n\n"
-                         "Примеры:\n"
-                         "• 'Встреча с Петром завтра в 10 утра'\n"
-                         "• 'Купить продукты вечером'\n"
-                         "• 'Позвонить в банк на следующей неделе'\n"
-                         "• 'Подготовить отчет к пятнице'\n\n"
-                         "Напишите свою задачу:",
-                         reply_markup=cancel_keyboard())
-
-    elif message.text == "📋 Мои задачи":
+        outbox.send_message(message.chat.id, SMART_ADD_PROMPT, reply_markup=cancel_keyboard())
+
+    elif message.text == BUTTON_LIST:
         show_tasks(message)
 
-    elif message.text == "🗑️ Очистить все":
+    elif message.text == BUTTON_CLEAR:
         confirm_clear(message)
 
-    elif message.text == "ℹ️ Помощь":
+    elif message.text == BUTTON_HELP:
         help_command(message)
 
 
+@timed(HANDLER_SECONDS)
 def show_tasks(message):
     user_id = message.from_user.id
-    tasks = get_tasks(user_id)
+    rows, has_more = get_tasks_page(user_id)
 
-    if not tasks:
-        bot.send_message(message.chat.id,
-                         "📭 У вас пока нет задач.\n"
-                         "Попробуйте умное добавление! 🤖",
-                         reply_markup=main_keyboard())
+    if not rows:
+        outbox.send_message(message.chat.id, NO_TASKS_TEXT, reply_markup=main_keyboard())
         return
 
-    tasks_text = "📋 Ваши задачи:\n\n"
-    for i, (description, time) in enumerate(tasks, 1):
-        tasks_text += f"{i}. 🕐 {time} - {description}\n"
-
-    bot.send_message(message.chat.id, tasks_text, reply_markup=main_keyboard())
+    text, keyboard = tasks_page_view(rows, has_more, 0)
+    outbox.send_message(message.chat.id, text, reply_markup=keyboard)
 
 
+@timed(HANDLER_SECONDS)
 def confirm_clear(message):
-    user_id = message.from_user.id
-    tasks = get_tasks(user_id)
+    count = get_tasks_count(message.from_user.id)
 
-    if not tasks:
-        bot.send_message(message.chat.id,
-                         "📭 У вас нет задач для удаления.",
-                         reply_markup=main_keyboard())
+    if not count:
+        outbox.send_message(message.chat.id, NO_TASKS_TO_CLEAR_TEXT, reply_markup=main_keyboard())
+        return
+
+    outbox.send_message(message.chat.id, clear_confirm_text(count), reply_markup=clear_confirm_keyboard())
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("tasks:"))
+@timed(HANDLER_SECONDS)
+def handle_tasks_page(call):
+    direction, page, cursor = parse_tasks_page_callback(call.data)
+    if cursor is None:
+        direction = "n"
+        rows, has_more = get_tasks_page(call.from_user.id)
+    elif direction == "n":
+        rows, has_more = get_tasks_page(call.from_user.id, after=cursor)
+    else:
+        rows, has_more = get_tasks_page(call.from_user.id, before=cursor)
+
+    outbox.answer_callback_query(call.id)
+    if not rows:
         return
 
-    keyboard = types.InlineKeyboardMarkup()
-    keyboard.row(
-        types.InlineKeyboardButton("✅ Да, удалить все", callback_data="confirm_clear"),
-        types.InlineKeyboardButton("❌ Отмена", callback_data="cancel_clear")
-    )
+    text, keyboard = tasks_page_view(rows, has_more, page, backwards=direction == "p")
+    outbox.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=keyboard)
+
 
-    bot.send_message(message.chat.id,
-                     f"🗑️ Вы уверены, что хотите удалить все {len(tasks)} задач(и)?",
-                     reply_markup=keyboard)
+@bot.callback_query_handler(func=lambda call: call.data.startswith("find:"))
+@timed(HANDLER_SECONDS)
+def handle_search_page(call):
+    page, query = parse_search_callback(call.data)
+    rows, has_more = search_tasks(call.from_user.id, query, page)
+
+    outbox.answer_callback_query(call.id)
+    if not rows:
+        return
+
+    text, keyboard = search_results_view(query, rows, has_more, page)
+    outbox.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=keyboard)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("tz:"))
+@timed(HANDLER_SECONDS)
+def handle_timezone_choice(call):
+    timezone = parse_timezone(call.data[3:])
+    outbox.answer_callback_query(call.id)
+    if timezone is None:
+        return
+    text = change_timezone(call.from_user.id, timezone)
+    outbox.edit_message_text(text, call.message.chat.id, call.message.message_id)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("dup:"))
+@timed(HANDLER_SECONDS)
+def handle_duplicate_choice(call):
+    user_id = call.from_user.id
+    state = user_states.pop(user_id, None)
+    outbox.answer_callback_query(call.id)
+
+    if not isinstance(state, dict) or state['state'] != 'confirm_duplicate' or 'task' not in state:
+        outbox.edit_message_text(DUPLICATE_EXPIRED_TEXT, call.message.chat.id, call.message.message_id)
+        return
+
+    task = Task(**state['task'])
+    if call.data == "dup:merge":
+        task = replace(task, description=state['duplicate'])
+        merged = merge_task(user_id, state['task_id'], task)
+        saved = merged is not None
+        text = task_merged_text(merged) if saved else None
+    else:
+        saved = save_task(user_id, task)
+        text = task_added_text(task)
+
+    outbox.edit_message_text(text if saved else SAVE_ERROR_TEXT, call.message.chat.id, call.message.message_id)
+
+
+@bot.callback_query_handler(func=lambda call: call.data.startswith("done:"))
+@timed(HANDLER_SECONDS)
+def handle_task_done(call):
+    task_id = parse_done_callback(call.data)
+    completed = task_id is not None and complete_task(call.from_user.id, task_id)
+    outbox.answer_callback_query(call.id, TASK_DONE_TEXT if completed else TASK_NOT_FOUND_TEXT)
+    if completed:
+        outbox.edit_message_text(f"{call.message.text}\n\n{TASK_DONE_TEXT}",
+                                 call.message.chat.id, call.message.message_id)
 
 
 @bot.callback_query_handler(func=lambda call: True)
+@timed(HANDLER_SECONDS)
 def handle_callbacks(call):
     user_id = call.from_user.id
 
     if call.data == "confirm_clear":
         clear_tasks(user_id)
-        bot.edit_message_text(
+        outbox.edit_message_text(
             "✅ Все задачи удалены!",
             call.message.chat.id,
             call.message.message_id
         )
-        bot.send_message(call.message.chat.id,
+        outbox.send_message(call.message.chat.id,
                          "Можете добавить новые задачи с помощью ИИ! 🤖",
                          reply_markup=main_keyboard())
 
     elif call.data == "cancel_clear":
-        bot.edit_message_text(
+        outbox.edit_message_text(
             "❌ Удаление отменено.",
             call.message.chat.id,
             call.message.message_id
         )
-        bot.send_message(call.message.chat.id,
+        outbox.send_message(call.message.chat.id,
                          "Ваши задачи сохранены.",
                          reply_markup=main_keyboard())
 
 
-@bot.message_handler(func=lambda message: message.text == "❌ Отмена")
+@bot.message_handler(func=lambda message: message.text == BUTTON_CANCEL)
+@timed(HANDLER_SECONDS)
 def handle_cancel(message):
     user_id = message.from_user.id
-    if user_id in user_states:
-        del user_states[user_id]
+    user_states.pop(user_id, None)
 
-    bot.send_message(message.chat.id,
+    outbox.send_message(message.chat.id,
                      "❌ Операция отменена.",
                      reply_markup=main_keyboard())
 
 
 @bot.message_handler(content_types=['text'])
+@timed(HANDLER_SECONDS)
 def handle_text(message):
     user_id = message.from_user.id
+    state = user_states.get(user_id)
 
-    if user_id not in user_states:
+    if isinstance(state, dict) and state['state'] == 'confirm_duplicate':
+        # Пользователь не ответил на предложение объединить задачи и пишет дальше
+        user_states.pop(user_id, None)
+        state = None
+
+    if state in (None, "waiting_ai_input"):
+        lines = split_lines(message.text)
+        if len(lines) > 1:
+            # Список задач, по одной на строку
+            run_import(message, [{'text': line} for line in lines])
+            return
+
+    if state is None:
         # Если пользователь просто пишет текст без выбора режима,
         # попробуем обработать его как умный ввод
         process_ai_input(message)
         return
 
-    state = user_states[user_id]
-
     if state == "waiting_ai_input":
         process_ai_input(message)
 
+    elif state == "waiting_search_query":
+        user_states.pop(user_id, None)
+        show_search_results(message, message.text.strip())
+
     elif state == "waiting_task_description":
         user_states[user_id] = {
             'state': 'waiting_task_time',
             'description': message.text
         }
-        bot.send_message(message.chat.id,
-                         "🕐 Введите время для задачи (например: 14:30, утром, вечером):",
-                         reply_markup=cancel_keyboard())
+        outbox.send_message(message.chat.id, TASK_TIME_PROMPT, reply_markup=cancel_keyboard())
 
     elif isinstance(state, dict) and state['state'] == 'waiting_task_time':
         time_text = message.text.strip()
 
         if validate_time(time_text):
-            description = state['description']
-            add_task(user_id, description, time_text)
-
-            success_text = f"✅ Задача добавлена!\n\n"
-            success_text += f"📝 Описание: {description}\n"
-            success_text += f"🕐 Время: {time_text}"
+            task = Task.from_text(state['description'], time_text, timezone=get_user_timezone(user_id))
+            user_states.pop(user_id, None)
+            if offer_merge(message.chat.id, user_id, task):
+                return
+            save_task(user_id, task)
 
-            bot.send_message(message.chat.id, success_text, reply_markup=main_keyboard())
-            del user_states[user_id]
+            outbox.send_message(message.chat.id, task_added_text(task), reply_markup=main_keyboard())
         else:
-            bot.send_message(message.chat.id,
-                             "❌ Неверный формат времени. Попробуйте еще раз:\n"
-                             "Примеры: 14:30, 9:00, утром, днем, вечером",
-                             reply_markup=cancel_keyboard())
+            outbox.send_message(message.chat.id, INVALID_TIME_TEXT, reply_markup=cancel_keyboard())
 
 
+@timed(HANDLER_SECONDS)
 def process_ai_input(message):
     user_id = message.from_user.id
+    # Очищаем состояние пользователя (предложение объединить задачи задает новое)
+    user_states.pop(user_id, None)
 
     try:
         # Показываем индикатор печати
-        bot.send_chat_action(message.chat.id, 'typing')
+        outbox.send_chat_action(message.chat.id, 'typing')
 
         # Обрабатываем текст с помощью ИИ
-        ai_result = process_natural_language(message.text)
+        ai_result = process_natural_language(message.text, get_user_timezone(user_id), user_id)
 
         if ai_result['success']:
-            description = ai_result['description']
-            time = ai_result['time']
-
+            if offer_merge(message.chat.id, user_id, ai_result['task']):
+                return
             # Добавляем задачу в базу данных
-            if add_task(user_id, description, time):
-                success_text = f"🤖 ИИ успешно обработал вашу задачу!\n\n"
-                success_text += f"📝 Описание: {description}\n"
-                success_text += f"🕐 Время: {time}\n\n"
-
-                if ai_result.get('explanation'):
-                    success_text += f"💡 Пояснение: {ai_result['explanation']}"
-
-                bot.send_message(message.chat.id, success_text, reply_markup=main_keyboard())
+            if save_task(user_id, ai_result['task']):
+                outbox.send_message(message.chat.id, ai_success_text(ai_result), reply_markup=main_keyboard())
             else:
-                bot.send_message(message.chat.id,
-                                 "❌ Ошибка при сохранении задачи. Попробуйте еще раз.",
-                                 reply_markup=main_keyboard())
+                outbox.send_message(message.chat.id, SAVE_ERROR_TEXT, reply_markup=main_keyboard())
         else:
-            error_text = f"❌ Не удалось обработать задачу: {ai_result.get('error', 'Неизвестная ошибка')}\n\n"
-            error_text += "Попробуйте переформулировать или воспользуйтесь обычным добавлением задачи."
-
-            bot.send_message(message.chat.id, error_text, reply_markup=main_keyboard())
+            outbox.send_message(message.chat.id, ai_failure_text(ai_result), reply_markup=main_keyboard())
 
     except Exception as e:
         print(f"Ошибка обработки ИИ: {e}")
-        bot.send_message(message.chat.id,
-                         "❌ Произошла ошибка при обработке. Попробуйте еще раз или воспользуйтесь обычным режимом.",
-                         reply_markup=main_keyboard())
+        outbox.send_message(message.chat.id, AI_ERROR_TEXT, reply_markup=main_keyboard())
 
-    # Очищаем состояние пользователя
-    if user_id in user_states:
-        del user_states[user_id]
 
+@timed(HANDLER_SECONDS)
+def run_import(message, items):
+    user_id = message.from_user.id
 
-def validate_time(time_str):
-    time_pattern = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
-    if re.match(time_pattern, time_str):
-        return True
+    if not items:
+        outbox.send_message(message.chat.id, IMPORT_EMPTY_TEXT, reply_markup=main_keyboard())
+        return
 
-    time_words = ['утром', 'утро', 'днем', 'день', 'вечером', 'вечер', 'ночью', 'ночь']
-    if time_str.lower() in time_words:
-        return True
+    try:
+        outbox.send_chat_action(message.chat.id, 'typing')
+        result = import_tasks(user_id, items)
+        for task in result['tasks']:
+            reminder_scheduler.schedule(task.id, user_id, task.description, task.time, task.due_at)
 
-    if len(time_str) > 0 and len(time_str) < 50:
-        return True
+        outbox.send_message(message.chat.id, import_result_text(result), reply_markup=main_keyboard())
+    except Exception as e:
+        print(f"Ошибка импорта задач: {e}")
+        outbox.send_message(message.chat.id, AI_ERROR_TEXT, reply_markup=main_keyboard())
 
-    return False
+    user_states.pop(user_id, None)
 
 
-@bot.message_handler(content_types=['photo', 'video', 'audio', 'document', 'voice', 'sticker'])
-def handle_media(message):
-    bot.send_message(message.chat.id,
-                     "Я работаю только с текстовыми сообщениями. 📝\n"
-                     "Попробуйте описать задачу текстом - я пойму! 🤖\n"
-                     "Выберите действие из меню:",
-                     reply_markup=main_keyboard())
+@bot.message_handler(
+    content_types=['document'],
+    func=lambda message: (message.document.file_name or '').lower().endswith(SUPPORTED_EXTENSIONS))
+@timed(HANDLER_SECONDS)
+def handle_import_document(message):
+    if message.document.file_size and message.document.file_size > MAX_IMPORT_FILE_SIZE:
+        outbox.send_message(message.chat.id, IMPORT_TOO_LARGE_TEXT, reply_markup=main_keyboard())
+        return
 
+    file_info = bot.get_file(message.document.file_id)
+    content = bot.download_file(file_info.file_path)
+    timezone = get_user_timezone(message.from_user.id)
+    run_import(message, parse_document(message.document.file_name, content, timezone))
 
-if __name__ == "__main__":
+
+@bot.message_handler(content_types=['photo', 'video', 'audio', 'document', 'voice', 'sticker'])
+@timed(HANDLER_SECONDS)
+def handle_media(message):
+    outbox.send_message(message.chat.id, MEDIA_NOT_SUPPORTED_TEXT, reply_markup=main_keyboard())
+
+
+def create_app():
+    """
+    Подготавливает бота к работе: адрес API, метрики, схема базы, ИИ и лимиты
+
+    Импорт модуля ничего не делает с базой и сетью (его используют
+    webhook.py и бенчмарки), все это происходит здесь. Клиент OpenAI
+    создается позже, при первом запросе к ИИ.
+
+    Returns:
+        Экземпляр telebot.TeleBot с зарегистрированными обработчиками
+    """
+    if TELEGRAM_API_URL:
+        apihelper.API_URL = TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
+    instrument_telegram(apihelper)
+    init_db()
+    setup_ai(OPENAI_API_KEY, OPENAI_BASE_URL)
+    # Один пользователь не может занять ИИ для всех: сверх лимита - базовый анализатор
+    setup_rate_limit(user_tier)
+    return bot
+
+
+def run():
+    """Запускает бота в режиме long polling и останавливает фоновые потоки при выходе"""
+    create_app()
+    print(f"⏰ Загружено напоминаний: {reminder_scheduler.load_pending()}")
+    outbox.start()
+    reminder_scheduler.start()
+    compactor.start()
+    start_dispatcher()
+    if WRITE_BEHIND:
+        start_write_buffer()
+    if METRICS_PORT:
+        start_metrics_server(int(METRICS_PORT))
     print("🤖 Умный бот с ИИ запущен...")
     try:
         bot.polling(none_stop=True)
     except Exception as e:
-        print(f"Ошибка: {e}")
\ No newline at end of file
+        print(f"Ошибка: {e}")
+    finally:
+        stop_dispatcher()
+        stop_write_buffer()
+        reminder_scheduler.stop()
+        compactor.stop()
+        outbox.stop()
+        close_all()
+
+
+if __name__ == "__main__":
+    run()
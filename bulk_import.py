@@ -0,0 +1,162 @@
+import csv
+import io
+import re
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, List, Optional
+
+from ai_logic import process_natural_language_batch
+from logic import add_tasks_bulk
+from models import Task, get_zone, is_valid_timezone, to_epoch
+from time_parser import PRECISION_EXACT, PRECISION_DAY
+from user_settings import get_user_timezone
+
+# Ограничения импорта, чтобы один файл не занял бота надолго
+MAX_IMPORT_LINES = 2000
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+SUPPORTED_EXTENSIONS = ('.txt', '.csv', '.ics')
+
+# Маркеры списков в начале строки: "1.", "2)", "-", "•", "[ ]"
+_LIST_MARKER_RE = re.compile(r'^\s*(?:(?:\d+[.)](?=\s)|[-*•—–]|\[[ xх]?\])\s*)+', re.IGNORECASE)
+
+
+def split_lines(text: str) -> List[str]:
+    """Разбивает вставленный список на отдельные задачи"""
+    lines = []
+    for line in text.splitlines():
+        line = _LIST_MARKER_RE.sub('', line).strip()
+        if line:
+            lines.append(line)
+    return lines[:MAX_IMPORT_LINES]
+
+
+def _lines_from_csv(text: str) -> List[str]:
+    """Каждая строка CSV - задача; столбцы склеиваются ("описание;время")"""
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    lines = []
+    for row in csv.reader(io.StringIO(text), dialect):
+        line = ' '.join(cell.strip() for cell in row if cell.strip())
+        if line:
+            lines.append(line)
+    return lines[:MAX_IMPORT_LINES]
+
+
+def _parse_ics_datetime(value: str, timezone: str, event_timezone: Optional[str] = None):
+    """
+    Переводит DTSTART из iCalendar в (текст времени, due_at, точность)
+
+    Время без пояса ("плавающее") и дата без времени относятся к поясу
+    пользователя timezone, время с TZID - к поясу события, с суффиксом Z -
+    к UTC. Текст времени всегда на часах пользователя.
+    """
+    value = value.strip()
+    try:
+        if 'T' not in value:
+            moment = datetime.strptime(value[:8], "%Y%m%d").replace(hour=9)
+            return moment.strftime("%d.%m.%Y"), to_epoch(moment, timezone), PRECISION_DAY
+        moment = datetime.strptime(value[:15], "%Y%m%dT%H%M%S")
+    except ValueError:
+        return None, None, None
+
+    if value.endswith('Z'):
+        due_at = int(moment.replace(tzinfo=dt_timezone.utc).timestamp())
+    else:
+        due_at = to_epoch(moment, event_timezone or timezone)
+    moment = datetime.fromtimestamp(due_at, get_zone(timezone))
+    return moment.strftime("%d.%m.%Y в %H:%M"), due_at, PRECISION_EXACT
+
+
+def _tasks_from_ics(text: str, timezone: str = None) -> List[Dict[str, Any]]:
+    """Достает события VEVENT (SUMMARY и DTSTART) из календаря iCalendar"""
+    # Развертываем перенесенные строки (продолжение начинается с пробела)
+    text = re.sub(r'\r?\n[ \t]', '', text)
+    tasks = []
+    event = None
+    for line in text.splitlines():
+        if line == 'BEGIN:VEVENT':
+            event = {}
+        elif line == 'END:VEVENT' and event is not None:
+            if event.get('description'):
+                tasks.append(event)
+            event = None
+        elif event is not None and ':' in line:
+            name, value = line.split(':', 1)
+            name, *params = name.split(';')
+            name = name.upper()
+            if name == 'SUMMARY':
+                event['description'] = value.replace('\\,', ',').replace('\\n', ' ').strip()
+            elif name == 'DTSTART':
+                event_timezone = next((param[5:] for param in params if param.upper().startswith('TZID=')), None)
+                if event_timezone is not None and not is_valid_timezone(event_timezone):
+                    event_timezone = None
+                event['time'], event['due_at'], event['precision'] = _parse_ics_datetime(
+                    value, timezone, event_timezone)
+    for event in tasks:
+        if not event.get('time'):
+            event['time'] = 'не указано'
+            event['due_at'] = None
+            event['precision'] = None
+    return tasks[:MAX_IMPORT_LINES]
+
+
+def parse_document(file_name: str, content: bytes, timezone: str = None) -> List[Dict[str, Any]]:
+    """
+    Разбирает загруженный файл со списком задач
+
+    Returns:
+        Список dict с ключами description, time, due_at, precision (для .ics) или text
+        (строка, которую еще нужно разобрать)
+    """
+    text = content.decode('utf-8-sig', errors='replace')
+    extension = file_name.lower().rsplit('.', 1)[-1] if '.' in file_name else ''
+
+    if extension == 'ics':
+        return _tasks_from_ics(text, timezone)
+    if extension == 'csv':
+        return [{'text': line} for line in _lines_from_csv(text)]
+    return [{'text': line} for line in split_lines(text)]
+
+
+def import_tasks(user_id: int, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Разбирает строки и сохраняет все задачи одной транзакцией
+
+    Args:
+        user_id: ID пользователя
+        items: Результат parse_document или [{'text': строка}, ...]
+
+    Returns:
+        Dict с ключами: tasks (сохраненные models.Task),
+        failed (нераспознанные строки), sources (сколько задач разобрано каждым способом)
+    """
+    timezone = get_user_timezone(user_id)
+    texts = [item['text'] for item in items if 'text' in item]
+    parsed = iter(process_natural_language_batch(texts, timezone, user_id))
+
+    tasks = []
+    failed = []
+    sources = {}
+    for item in items:
+        if 'text' not in item:
+            tasks.append(Task(item['description'], item['time'], item.get('due_at'),
+                              item.get('precision'), timezone))
+            sources['file'] = sources.get('file', 0) + 1
+            continue
+
+        result = next(parsed)
+        if result['success']:
+            tasks.append(result['task'])
+            source = result.get('source', 'ai')
+            sources[source] = sources.get(source, 0) + 1
+        else:
+            failed.append(item['text'])
+
+    task_ids = add_tasks_bulk(user_id, tasks)
+
+    return {
+        'tasks': tasks if task_ids else [],
+        'failed': failed,
+        'sources': sources
+    }
@@ -0,0 +1,199 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from text_search import stem, MAX_EXACT_LENGTH, MIN_STEM_LENGTH
+
+# Размерность вектора: n-граммы хешируются в столько корзин
+VECTOR_DIMENSIONS = 256
+NGRAM_SIZE = 3
+# Векторы хранятся в базе в половинной точности: 512 байт на задачу
+VECTOR_DTYPE = np.float16
+# Косинусная близость, начиная с которой задачи считаются похожими
+DUPLICATE_THRESHOLD = 0.75
+# Столько первых букв должны совпадать у разных слов двух задач, чтобы
+# считать их формами одного слова ("записаться" / "запись")
+SAME_ROOT_PREFIX = 4
+# Сколько векторов держать в памяти (по всем пользователям, ~1 КБ на вектор)
+VECTOR_CACHE_ROWS = 100000
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def _features(text: str):
+    """Символьные n-граммы основ слов и сами основы"""
+    for word in _WORD_RE.findall(text):
+        base = stem(word)
+        yield "w:" + base
+        padded = f" {base} "
+        for index in range(max(1, len(padded) - NGRAM_SIZE + 1)):
+            yield padded[index:index + NGRAM_SIZE]
+
+
+def embed(text: str) -> np.ndarray:
+    """
+    Вектор текста задачи: хешированные символьные n-граммы, длина 1
+
+    Разные формы слова ("врачу", "врача") дают почти одинаковые векторы.
+    crc32 вместо hash(): векторы сохраняются в базе, хеш не должен
+    меняться между запусками.
+    """
+    vector = np.zeros(VECTOR_DIMENSIONS, dtype=np.float32)
+    for feature in _features(text):
+        vector[zlib.crc32(feature.encode('utf-8')) % VECTOR_DIMENSIONS] += 1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector
+
+
+def _key_words(text: str) -> set:
+    """Основы значимых слов: без предлогов и союзов ("в", "с", "и")"""
+    return {base for base in map(stem, _WORD_RE.findall(text))
+            if len(base) > MAX_EXACT_LENGTH or base.isdigit()}
+
+
+def _same_root(word: str, others: set) -> bool:
+    """Есть ли среди others форма того же слова (общие первые буквы); числа не совпадают никогда"""
+    if word.isdigit():
+        return False
+    for other in others:
+        length = min(SAME_ROOT_PREFIX, len(word), len(other))
+        if not other.isdigit() and length >= MIN_STEM_LENGTH and word[:length] == other[:length]:
+            return True
+    return False
+
+
+def same_subject(first: str, second: str) -> bool:
+    """
+    Проверяет, что задачи отличаются только формами слов или добавленными словами
+
+    Близость n-грамм высока и у шаблонных задач с разными ключевыми словами:
+    "Задача номер 4 купить молоко" и "... номер 5 ..." (0.93), "Встреча с
+    Иваном" и "Встреча с Петром". Если в каждой задаче есть слова, которых
+    нет в другой, они должны быть формами одного слова; числа - совпадать.
+    """
+    first_words, second_words = _key_words(first), _key_words(second)
+    only_first, only_second = first_words - second_words, second_words - first_words
+    if not only_first or not only_second:
+        return True
+    return (all(_same_root(word, only_second) for word in only_first)
+            and all(_same_root(word, only_first) for word in only_second))
+
+
+def encode(text: str) -> bytes:
+    """Вектор текста в виде BLOB для колонки tasks.vector"""
+    return embed(text).astype(VECTOR_DTYPE).tobytes()
+
+
+class _UserVectors:
+    """Векторы задач одного пользователя с запасом места для дозаписи"""
+
+    __slots__ = ('ids', 'matrix', 'size')
+
+    def __init__(self, capacity: int):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.matrix = np.zeros((capacity, VECTOR_DIMENSIONS), dtype=np.float32)
+        self.size = 0
+
+    def append(self, rows):
+        needed = self.size + len(rows)
+        if needed > len(self.ids):
+            capacity = max(needed, len(self.ids) * 2)
+            ids = np.zeros(capacity, dtype=np.int64)
+            matrix = np.zeros((capacity, VECTOR_DIMENSIONS), dtype=np.float32)
+            ids[:self.size] = self.ids[:self.size]
+            matrix[:self.size] = self.matrix[:self.size]
+            self.ids, self.matrix = ids, matrix
+
+        blob = b''.join(row[1] for row in rows)
+        vectors = np.frombuffer(blob, dtype=VECTOR_DTYPE).reshape(len(rows), VECTOR_DIMENSIONS)
+        self.ids[self.size:needed] = [row[0] for row in rows]
+        self.matrix[self.size:needed] = vectors
+        self.size = needed
+
+
+class VectorCache:
+    """
+    Векторы задач пользователей в памяти (LRU по числу векторов)
+
+    Кэш обновляется при записи: новые задачи дописываются через add(),
+    удаление задач сбрасывает пользователя через forget(). Вебхук-режим
+    направляет все обновления пользователя в один процесс, поэтому чужих
+    изменений кэш не пропускает.
+    """
+
+    def __init__(self, max_rows: int = VECTOR_CACHE_ROWS):
+        self.max_rows = max_rows
+        self._users = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, load) -> _UserVectors:
+        """Векторы пользователя; load() -> строки (id, vector) загружает их при промахе"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                self._users.move_to_end(user_id)
+                return entry
+
+        rows = load()
+        entry = _UserVectors(len(rows))
+        if rows:
+            entry.append(rows)
+        with self._lock:
+            previous = self._users.pop(user_id, None)
+            if previous is not None:
+                self._rows -= previous.size
+            self._users[user_id] = entry
+            self._rows += entry.size
+            self._evict()
+        return entry
+
+    def add(self, user_id: int, rows):
+        """Дописывает векторы новых задач (id, vector), если пользователь в кэше"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None or not rows:
+                return
+            entry.append(rows)
+            self._rows += len(rows)
+            self._evict()
+
+    def forget(self, user_id: int):
+        """Сбрасывает векторы пользователя (после удаления задач)"""
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is not None:
+                self._rows -= entry.size
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self._rows = 0
+
+    def _evict(self):
+        while self._rows > self.max_rows and len(self._users) > 1:
+            _, evicted = self._users.popitem(last=False)
+            self._rows -= evicted.size
+
+
+def most_similar(vectors: _UserVectors, vector: np.ndarray,
+                 threshold: float = DUPLICATE_THRESHOLD) -> Optional[Tuple[int, float]]:
+    """
+    Самая похожая задача: (ID, близость) или None, если близость ниже порога
+
+    Одно матричное умножение по всем задачам пользователя.
+    """
+    if not vectors.size:
+        return None
+    scores = vectors.matrix[:vectors.size] @ vector
+    best = int(np.argmax(scores))
+    score = float(scores[best])
+    if score < threshold:
+        return None
+    return int(vectors.ids[best]), score
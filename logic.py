@@ -1,145 +1,669 @@
+import json
 import sqlite3
+import zlib
 from datetime import datetime
 import os
+from typing import List, Optional
+
+from storage import get_connection
+from migrations import migrate, SCHEMA_VERSION
+from models import Task, move_to_timezone
+from metrics import timed, DB_QUERY_SECONDS
+from text_search import query_terms, build_match_query, relevance
+from dedup import VectorCache, encode, embed, most_similar, same_subject, DUPLICATE_THRESHOLD
+from task_cache import task_cache
 
 DB_PATH = "tasks.db"
 
+# SQL-выражения вынесены в константы: одинаковый текст запроса позволяет
+# sqlite3 переиспользовать подготовленное выражение из кэша соединения
+SQL_INSERT_TASK = (
+    "INSERT INTO tasks (user_id, description, time, due_at, precision, timezone, vector) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+# Колонки задачи для models.Task.from_row
+TASK_COLUMNS = "id, description, time, due_at, precision, timezone, created_at"
+# Порядок задач в списке: по времени, задачи без времени в конце.
+# Выражение совпадает с индексом idx_tasks_user_due (миграция 9)
+DUE_SORT_KEY = "IFNULL(due_at, 253402300799)"
+# Выполненные задачи (done_at) в списки не попадают и ждут переноса в архив.
+# Условие "done_at IS NULL" совпадает с условием частичного индекса (миграция 12)
+SQL_SELECT_TASKS = (
+    f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND done_at IS NULL ORDER BY {DUE_SORT_KEY}, id"
+)
+SQL_SELECT_TASKS_WITH_ID = (
+    f"SELECT id, description, time FROM tasks WHERE user_id = ? AND done_at IS NULL ORDER BY {DUE_SORT_KEY}, id"
+)
+SQL_COUNT_TASKS = "SELECT COUNT(*) FROM tasks WHERE user_id = ? AND done_at IS NULL"
+SQL_DELETE_TASKS = "DELETE FROM tasks WHERE user_id = ?"
+SQL_DELETE_TASK = "DELETE FROM tasks WHERE user_id = ? AND id = ?"
+SQL_COMPLETE_TASK = "UPDATE tasks SET done_at = ? WHERE user_id = ? AND id = ? AND done_at IS NULL"
+SQL_TOTAL_TASKS = "SELECT COUNT(*) FROM tasks"
+SQL_DONE_TASKS = "SELECT COUNT(*) FROM tasks WHERE done_at IS NOT NULL"
+SQL_UNIQUE_USERS = "SELECT COUNT(DISTINCT user_id) FROM tasks"
+SQL_CACHED_RESPONSES = "SELECT COUNT(*) FROM ai_cache"
+# Постраничный вывод по ключу (время, id): стоимость страницы не зависит
+# от ее номера и от общего числа задач пользователя. Отдельное условие на
+# время нужно, чтобы SQLite начал поиск по индексу с курсора: сравнение
+# пар (выражение, id) диапазоном индекса не используется
+SQL_TASKS_FIRST_PAGE = (
+    f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND done_at IS NULL "
+    f"ORDER BY {DUE_SORT_KEY}, id LIMIT ?"
+)
+SQL_TASKS_PAGE_AFTER = (
+    f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND done_at IS NULL "
+    f"AND {DUE_SORT_KEY} >= ? AND ({DUE_SORT_KEY}, id) > (?, ?) "
+    f"ORDER BY {DUE_SORT_KEY}, id LIMIT ?"
+)
+SQL_TASKS_PAGE_BEFORE = (
+    f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND done_at IS NULL "
+    f"AND {DUE_SORT_KEY} <= ? AND ({DUE_SORT_KEY}, id) < (?, ?) "
+    f"ORDER BY {DUE_SORT_KEY} DESC, id DESC LIMIT ?"
+)
+
+TASKS_PAGE_SIZE = 20
+SQL_PENDING_REMINDERS = (
+    "SELECT id, user_id, description, time, due_at FROM tasks "
+    "WHERE reminded_at IS NULL AND due_at >= ? AND done_at IS NULL ORDER BY due_at"
+)
+SQL_PENDING_REMINDERS_SHARD = (
+    "SELECT id, user_id, description, time, due_at FROM tasks "
+    "WHERE reminded_at IS NULL AND due_at >= ? AND done_at IS NULL AND user_id % ? = ? ORDER BY due_at"
+)
+# due_at в условии: после переноса задачи старое напоминание не отправляется;
+# о выполненной задаче не напоминаем
+SQL_MARK_REMINDED = (
+    "UPDATE tasks SET reminded_at = ? WHERE id = ? AND due_at = ? AND reminded_at IS NULL AND done_at IS NULL"
+)
+SQL_RESCHEDULE_TASK = (
+    "UPDATE tasks SET time = ?, due_at = ?, precision = ?, timezone = ?, reminded_at = NULL "
+    "WHERE user_id = ? AND id = ?"
+)
+SQL_SELECT_TASK = "SELECT id, description, time FROM tasks WHERE user_id = ? AND id = ?"
+SQL_SELECT_FULL_TASK = f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND id = ? AND done_at IS NULL"
+SQL_TASK_VECTORS = "SELECT id, vector FROM tasks WHERE user_id = ? AND done_at IS NULL"
+SQL_USER_PENDING_TASKS = (
+    f"SELECT {TASK_COLUMNS} FROM tasks WHERE user_id = ? AND reminded_at IS NULL AND due_at > ? AND done_at IS NULL"
+)
+SQL_MOVE_TASK = "UPDATE tasks SET due_at = ?, timezone = ? WHERE id = ? AND due_at = ?"
+# Последние совпадения из полнотекстового индекса; ранжируются в Python (text_search.relevance)
+SQL_SEARCH_TASKS = (
+    "SELECT tasks.id, tasks.description, tasks.time, tasks.due_at, tasks.precision, "
+    "tasks.timezone, tasks.created_at FROM tasks_fts "
+    "JOIN tasks ON tasks.id = tasks_fts.rowid "
+    "WHERE tasks_fts MATCH ? AND tasks.done_at IS NULL ORDER BY tasks_fts.rowid DESC LIMIT ?"
+)
+SEARCH_PAGE_SIZE = 10
+# Сколько последних совпадений ранжируется
+SEARCH_RANK_WINDOW = 500
+
+# Архив: выполненные и давно прошедшие задачи переносятся пачками в
+# tasks_archive (archive.Compactor). Кандидаты находятся по индексам
+# idx_tasks_done и idx_tasks_due_at без просмотра всей таблицы
+ARCHIVE_COLUMNS = ("id", "user_id", "description", "time", "due_at", "precision",
+                   "timezone", "created_at", "done_at", "reminded_at")
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_COMPRESS_LEVEL = 6
+SQL_ARCHIVE_CANDIDATES = (
+    f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM tasks WHERE done_at <= ? OR due_at <= ? LIMIT ?"
+)
+SQL_ARCHIVE_CANDIDATES_SHARD = (
+    f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM tasks "
+    f"WHERE (done_at <= ? OR due_at <= ?) AND user_id % ? = ? LIMIT ?"
+)
+SQL_INSERT_ARCHIVE = (
+    "INSERT INTO tasks_archive (user_id, tasks, first_task_id, last_task_id, archived_at, data) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SQL_DELETE_ARCHIVED = "DELETE FROM tasks WHERE id = ?"
+SQL_SELECT_ARCHIVE = "SELECT data FROM tasks_archive WHERE user_id = ? ORDER BY id"
+SQL_DELETE_USER_ARCHIVE = "DELETE FROM tasks_archive WHERE user_id = ?"
+SQL_ARCHIVE_TOTALS = "SELECT COUNT(*), IFNULL(SUM(tasks), 0), IFNULL(SUM(LENGTH(data)), 0) FROM tasks_archive"
+# Место, занятое таблицами вместе с их индексами (виртуальная таблица dbstat)
+SQL_TABLE_SIZES = (
+    "SELECT s.tbl_name, SUM(d.pgsize) FROM dbstat AS d JOIN sqlite_schema AS s ON s.name = d.name "
+    "WHERE d.aggregate = TRUE GROUP BY s.tbl_name"
+)
+# Режим PRAGMA auto_vacuum, при котором работает incremental_vacuum
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Векторы задач для поиска похожих (см. dedup.py)
+_task_vectors = VectorCache()
+# Буфер отложенной записи (write_buffer.start_write_buffer); None - вставка сразу
+write_buffer = None
+# Базы, схема которых уже проверена этим процессом
+_checked_schemas = set()
+
+
+def _connect():
+    """Возвращает переиспользуемое соединение текущего потока"""
+    return get_connection(DB_PATH)
+
+
 def init_db():
-    """Создает базу данных и таблицу tasks, если они не существуют"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS tasks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER NOT NULL,
-            description TEXT NOT NULL,
-            time TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        conn.commit()
-        conn.close()
+    """
+    Создает базу данных и обновляет схему таблиц до актуальной версии
+
+    Схема каждой базы проверяется процессом один раз: повторные вызовы
+    (bot.create_app, webhook.py, бенчмарки) ничего не делают.
+    """
+    if DB_PATH in _checked_schemas:
+        return
+    try:
+        applied = migrate(_connect())
+        _checked_schemas.add(DB_PATH)
+        if applied:
+            print(f"🔧 Применено миграций схемы: {applied} (версия {SCHEMA_VERSION})")
         print("✅ База данных инициализирована успешно")
     except sqlite3.Error as e:
         print(f"❌ Ошибка инициализации базы данных: {e}")
 
-def add_task(user_id: int, description: str, time: str):
-    """Добавляет новую задачу для пользователя"""
+@timed(DB_QUERY_SECONDS)
+def add_task(user_id: int, task: Task):
+    """
+    Добавляет новую задачу для пользователя
+
+    При включенном буфере записи вставка попадает в общий групповой коммит;
+    функция в любом случае возвращается после коммита.
+    Возвращает ID новой задачи (он же записывается в task.id) или False при ошибке.
+    """
+    params = _insert_params(user_id, task)
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO tasks (user_id, description, time) VALUES (?, ?, ?)",
-            (user_id, description.strip(), time.strip())
-        )
-        conn.commit()
-        conn.close()
-        return True
+        if write_buffer is not None:
+            task_id = write_buffer.submit(SQL_INSERT_TASK, params).result()
+        else:
+            conn = _connect()
+            with conn:
+                task_id = conn.execute(SQL_INSERT_TASK, params).lastrowid
+        task.id = task_id
+        _task_vectors.add(user_id, [(task_id, params[-1])])
+        task_cache.added(user_id)
+        return task_id
     except sqlite3.Error as e:
         print(f"❌ Ошибка добавления задачи: {e}")
         return False
 
+def _insert_params(user_id: int, task: Task):
+    return (user_id, task.description.strip(), task.time.strip(), task.due_at,
+            task.precision, task.timezone, encode(task.description))
+
+@timed(DB_QUERY_SECONDS)
+def add_tasks_bulk(user_id: int, tasks: List[Task]):
+    """
+    Добавляет много задач одной транзакцией
+
+    Returns:
+        Список ID новых задач в том же порядке (они же записываются в task.id)
+        или пустой список при ошибке
+    """
+    rows = [_insert_params(user_id, task) for task in tasks]
+    if not rows:
+        return []
+
+    try:
+        conn = _connect()
+        with conn:
+            # Блокировка записи на всю транзакцию: ID вставленных строк идут подряд
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(SQL_INSERT_TASK, rows)
+            last_id = conn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        task_ids = list(range(last_id - len(rows) + 1, last_id + 1))
+        for task, task_id in zip(tasks, task_ids):
+            task.id = task_id
+        _task_vectors.add(user_id, [(task_id, row[-1]) for task_id, row in zip(task_ids, rows)])
+        task_cache.added(user_id, len(task_ids))
+        return task_ids
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка пакетного добавления задач: {e}")
+        return []
+
+@timed(DB_QUERY_SECONDS)
 def get_tasks(user_id: int):
-    """Возвращает все задачи пользователя, отсортированные по времени создания"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT description, time FROM tasks WHERE user_id = ? ORDER BY created_at ASC",
-            (user_id,)
-        )
-        tasks = cursor.fetchall()
-        conn.close()
-        return tasks
+    """Возвращает все задачи пользователя (models.Task) по времени, задачи без времени в конце"""
+    try:
+        return [Task.from_row(row) for row in _connect().execute(SQL_SELECT_TASKS, (user_id,))]
     except sqlite3.Error as e:
         print(f"❌ Ошибка получения задач: {e}")
         return []
 
 
 # Получение количества задач пользователя
+@timed(DB_QUERY_SECONDS)
 def get_tasks_count(user_id: int):
-    """Возвращает количество задач пользователя"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM tasks WHERE user_id = ?", (user_id,))
-        count = cursor.fetchone()[0]
-        conn.close()
+    """Возвращает количество задач пользователя (из кэша, если оно известно)"""
+    count = task_cache.get_count(user_id)
+    if count is not None:
         return count
+    token = task_cache.token(user_id)
+    try:
+        count = _connect().execute(SQL_COUNT_TASKS, (user_id,)).fetchone()[0]
     except sqlite3.Error as e:
         print(f"❌ Ошибка подсчета задач: {e}")
         return 0
+    task_cache.put_count(user_id, token, count)
+    return count
 
+@timed(DB_QUERY_SECONDS)
 def clear_tasks(user_id: int):
-    """Удаляет все задачи пользователя"""
-    try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM tasks WHERE user_id = ?", (user_id,))
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+    """Удаляет все задачи пользователя, в том числе архивные"""
+    try:
+        conn = _connect()
+        with conn:
+            deleted_count = conn.execute(SQL_DELETE_TASKS, (user_id,)).rowcount
+            conn.execute(SQL_DELETE_USER_ARCHIVE, (user_id,))
+        _task_vectors.forget(user_id)
+        task_cache.cleared(user_id)
         return deleted_count
     except sqlite3.Error as e:
         print(f"❌ Ошибка удаления задач: {e}")
         return 0
 
+@timed(DB_QUERY_SECONDS)
 def delete_task(user_id: int, task_id: int):
     """Удаляет конкретную задачу пользователя по ID"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "DELETE FROM tasks WHERE user_id = ? AND id = ?",
-            (user_id, task_id)
-        )
-        deleted = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
+        conn = _connect()
+        with conn:
+            deleted = conn.execute(SQL_DELETE_TASK, (user_id, task_id)).rowcount > 0
+        if deleted:
+            _task_vectors.forget(user_id)
+            task_cache.removed(user_id)
         return deleted
     except sqlite3.Error as e:
         print(f"❌ Ошибка удаления задачи: {e}")
         return False
 
+@timed(DB_QUERY_SECONDS)
+def complete_task(user_id: int, task_id: int):
+    """
+    Отмечает задачу пользователя выполненной
+
+    Задача пропадает из списка, поиска и напоминаний и позже переносится
+    в архив. Возвращает False, если задача не найдена или уже выполнена.
+    """
+    try:
+        conn = _connect()
+        with conn:
+            completed = conn.execute(
+                SQL_COMPLETE_TASK, (int(datetime.now().timestamp()), user_id, task_id)
+            ).rowcount > 0
+        if completed:
+            _task_vectors.forget(user_id)
+            task_cache.removed(user_id)
+        return completed
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка отметки задачи выполненной: {e}")
+        return False
+
+@timed(DB_QUERY_SECONDS)
 def get_tasks_with_id(user_id: int):
     """Возвращает все задачи пользователя с их ID"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, description, time FROM tasks WHERE user_id = ? ORDER BY created_at ASC",
-            (user_id,)
-        )
-        tasks = cursor.fetchall()
-        conn.close()
-        return tasks
+        return _connect().execute(SQL_SELECT_TASKS_WITH_ID, (user_id,)).fetchall()
     except sqlite3.Error as e:
         print(f"❌ Ошибка получения задач с ID: {e}")
         return []
 
+@timed(DB_QUERY_SECONDS)
+def get_task(user_id: int, task_id: int) -> Optional[Task]:
+    """Невыполненная задача пользователя по ID или None"""
+    try:
+        row = _connect().execute(SQL_SELECT_FULL_TASK, (user_id, task_id)).fetchone()
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка получения задачи: {e}")
+        return None
+    return Task.from_row(row) if row else None
+
+@timed(DB_QUERY_SECONDS)
+def get_tasks_page(user_id: int, after=None, before=None, limit: int = TASKS_PAGE_SIZE):
+    """
+    Возвращает одну страницу задач пользователя в порядке их времени
+
+    Args:
+        user_id: ID пользователя
+        after: Курсор (task.sort_key, task.id) - страница после этой задачи
+        before: Курсор (task.sort_key, task.id) - страница перед этой задачей
+        limit: Размер страницы
+
+    Returns:
+        (список models.Task, есть_ли_еще_задачи_в_этом_направлении)
+
+    Первая страница стандартного размера берется из кэша задач.
+    """
+    first_page = after is None and before is None and limit == TASKS_PAGE_SIZE
+    if first_page:
+        page = task_cache.get_first_page(user_id)
+        if page is not None:
+            return page
+        token = task_cache.token(user_id)
+    try:
+        conn = _connect()
+        if after is not None:
+            cursor = conn.execute(SQL_TASKS_PAGE_AFTER, (user_id, after[0], after[0], after[1], limit + 1))
+        elif before is not None:
+            cursor = conn.execute(SQL_TASKS_PAGE_BEFORE, (user_id, before[0], before[0], before[1], limit + 1))
+        else:
+            cursor = conn.execute(SQL_TASKS_FIRST_PAGE, (user_id, limit + 1))
+
+        rows = cursor.fetchmany(limit + 1)
+        has_more = len(rows) > limit
+        rows = [Task.from_row(row) for row in rows[:limit]]
+        if before is not None:
+            rows.reverse()
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка получения страницы задач: {e}")
+        return [], False
+    if first_page:
+        task_cache.put_first_page(user_id, token, (rows, has_more))
+    return rows, has_more
+
+@timed(DB_QUERY_SECONDS)
+def search_tasks(user_id: int, query: str, page: int = 0, limit: int = SEARCH_PAGE_SIZE):
+    """
+    Полнотекстовый поиск по задачам пользователя
+
+    Слова запроса ищутся по основам ("молока" найдет "молоко") через индекс
+    tasks_fts. Последние SEARCH_RANK_WINDOW совпадений упорядочиваются по
+    релевантности, поэтому время поиска не растет с числом задач.
+
+    Args:
+        user_id: ID пользователя
+        query: Текст запроса
+        page: Номер страницы (с нуля)
+        limit: Размер страницы
+
+    Returns:
+        (список models.Task, есть_ли_следующая_страница)
+    """
+    terms = query_terms(query)
+    match = build_match_query(terms, user_id)
+    if match is None:
+        return [], False
+    try:
+        rows = _connect().execute(SQL_SEARCH_TASKS, (match, SEARCH_RANK_WINDOW)).fetchall()
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка поиска задач: {e}")
+        return [], False
+
+    rows.sort(key=lambda row: (-relevance(row[1], terms), -row[0]))
+    start = page * limit
+    return [Task.from_row(row) for row in rows[start:start + limit]], len(rows) > start + limit
+
+@timed(DB_QUERY_SECONDS)
+def find_duplicate(user_id: int, description: str, threshold: float = DUPLICATE_THRESHOLD):
+    """
+    Ищет среди задач пользователя похожую на новое описание
+
+    Векторы задач пользователя держатся в памяти (dedup.VectorCache,
+    обновляется при добавлении и удалении задач) и сравниваются с вектором
+    описания одним умножением матрицы на вектор. Самая близкая задача
+    должна быть о том же (dedup.same_subject): "номер 4" и "номер 5" - разные.
+
+    Returns:
+        (id, description, time, близость) самой похожей задачи или None
+    """
+    try:
+        conn = _connect()
+        vectors = _task_vectors.get(user_id, lambda: conn.execute(SQL_TASK_VECTORS, (user_id,)).fetchall())
+        match = most_similar(vectors, embed(description), threshold)
+        if match is None:
+            return None
+        task_id, score = match
+        row = conn.execute(SQL_SELECT_TASK, (user_id, task_id)).fetchone()
+        if row is None:
+            # Задачу удалили в обход кэша - перечитаем векторы при следующей проверке
+            _task_vectors.forget(user_id)
+            return None
+        if not same_subject(description, row[1]):
+            return None
+        return (*row, score)
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка поиска похожих задач: {e}")
+        return None
+
+@timed(DB_QUERY_SECONDS)
+def reschedule_task(user_id: int, task_id: int, task: Task):
+    """
+    Переносит задачу пользователя на время task и снова включает напоминание
+
+    Возвращает True, если задача найдена и обновлена.
+    """
+    params = (task.time.strip(), task.due_at, task.precision, task.timezone, user_id, task_id)
+    try:
+        conn = _connect()
+        with conn:
+            updated = conn.execute(SQL_RESCHEDULE_TASK, params).rowcount > 0
+        if updated:
+            task_cache.changed(user_id)
+        return updated
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка переноса задачи: {e}")
+        return False
+
+@timed(DB_QUERY_SECONDS)
+def move_tasks_to_timezone(user_id: int, timezone: str):
+    """
+    Переводит будущие задачи пользователя в новый часовой пояс
+
+    Время на часах сохраняется: задача "завтра в 9:00", разобранная в
+    старом поясе, остается в 9:00 нового. Все задачи обновляются одной
+    транзакцией.
+
+    Returns:
+        Перенесенные задачи (models.Task с новым due_at) для планировщика
+        напоминаний; пустой список при ошибке
+    """
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            tasks = [Task.from_row(row) for row in conn.execute(
+                SQL_USER_PENDING_TASKS, (user_id, int(datetime.now().timestamp()))
+            )]
+            updates = []
+            for task in tasks:
+                old_due_at = task.due_at
+                task.due_at = move_to_timezone(old_due_at, task.timezone, timezone)
+                task.timezone = timezone
+                updates.append((task.due_at, timezone, task.id, old_due_at))
+            conn.executemany(SQL_MOVE_TASK, updates)
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка перевода задач в другой часовой пояс: {e}")
+        return []
+    if tasks:
+        task_cache.changed(user_id)
+    return tasks
+
+def _pack_tasks(rows) -> bytes:
+    """Строки задач (ARCHIVE_COLUMNS) одной записью архива: JSON, сжатый zlib"""
+    data = json.dumps({'columns': ARCHIVE_COLUMNS, 'rows': rows}, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(data.encode(), ARCHIVE_COMPRESS_LEVEL)
+
+@timed(DB_QUERY_SECONDS)
+def archive_tasks(done_before: int, expired_before: int, limit: int = ARCHIVE_BATCH_SIZE, shard=None):
+    """
+    Переносит в архив одну пачку выполненных и давно прошедших задач
+
+    Задачи каждого пользователя из пачки сжимаются в одну запись
+    tasks_archive. Перенос - одна короткая транзакция, поэтому запись новых
+    задач ждет не дольше одной пачки.
+
+    Args:
+        done_before: Задачи, выполненные не позже этого момента
+        expired_before: Задачи со временем не позже этого момента
+        limit: Размер пачки
+        shard: (номер, всего) - только пользователи с user_id % всего == номер
+
+    Returns:
+        Количество перенесенных задач; 0 - кандидатов больше нет
+    """
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if shard is None:
+                rows = conn.execute(SQL_ARCHIVE_CANDIDATES, (done_before, expired_before, limit)).fetchall()
+            else:
+                index, count = shard
+                rows = conn.execute(
+                    SQL_ARCHIVE_CANDIDATES_SHARD, (done_before, expired_before, count, index, limit)
+                ).fetchall()
+            by_user = {}
+            for row in rows:
+                by_user.setdefault(row[1], []).append(row)
+            now = int(datetime.now().timestamp())
+            conn.executemany(SQL_INSERT_ARCHIVE, [
+                (user_id, len(user_rows), min(row[0] for row in user_rows),
+                 max(row[0] for row in user_rows), now, _pack_tasks(user_rows))
+                for user_id, user_rows in by_user.items()
+            ])
+            conn.executemany(SQL_DELETE_ARCHIVED, [(row[0],) for row in rows])
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка переноса задач в архив: {e}")
+        return 0
+    for user_id in by_user:
+        _task_vectors.forget(user_id)
+        task_cache.removed(user_id)
+    return len(rows)
+
+@timed(DB_QUERY_SECONDS)
+def get_archived_tasks(user_id: int):
+    """Возвращает архивные задачи пользователя (models.Task) в порядке переноса"""
+    fields = TASK_COLUMNS.split(", ")
+    tasks = []
+    try:
+        for data, in _connect().execute(SQL_SELECT_ARCHIVE, (user_id,)):
+            archive = json.loads(zlib.decompress(data))
+            for values in archive['rows']:
+                row = dict(zip(archive['columns'], values))
+                tasks.append(Task.from_row([row[name] for name in fields]))
+    except (sqlite3.Error, zlib.error, ValueError) as e:
+        print(f"❌ Ошибка чтения архива задач: {e}")
+    return tasks
+
+def enable_incremental_vacuum():
+    """
+    Переводит базу в режим auto_vacuum=INCREMENTAL
+
+    Новые базы создаются в нем сразу (storage.PRAGMAS), старую нужно один
+    раз пересобрать VACUUM. Это долго и требует места под копию файла,
+    поэтому вызывается из фоновой задачи архивации.
+    Возвращает True, если режим включен.
+    """
+    try:
+        conn = _connect()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+            return True
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        enabled = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+        if enabled:
+            print("🗜️ База переведена в режим auto_vacuum=INCREMENTAL")
+        return enabled
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка включения auto_vacuum: {e}")
+        return False
+
+@timed(DB_QUERY_SECONDS)
+def release_free_pages(max_pages: int):
+    """Возвращает файловой системе до max_pages свободных страниц; возвращает их число"""
+    try:
+        conn = _connect()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript выполняет прагму до конца: через execute она освобождает одну страницу за шаг
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages)})")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка освобождения страниц базы: {e}")
+        return 0
+
 def check_db_exists():
     """Проверяет, существует ли файл базы данных"""
     return os.path.exists(DB_PATH)
 
-def get_db_stats():
-    """Возвращает общую статистику базы данных"""
+def _table_sizes(conn: sqlite3.Connection):
+    """Байты на диске по таблицам вместе с индексами; None, если SQLite собран без dbstat"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        return dict(conn.execute(SQL_TABLE_SIZES).fetchall())
+    except sqlite3.OperationalError:
+        return None
 
-        cursor.execute("SELECT COUNT(*) FROM tasks")
-        total_tasks = cursor.fetchone()[0]
-
-        cursor.execute("SELECT COUNT(DISTINCT user_id) FROM tasks")
-        unique_users = cursor.fetchone()[0]
+@timed(DB_QUERY_SECONDS)
+def get_db_stats():
+    """
+    Возвращает общую статистику базы данных
 
-        conn.close()
+    Рабочие задачи (таблица tasks) и архив считаются отдельно: число задач,
+    место на диске (рабочая таблица - вместе с индексами и индексом
+    поиска), сжатый объем архива и свободные страницы файла.
+    """
+    try:
+        conn = _connect()
+        total_tasks = conn.execute(SQL_TOTAL_TASKS).fetchone()[0]
+        done_tasks = conn.execute(SQL_DONE_TASKS).fetchone()[0]
+        unique_users = conn.execute(SQL_UNIQUE_USERS).fetchone()[0]
+        cached_responses = conn.execute(SQL_CACHED_RESPONSES).fetchone()[0]
+        archive_records, archived_tasks, archived_bytes = conn.execute(SQL_ARCHIVE_TOTALS).fetchone()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        sizes = _table_sizes(conn)
 
         return {
             'total_tasks': total_tasks,
-            'unique_users': unique_users
+            'done_tasks': done_tasks,
+            'unique_users': unique_users,
+            'cached_responses': cached_responses,
+            'archived_tasks': archived_tasks,
+            'archive_records': archive_records,
+            'archived_bytes': archived_bytes,
+            'hot_bytes': None if sizes is None else sum(
+                size for name, size in sizes.items() if name == 'tasks' or name.startswith('tasks_fts')
+            ),
+            'archive_bytes': None if sizes is None else sizes.get('tasks_archive', 0),
+            'db_bytes': page_count * page_size,
+            'free_bytes': free_pages * page_size
         }
     except sqlite3.Error as e:
         print(f"❌ Ошибка получения статистики: {e}")
-        return {'total_tasks': 0, 'unique_users': 0}
+        return {'total_tasks': 0, 'unique_users': 0, 'cached_responses': 0}
+
+
+@timed(DB_QUERY_SECONDS)
+def get_pending_reminders(since: int, shard=None):
+    """
+    Возвращает задачи с неотправленными напоминаниями начиная с момента since
+
+    Один диапазонный запрос по частичному индексу idx_tasks_pending_due.
+    Строки: (id, user_id, description, time, due_at), по возрастанию due_at.
+    shard=(номер, всего) оставляет только пользователей с user_id % всего == номер.
+    """
+    try:
+        if shard is None:
+            return _connect().execute(SQL_PENDING_REMINDERS, (since,)).fetchall()
+        index, count = shard
+        return _connect().execute(SQL_PENDING_REMINDERS_SHARD, (since, count, index)).fetchall()
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка получения напоминаний: {e}")
+        return []
+
+
+@timed(DB_QUERY_SECONDS)
+def mark_reminded(task_id: int, due_at: int):
+    """
+    Отмечает напоминание отправленным
+
+    Возвращает False, если задача удалена, перенесена на другое время или
+    напоминание уже отправлено (например, другим процессом), - тогда
+    отправлять его не нужно.
+    """
+    try:
+        conn = _connect()
+        with conn:
+            updated = conn.execute(
+                SQL_MARK_REMINDED, (int(datetime.now().timestamp()), task_id, due_at)
+            ).rowcount > 0
+        return updated
+    except sqlite3.Error as e:
+        print(f"❌ Ошибка отметки напоминания: {e}")
+        return False
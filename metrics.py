@@ -0,0 +1,262 @@
+import asyncio
+import bisect
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+# Названия метрик
+HANDLER_SECONDS = "bot_handler_seconds"
+DB_QUERY_SECONDS = "db_query_seconds"
+OPENAI_REQUEST_SECONDS = "openai_request_seconds"
+TELEGRAM_REQUEST_SECONDS = "telegram_request_seconds"
+AI_FAILURES = "ai_failures_total"
+FALLBACK_PARSES = "fallback_parser_total"
+TELEGRAM_RETRIES = "telegram_retries_total"
+TYPING_COALESCED = "telegram_typing_coalesced_total"
+AI_PROMPT_TOKENS = "openai_prompt_tokens_total"
+AI_COMPLETION_TOKENS = "openai_completion_tokens_total"
+AI_RATE_LIMITED = "ai_rate_limited_total"
+TASKS_ARCHIVED = "tasks_archived_total"
+
+# Каждая гистограмма описывается метрикой Prometheus и меткой, которой различаются серии
+HISTOGRAM_LABELS = {
+    HANDLER_SECONDS: "handler",
+    DB_QUERY_SECONDS: "query",
+    OPENAI_REQUEST_SECONDS: "kind",
+    TELEGRAM_REQUEST_SECONDS: "method",
+}
+
+METRIC_HELP = {
+    HANDLER_SECONDS: "Время обработчиков бота",
+    DB_QUERY_SECONDS: "Время запросов к базе данных",
+    OPENAI_REQUEST_SECONDS: "Время запросов к OpenAI",
+    TELEGRAM_REQUEST_SECONDS: "Время запросов к Telegram Bot API",
+    AI_FAILURES: "Ошибки запросов к ИИ",
+    FALLBACK_PARSES: "Задачи, разобранные базовым анализатором",
+    TELEGRAM_RETRIES: "Повторы запросов к Telegram после 429",
+    TYPING_COALESCED: "Пропущенные повторные \"печатает\"",
+    AI_PROMPT_TOKENS: "Токены запросов к OpenAI",
+    AI_COMPLETION_TOKENS: "Токены ответов OpenAI",
+    AI_RATE_LIMITED: "Сообщения, разобранные без ИИ из-за лимита пользователя",
+    TASKS_ARCHIVED: "Задачи, перенесенные в архив",
+}
+
+# Границы корзин гистограмм в секундах (от 0.5 мс до 30 с)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Порт HTTP-сервера с /metrics (если не задан - сервер не запускается)
+METRICS_PORT = os.getenv("METRICS_PORT")
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами"""
+
+    __slots__ = ('counts', 'sum', 'count', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, fraction: float) -> float:
+        """Оценка квантиля по корзинам (верхняя граница корзины)"""
+        counts, _, count = self.snapshot()
+        if not count:
+            return 0.0
+        rank = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return BUCKETS[index] if index < len(BUCKETS) else float('inf')
+        return float('inf')
+
+
+_histograms = {}
+_counters = {}
+_registry_lock = threading.Lock()
+
+
+def _histogram(name: str, label: str) -> Histogram:
+    key = (name, label)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(key, Histogram())
+    return histogram
+
+
+def observe(name: str, label: str, seconds: float):
+    """Записывает длительность в гистограмму name с меткой label"""
+    _histogram(name, label).observe(seconds)
+
+
+def increment(name: str, amount: int = 1):
+    """Увеличивает счетчик"""
+    with _registry_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def timed(name: str, label: str = None):
+    """
+    Декоратор: записывает время выполнения функции в гистограмму name
+
+    Меткой по умолчанию служит имя функции. Поддерживает и async-функции.
+    """
+    def decorator(func):
+        histogram_label = label or func.__name__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe(name, histogram_label, time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, histogram_label, time.perf_counter() - started)
+        return wrapper
+
+    return decorator
+
+
+def instrument_telegram(helper):
+    """
+    Оборачивает отправку запросов pyTelegramBotAPI, чтобы измерять каждый метод
+
+    helper - telebot.apihelper (синхронный бот) или telebot.asyncio_helper.
+    """
+    if getattr(helper, '_metrics_instrumented', False):
+        return
+    helper._metrics_instrumented = True
+
+    if hasattr(helper, '_process_request'):
+        original = helper._process_request
+
+        async def process_request(token, url, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await original(token, url, *args, **kwargs)
+            finally:
+                observe(TELEGRAM_REQUEST_SECONDS, url, time.perf_counter() - started)
+
+        helper._process_request = process_request
+    else:
+        original = helper._make_request
+
+        def make_request(token, method_name, *args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(token, method_name, *args, **kwargs)
+            finally:
+                observe(TELEGRAM_REQUEST_SECONDS, method_name, time.perf_counter() - started)
+
+        helper._make_request = make_request
+
+
+def render_prometheus() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    with _registry_lock:
+        histograms = sorted(_histograms.items())
+        counters = sorted(_counters.items())
+
+    lines = []
+    described = set()
+    for (name, label), histogram in histograms:
+        if name not in described:
+            described.add(name)
+            lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+        label_name = HISTOGRAM_LABELS.get(name, "label")
+        counts, total, count = histogram.snapshot()
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKETS + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = "+Inf" if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{label_name}="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{label_name}="{label}"}} {total:.6f}')
+        lines.append(f'{name}_count{{{label_name}="{label}"}} {count}')
+
+    for name, value in counters:
+        lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def get_summary() -> Dict[str, Any]:
+    """
+    Краткая сводка для команды /stats
+
+    Returns:
+        Dict с ключами: histograms (список (метрика, метка, количество,
+        среднее, p50, p99) по убыванию суммарного времени), counters
+    """
+    with _registry_lock:
+        histograms = list(_histograms.items())
+        counters = dict(_counters)
+
+    rows: List[tuple] = []
+    for (name, label), histogram in histograms:
+        _, total, count = histogram.snapshot()
+        if count:
+            rows.append((name, label, count, total / count, histogram.quantile(0.5),
+                         histogram.quantile(0.99), total))
+    rows.sort(key=lambda row: row[-1], reverse=True)
+    return {'histograms': [row[:-1] for row in rows], 'counters': counters}
+
+
+def reset():
+    """Сбрасывает все метрики"""
+    with _registry_lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Запускает в фоновом потоке HTTP-сервер, отдающий GET /metrics"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_response(404)
+                self.end_headers()
+                return
+            payload = render_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Метрики доступны на порту {server.server_address[1]} (/metrics)")
+    return server
@@ -0,0 +1,332 @@
+import sqlite3
+from datetime import datetime, timezone
+
+from time_parser import due_timestamp, resolve_due, local_timezone_name
+from dedup import encode
+
+# Размер пачки при заполнении due_at для уже существующих задач
+BACKFILL_BATCH_SIZE = 1000
+
+
+def _column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """Проверяет, есть ли колонка в таблице"""
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _created_local(created_at: str):
+    """created_at задачи (CURRENT_TIMESTAMP, UTC) как локальное время парсера или None"""
+    try:
+        created = datetime.strptime(created_at, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        return None
+    return created.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+
+
+def _create_tasks_table(conn: sqlite3.Connection):
+    """Базовая таблица задач"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        description TEXT NOT NULL,
+        time TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def _add_user_created_index(conn: sqlite3.Connection):
+    """Составной индекс для выборок задач пользователя в порядке создания"""
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at)"
+    )
+
+
+def _add_due_at(conn: sqlite3.Connection):
+    """Колонка с абсолютным временем выполнения (UTC, секунды) и индекс по ней"""
+    if not _column_exists(conn, "tasks", "due_at"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN due_at INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_due_at ON tasks (due_at)")
+
+
+def _add_reminders(conn: sqlite3.Connection):
+    """
+    Отметка об отправленном напоминании и заполнение due_at у старых задач
+
+    Время старых задач считается относительно момента их создания.
+    Частичный индекс покрывает выборку ожидающих напоминаний одним
+    диапазонным запросом.
+    """
+    if not _column_exists(conn, "tasks", "reminded_at"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN reminded_at INTEGER")
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, time, created_at FROM tasks WHERE due_at IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = []
+        for task_id, time_text, created_at in rows:
+            due_at = due_timestamp(time_text, _created_local(created_at))
+            if due_at is not None:
+                updates.append((due_at, task_id))
+        conn.executemany("UPDATE tasks SET due_at = ? WHERE id = ?", updates)
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_pending_due ON tasks (due_at) WHERE reminded_at IS NULL"
+    )
+
+
+def _create_ai_cache(conn: sqlite3.Connection):
+    """Кэш ответов ИИ по нормализованному тексту (время в относительной форме)"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ai_cache (
+        key TEXT PRIMARY KEY,
+        description TEXT NOT NULL,
+        time_template TEXT NOT NULL,
+        date_format TEXT,
+        day_offset INTEGER NOT NULL DEFAULT 0,
+        explanation TEXT,
+        created_at INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_cache_created ON ai_cache (created_at)")
+
+
+def _create_user_states(conn: sqlite3.Connection):
+    """Состояния диалогов (JSON) с временем истечения"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_states (
+        user_id INTEGER PRIMARY KEY,
+        state TEXT NOT NULL,
+        expires_at INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_user_states_expires ON user_states (expires_at)")
+
+
+# Текст в индексе поиска: unicode61 сам приводит регистр, но не заменяет ё на е
+_FTS_DESCRIPTION = "replace(replace({0}.description, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _create_tasks_fts(conn: sqlite3.Connection):
+    """
+    Полнотекстовый индекс FTS5 по описаниям задач
+
+    Индекс без собственного содержимого (content=''): хранит только термы,
+    сами строки читаются из tasks по rowid. Триггеры обновляют его при
+    любом изменении tasks. Колонка user_id индексируется как терм, чтобы
+    поиск сразу ограничивался задачами одного пользователя.
+    """
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+        "description, user_id, content='', tokenize='unicode61 remove_diacritics 2')"
+    )
+    new_row = _FTS_DESCRIPTION.format("new")
+    old_row = _FTS_DESCRIPTION.format("old")
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+        INSERT INTO tasks_fts (rowid, description, user_id) VALUES (new.id, {new_row}, new.user_id);
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, description, user_id)
+        VALUES ('delete', old.id, {old_row}, old.user_id);
+    END
+    """)
+    conn.execute(f"""
+    CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF description, user_id ON tasks BEGIN
+        INSERT INTO tasks_fts (tasks_fts, rowid, description, user_id)
+        VALUES ('delete', old.id, {old_row}, old.user_id);
+        INSERT INTO tasks_fts (rowid, description, user_id) VALUES (new.id, {new_row}, new.user_id);
+    END
+    """)
+    conn.execute(
+        f"INSERT INTO tasks_fts (rowid, description, user_id) "
+        f"SELECT id, {_FTS_DESCRIPTION.format('tasks')}, user_id FROM tasks"
+    )
+
+
+def _add_task_vectors(conn: sqlite3.Connection):
+    """Векторы описаний задач для поиска похожих (dedup.encode) у всех задач"""
+    if not _column_exists(conn, "tasks", "vector"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN vector BLOB")
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, description FROM tasks WHERE vector IS NULL AND id > ? ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        conn.executemany("UPDATE tasks SET vector = ? WHERE id = ?",
+                         [(encode(description), task_id) for task_id, description in rows])
+
+
+def _add_task_precision(conn: sqlite3.Connection):
+    """
+    Точность и часовой пояс времени задачи, список задач по времени
+
+    Точность старых задач определяется по их тексту времени относительно
+    момента создания, пояс - текущий пояс сервера, в котором их due_at и
+    разбирался. Индекс по (user_id, время, id) заменяет индекс по
+    created_at: задачи без времени получают ключ 9999-12-31 и идут в конце.
+    """
+    if not _column_exists(conn, "tasks", "precision"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN precision TEXT")
+    if not _column_exists(conn, "tasks", "timezone"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN timezone TEXT")
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, time, created_at FROM tasks "
+            "WHERE precision IS NULL AND due_at IS NOT NULL AND id > ? ORDER BY id LIMIT ?",
+            (last_id, BACKFILL_BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        conn.executemany(
+            "UPDATE tasks SET precision = ? WHERE id = ?",
+            [(resolve_due(time_text, _created_local(created_at))[1], task_id)
+             for task_id, time_text, created_at in rows]
+        )
+    conn.execute("UPDATE tasks SET timezone = ? WHERE timezone IS NULL", (local_timezone_name(),))
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_user_due "
+        "ON tasks (user_id, IFNULL(due_at, 253402300799), id)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_user_created")
+
+
+def _create_user_settings(conn: sqlite3.Connection):
+    """Настройки пользователей: часовой пояс (имя IANA или смещение "+03:00")"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS user_settings (
+        user_id INTEGER PRIMARY KEY,
+        timezone TEXT NOT NULL,
+        updated_at INTEGER NOT NULL
+    )
+    """)
+
+
+def _create_ai_usage(conn: sqlite3.Connection):
+    """Учет запросов к ИИ: токены, стоимость и время по пользователям"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS ai_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER,
+        model TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        items INTEGER NOT NULL,
+        share REAL NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        cached_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        cost REAL NOT NULL,
+        latency_ms INTEGER NOT NULL,
+        created_at INTEGER NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_usage_created ON ai_usage (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_usage_user ON ai_usage (user_id, created_at)")
+
+
+def _add_task_archive(conn: sqlite3.Connection):
+    """
+    Отметка о выполнении задачи и архив старых задач
+
+    Задачи, выполненные или давно прошедшие, переносятся в tasks_archive
+    (см. archive.py): одна строка - пачка задач пользователя, сжатая zlib.
+    Индекс списка задач становится частичным и содержит только
+    невыполненные задачи. Частичный индекс по done_at и индекс по due_at
+    (миграция 3) находят кандидатов в архив без просмотра таблицы.
+    """
+    if not _column_exists(conn, "tasks", "done_at"):
+        conn.execute("ALTER TABLE tasks ADD COLUMN done_at INTEGER")
+    conn.execute("DROP INDEX IF EXISTS idx_tasks_user_due")
+    conn.execute(
+        "CREATE INDEX idx_tasks_user_due "
+        "ON tasks (user_id, IFNULL(due_at, 253402300799), id) WHERE done_at IS NULL"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_done ON tasks (done_at) WHERE done_at IS NOT NULL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS tasks_archive (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        tasks INTEGER NOT NULL,
+        first_task_id INTEGER NOT NULL,
+        last_task_id INTEGER NOT NULL,
+        archived_at INTEGER NOT NULL,
+        data BLOB NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_user ON tasks_archive (user_id)")
+
+
+# Миграции применяются по порядку; номер версии = позиция в списке.
+# Уже выпущенные миграции не меняются - только добавляются новые в конец.
+MIGRATIONS = [
+    _create_tasks_table,
+    _add_user_created_index,
+    _add_due_at,
+    _add_reminders,
+    _create_ai_cache,
+    _create_user_states,
+    _create_tasks_fts,
+    _add_task_vectors,
+    _add_task_precision,
+    _create_user_settings,
+    _create_ai_usage,
+    _add_task_archive,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Возвращает текущую версию схемы (PRAGMA user_version)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Обновляет схему базы до последней версии
+
+    Каждая миграция выполняется в отдельной транзакции вместе с обновлением
+    user_version, поэтому прерванное обновление безопасно продолжить при
+    следующем запуске. BEGIN IMMEDIATE не дает двум процессам применить
+    одну миграцию одновременно.
+
+    Returns:
+        Количество примененных миграций
+    """
+    # Обычный запуск: схема актуальна, проверка без блокировки записи
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return 0
+
+    applied = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = get_schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                return applied
+
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+            applied += 1
+        except Exception:
+            conn.rollback()
+            raise
@@ -0,0 +1,159 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from time_parser import (
+    resolve_due, local_timezone_name,
+    PRECISION_EXACT, PRECISION_PART_OF_DAY, PRECISION_DAY, PRECISION_WEEK
+)
+
+# Ключ сортировки задач без времени (9999-12-31): они идут после всех задач
+# со временем. Совпадает с выражением индекса idx_tasks_user_due (миграция 9)
+UNDATED_SORT_KEY = 253402300799
+
+WEEKDAYS_SHORT = ('пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс')
+PART_OF_DAY_NAMES = (
+    (6, 'ночью'),
+    (12, 'утром'),
+    (17, 'днем'),
+    (23, 'вечером'),
+)
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name: Optional[str]):
+    """
+    tzinfo по имени IANA или смещению "+03:00"; неизвестное имя - локальный пояс
+
+    Объекты поясов кэшируются, а ZoneInfo сам кэширует таблицу переходов
+    (летнее время, смена смещения), поэтому перевод времени - это поиск
+    по готовой таблице, а не чтение базы tzdata.
+    """
+    if name:
+        zone = _named_zone(name) or _offset_zone(name)
+        if zone is not None:
+            return zone
+    return datetime.now().astimezone().tzinfo
+
+
+def _named_zone(name: str):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def _offset_zone(name: str):
+    """Пояс с постоянным смещением из строки "+03:00" или None"""
+    if len(name) != 6 or name[0] not in '+-' or name[3] != ':':
+        return None
+    try:
+        offset = timedelta(hours=int(name[1:3]), minutes=int(name[4:]))
+    except ValueError:
+        return None
+    if offset >= timedelta(hours=24):
+        return None
+    return dt_timezone(offset if name[0] == '+' else -offset)
+
+
+def is_valid_timezone(name: str) -> bool:
+    """Известно ли имя пояса (IANA или смещение "+03:00")"""
+    return bool(name) and (_named_zone(name) or _offset_zone(name)) is not None
+
+
+def wall_clock(timezone: Optional[str]) -> datetime:
+    """Текущее время в поясе пользователя без tzinfo - "сейчас" для парсера времени"""
+    return datetime.now(get_zone(timezone)).replace(tzinfo=None)
+
+
+def to_epoch(moment: datetime, timezone: Optional[str]) -> int:
+    """Время без tzinfo в поясе пользователя -> UTC epoch"""
+    return int(moment.replace(tzinfo=get_zone(timezone)).timestamp())
+
+
+def move_to_timezone(due_at: int, old_timezone: Optional[str], new_timezone: Optional[str]) -> int:
+    """Тот же час на часах, но в другом поясе: 9:00 по Москве -> 9:00 по Якутску"""
+    moment = datetime.fromtimestamp(due_at, get_zone(old_timezone)).replace(tzinfo=None)
+    return to_epoch(moment, new_timezone)
+
+
+def _part_of_day(hour: int) -> str:
+    for limit, name in PART_OF_DAY_NAMES:
+        if hour < limit:
+            return name
+    return 'ночью'
+
+
+@dataclass(slots=True)
+class Task:
+    """
+    Задача пользователя
+
+    time хранит время так, как его ввел пользователь (или вернул ИИ),
+    due_at - тот же момент в UTC epoch, разобранный один раз при создании.
+    precision (PRECISION_*) говорит, насколько точно известен момент:
+    "вечером" и "к пятнице" тоже получают due_at, но показываются как
+    часть суток и день. timezone - пояс, в котором разбиралось время.
+    """
+    description: str
+    time: str
+    due_at: Optional[int] = None
+    precision: Optional[str] = None
+    timezone: Optional[str] = None
+    id: Optional[int] = None
+    created_at: Optional[str] = None
+
+    @classmethod
+    def from_text(cls, description: str, time_text: str, now: datetime = None,
+                  timezone: str = None) -> 'Task':
+        """
+        Создает задачу, разбирая текстовое время в поясе пользователя
+
+        Args:
+            description: Описание задачи
+            time_text: Время, как его ввел пользователь
+            now: "Сейчас" на часах пользователя (без tzinfo); по умолчанию текущее
+            timezone: Пояс пользователя; по умолчанию пояс сервера
+        """
+        timezone = timezone or local_timezone_name()
+        due, precision = resolve_due(time_text, now or wall_clock(timezone))
+        return cls(
+            description=description.strip(),
+            time=time_text.strip(),
+            due_at=to_epoch(due, timezone) if due else None,
+            precision=precision,
+            timezone=timezone
+        )
+
+    @classmethod
+    def from_row(cls, row) -> 'Task':
+        """Из строки запроса с колонками logic.TASK_COLUMNS"""
+        task_id, description, time_text, due_at, precision, timezone, created_at = row
+        return cls(description, time_text, due_at, precision, timezone, task_id, created_at)
+
+    @property
+    def sort_key(self) -> int:
+        """Ключ порядка в списке задач: время, задачи без времени - в конце"""
+        return self.due_at if self.due_at is not None else UNDATED_SORT_KEY
+
+    def display_time(self, now: datetime = None) -> str:
+        """Время задачи для показа: дата из due_at с учетом точности, иначе исходный текст"""
+        if self.due_at is None or self.precision is None:
+            return self.time
+
+        zone = get_zone(self.timezone)
+        moment = datetime.fromtimestamp(self.due_at, tz=zone)
+        year = (now or datetime.now(zone)).year
+        day = f"{moment:%d.%m}" if moment.year == year else f"{moment:%d.%m.%Y}"
+
+        if self.precision == PRECISION_EXACT:
+            return f"{WEEKDAYS_SHORT[moment.weekday()]} {day} {moment:%H:%M}"
+        if self.precision == PRECISION_PART_OF_DAY:
+            return f"{WEEKDAYS_SHORT[moment.weekday()]} {day} {_part_of_day(moment.hour)}"
+        if self.precision == PRECISION_DAY:
+            return f"{WEEKDAYS_SHORT[moment.weekday()]} {day}"
+        if self.precision == PRECISION_WEEK:
+            return f"около {day}"
+        return self.time
@@ -0,0 +1,292 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from telebot.apihelper import ApiTelegramException
+
+from metrics import increment, TELEGRAM_RETRIES, TYPING_COALESCED
+from rate_limit import TokenBucket
+
+# Лимит Telegram ~30 запросов в секунду на бота. Всплеск держим минимальным:
+# полное ведро на GLOBAL_SEND_RATE токенов вместе с пополнением дало бы
+# почти 50 запросов за первую секунду
+GLOBAL_SEND_RATE = 25
+GLOBAL_SEND_BURST = 1
+# Лимит одного чата: ~1 сообщение в секунду, короткий всплеск до CHAT_SEND_BURST
+CHAT_SEND_RATE = 1.0
+CHAT_SEND_BURST = 3
+# Потоки отправки; у каждого свое keep-alive соединение с Bot API (сессия
+# requests в pyTelegramBotAPI создается на поток)
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+# Сколько раз повторять запрос после 429 Too Many Requests
+MAX_SEND_RETRIES = 5
+# Индикатор "печатает" Telegram показывает 5 секунд или до следующего сообщения
+TYPING_DURATION = 5.0
+# Порог, после которого из словаря лимитов по чатам удаляются простаивающие записи
+CHAT_BUCKETS_PRUNE_SIZE = 10000
+
+
+class _Send:
+    __slots__ = ('method', 'chat_id', 'args', 'kwargs', 'future', 'attempts')
+
+    def __init__(self, method: str, chat_id, args, kwargs):
+        self.method = method
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+
+
+def _retry_after(error: ApiTelegramException):
+    """Сколько секунд просит подождать Telegram при 429; None для других ошибок"""
+    if error.error_code != 429:
+        return None
+    parameters = error.result_json.get('parameters') or {}
+    return float(parameters.get('retry_after', 1))
+
+
+class Outbox:
+    """
+    Очередь исходящих запросов к Telegram
+
+    Обработчики ставят сообщения в очередь и сразу возвращаются, а
+    несколько потоков отправляют их, соблюдая лимиты Telegram: общий
+    token bucket на бота и token bucket на каждый чат. У каждого чата своя
+    очередь, и в полете всегда не больше одного его запроса, поэтому
+    сообщения приходят в порядке отправки. Повторный "печатает" в чат, где
+    индикатор еще виден или уже ждет отправки, не отправляется. На 429
+    запрос возвращается в начало очереди чата и повторяется через
+    retry_after, не занимая поток отправки.
+
+    Пока очередь не запущена, запросы выполняются сразу в вызывающем потоке.
+    """
+
+    def __init__(self, bot, global_rate: float = GLOBAL_SEND_RATE, global_burst: float = GLOBAL_SEND_BURST,
+                 chat_rate: float = CHAT_SEND_RATE, chat_burst: float = CHAT_SEND_BURST,
+                 workers: int = OUTBOX_WORKERS):
+        """
+        Args:
+            bot: telebot.TeleBot, через который выполняются запросы
+            global_rate: Максимум запросов в секунду на всего бота
+            global_burst: Сколько запросов бота можно отправить подряд без паузы
+            chat_rate: Максимум сообщений в секунду в один чат
+            chat_burst: Сколько сообщений подряд можно отправить в чат без паузы
+            workers: Количество потоков отправки
+        """
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self._bucket = TokenBucket(global_rate, global_burst)
+        self._chat_buckets = {}
+        # Очереди чатов; чат с запросами, но без запроса в полете, лежит в
+        # куче _ready с моментом, когда его можно отправлять
+        self._queues = {}
+        self._ready = []
+        self._busy = set()
+        self._sequence = itertools.count()
+        self._typing_until = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = False
+        self.stats = {'sent': 0, 'retries': 0, 'coalesced': 0, 'errors': 0}
+
+    def start(self):
+        """Запускает потоки отправки"""
+        if self._running:
+            return
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._run, name=f"outbox-{index}", daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        """
+        Отправляет все, что осталось в очереди, и останавливает потоки
+
+        Запросы, получившие 429 во время остановки, тоже повторяются, пока
+        очереди не опустеют.
+        """
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def send_message(self, chat_id, text, **kwargs) -> Future:
+        return self.submit('send_message', chat_id, (chat_id, text), kwargs)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs) -> Future:
+        kwargs.update(chat_id=chat_id, message_id=message_id)
+        return self.submit('edit_message_text', chat_id, (text,), kwargs)
+
+    def send_chat_action(self, chat_id, action, **kwargs) -> Future:
+        return self.submit('send_chat_action', chat_id, (chat_id, action), kwargs)
+
+    def answer_callback_query(self, callback_query_id, *args, **kwargs) -> Future:
+        # Ответ на нажатие кнопки не доставляет сообщений: у него своя очередь
+        # без лимита чата, чтобы ответы разным пользователям шли параллельно
+        return self.submit('answer_callback_query', ('callback', callback_query_id),
+                           (callback_query_id,) + args, kwargs)
+
+    def submit(self, method: str, chat_id, args=(), kwargs=None) -> Future:
+        """
+        Ставит вызов bot.<method>(*args, **kwargs) в очередь чата chat_id
+
+        Returns:
+            Future с результатом запроса или с исключением. Лишний "печатает"
+            сразу получает результат True без запроса.
+        """
+        item = _Send(method, chat_id, args, kwargs or {})
+        with self._cond:
+            if self._running:
+                if self._redundant_typing(item):
+                    self.stats['coalesced'] += 1
+                    increment(TYPING_COALESCED)
+                    item.future.set_result(True)
+                    return item.future
+                queue = self._queues.get(chat_id)
+                if queue is None:
+                    queue = self._queues[chat_id] = deque()
+                queue.append(item)
+                if len(queue) == 1 and chat_id not in self._busy:
+                    self._push_ready(chat_id, 0.0)
+                return item.future
+
+        # Очередь не запущена: повторы после 429 выполняются в вызывающем потоке
+        retry_after = self._deliver(item)
+        while retry_after is not None:
+            time.sleep(retry_after)
+            retry_after = self._deliver(item)
+        return item.future
+
+    def _redundant_typing(self, item: _Send) -> bool:
+        """Индикатор уже виден или будет показан запросом из очереди"""
+        if item.method != 'send_chat_action' or item.args[1] != 'typing':
+            return False
+        if self._typing_until.get(item.chat_id, 0) > time.monotonic():
+            return True
+        return any(queued.method == 'send_chat_action' and queued.args[1] == 'typing'
+                   for queued in self._queues.get(item.chat_id, ()))
+
+    def _push_ready(self, chat_id, ready_at: float):
+        heapq.heappush(self._ready, (ready_at, next(self._sequence), chat_id))
+        self._cond.notify()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= CHAT_BUCKETS_PRUNE_SIZE:
+                # Наполнившееся ведро ничем не отличается от нового
+                now = time.monotonic()
+                self._chat_buckets = {
+                    chat: bucket for chat, bucket in self._chat_buckets.items() if not bucket.is_full()
+                }
+                self._typing_until = {chat: until for chat, until in self._typing_until.items() if until > now}
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _next(self):
+        """Ждет чат, которому можно отправлять, и берет его первый запрос; None после остановки"""
+        with self._cond:
+            while True:
+                if self._ready:
+                    ready_at, _, chat_id = self._ready[0]
+                    wait = ready_at - time.monotonic()
+                    if wait <= 0:
+                        heapq.heappop(self._ready)
+                        item = self._queues[chat_id][0]
+                        if item.method != 'answer_callback_query':
+                            wait = self._chat_bucket(chat_id).try_consume()
+                            if wait:
+                                self._push_ready(chat_id, time.monotonic() + wait)
+                                continue
+                        self._queues[chat_id].popleft()
+                        self._busy.add(chat_id)
+                        return item
+                elif not self._running and not self._busy:
+                    # Запрос в полете может вернуться в очередь после 429
+                    return None
+                else:
+                    wait = None
+                self._cond.wait(wait)
+
+    def _finish(self, chat_id, delay: float = 0.0):
+        """Снимает с чата отметку "в полете" и возвращает его в кучу, если очередь не пуста"""
+        with self._cond:
+            self._busy.discard(chat_id)
+            if self._queues[chat_id]:
+                self._push_ready(chat_id, time.monotonic() + delay)
+            else:
+                del self._queues[chat_id]
+                if not self._running:
+                    # Будим потоки, ждущие при остановке последних запросов в полете
+                    self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            delay = 0.0
+            if item.method != 'answer_callback_query':
+                self._bucket.consume()
+            retry_after = self._deliver(item)
+            if retry_after is not None:
+                with self._cond:
+                    self._queues[item.chat_id].appendleft(item)
+                delay = retry_after
+            self._finish(item.chat_id, delay)
+
+    def _deliver(self, item: _Send):
+        """
+        Выполняет запрос
+
+        Returns:
+            Через сколько секунд повторить запрос (Telegram ответил 429) или None
+        """
+        try:
+            result = getattr(self.bot, item.method)(*item.args, **item.kwargs)
+        except ApiTelegramException as e:
+            retry_after = _retry_after(e)
+            if retry_after is not None and item.attempts < MAX_SEND_RETRIES:
+                item.attempts += 1
+                with self._cond:
+                    self.stats['retries'] += 1
+                increment(TELEGRAM_RETRIES)
+                return retry_after
+            self._fail(item, e)
+            return None
+        except Exception as e:
+            self._fail(item, e)
+            return None
+
+        with self._cond:
+            self.stats['sent'] += 1
+            if item.method == 'send_chat_action':
+                if item.args[1] == 'typing':
+                    self._typing_until[item.chat_id] = time.monotonic() + TYPING_DURATION
+            else:
+                # Новое сообщение скрывает индикатор "печатает"
+                self._typing_until.pop(item.chat_id, None)
+        item.future.set_result(result)
+        return None
+
+    def _fail(self, item: _Send, error: Exception):
+        with self._cond:
+            self.stats['errors'] += 1
+        print(f"❌ Ошибка отправки в Telegram ({item.method}): {error}")
+        item.future.set_exception(error)
@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket
+
+    Ведро пополняется со скоростью rate токенов в секунду и вмещает не
+    больше capacity токенов, что позволяет короткие всплески.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def try_consume(self, tokens: float = 1) -> float:
+        """
+        Пытается забрать токены
+
+        Returns:
+            0, если токены списаны, иначе сколько секунд нужно подождать
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def is_full(self) -> bool:
+        """Ведро наполнено - такое же, как только что созданное"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= self.capacity
+
+    def consume(self, tokens: float = 1):
+        """Блокирует поток, пока токены не будут списаны"""
+        while True:
+            wait = self.try_consume(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+# Лимиты запросов к ИИ на пользователя по тарифам:
+# (запросов в минуту, сколько можно сделать подряд); None - без ограничений
+USER_RATE_TIERS = {
+    'default': (6, 10),
+    'premium': (30, 30),
+    'admin': None,
+}
+# Больше пользователей в памяти не держится: самые давно неактивные вытесняются
+USER_RATE_MAX_USERS = 200000
+
+
+class UserRateLimiter:
+    """
+    Token bucket на каждого пользователя с тарифами
+
+    Ведро пользователя - это пара (токены, время обновления) в OrderedDict
+    в порядке последнего обращения, поэтому проверка и вытеснение стоят
+    O(1). Ведро, не тронутое дольше, чем нужно для полного пополнения,
+    ничем не отличается от нового и удаляется при следующих обращениях;
+    так в памяти остаются только активные пользователи.
+    """
+
+    def __init__(self, tier_of=None, tiers: dict = None, max_users: int = USER_RATE_MAX_USERS):
+        """
+        Args:
+            tier_of: Функция tier_of(user_id) -> имя тарифа (по умолчанию 'default')
+            tiers: Тарифы в формате USER_RATE_TIERS
+            max_users: Сколько ведер хранить не больше
+        """
+        self.tier_of = tier_of or (lambda user_id: 'default')
+        self.tiers = tiers if tiers is not None else USER_RATE_TIERS
+        self.max_users = max_users
+        # Ведро, не использовавшееся столько секунд, заведомо полное
+        self.idle_ttl = max(burst / (rate / 60) for rate, burst in filter(None, self.tiers.values()))
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'allowed': 0, 'limited': 0, 'evicted': 0}
+
+    def __len__(self):
+        with self._lock:
+            return len(self._buckets)
+
+    def allow(self, user_id: int) -> bool:
+        """Списывает токен пользователя; False - лимит исчерпан"""
+        limit = self.tiers.get(self.tier_of(user_id), self.tiers['default'])
+        if limit is None:
+            return True
+        rate, burst = limit[0] / 60, limit[1]
+
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.pop(user_id, None)
+            tokens = burst if bucket is None else min(burst, bucket[0] + (now - bucket[1]) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[user_id] = (tokens, now)
+            self._evict(now)
+            self.stats['allowed' if allowed else 'limited'] += 1
+            return allowed
+
+    def _evict(self, now: float):
+        """Удаляет самые давние ведра: заведомо полные и сверх max_users"""
+        buckets = self._buckets
+        while buckets:
+            user_id, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self.idle_ttl and len(buckets) <= self.max_users:
+                return
+            del buckets[user_id]
+            self.stats['evicted'] += 1
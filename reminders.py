@@ -0,0 +1,169 @@
+import heapq
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from logic import get_pending_reminders, mark_reminded
+
+# Лимит Telegram ~1 сообщение в секунду в один чат. Общий лимит бота
+# соблюдает send (очередь отправки outbox.Outbox)
+CHAT_SEND_INTERVAL = 1.0
+# Напоминания, пропущенные за время простоя не дольше этого, отправляются при запуске
+MISSED_GRACE = 3600
+# Потоки, отправляющие сообщения (HTTP-запрос не задерживает планировщик)
+DELIVERY_WORKERS = 4
+# Порог, после которого из словаря лимитов по чатам удаляются устаревшие записи
+CHAT_LIMITS_PRUNE_SIZE = 10000
+
+
+def reminder_text(description: str, time_text: str) -> str:
+    text = "⏰ Напоминание!\n\n"
+    text += f"📝 {description}\n"
+    text += f"🕐 {time_text}"
+    return text
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний на min-куче
+
+    Ожидающие напоминания хранятся в куче по due_at. Поток планировщика
+    спит на Condition ровно до ближайшего напоминания и просыпается
+    раньше, только если добавлено более раннее напоминание, поэтому даже
+    при сотнях тысяч ожидающих задач процессор не занят опросом таблицы.
+
+    due_at хранится в UTC, поэтому одна очередь обслуживает пользователей
+    всех часовых поясов: каждое пробуждение забирает из кучи все
+    наступившие напоминания разом ("завтра в 9:00" тысяч пользователей
+    одного пояса - одна выборка), без пересчета времени при отправке.
+    """
+
+    def __init__(self, send, chat_interval: float = CHAT_SEND_INTERVAL, workers: int = DELIVERY_WORKERS):
+        """
+        Args:
+            send: Функция send(chat_id, text, task_id), отправляющая сообщение
+                (task_id - для кнопки "Выполнено")
+            chat_interval: Минимальный интервал между сообщениями в один чат
+            workers: Количество потоков отправки
+        """
+        self._send = send
+        # (время отправки, task_id, user_id, description, time, due_at); время отправки
+        # позже due_at, если чат отложен лимитом
+        self._heap = []
+        self._cond = threading.Condition()
+        self._chat_interval = chat_interval
+        self._chat_next = {}
+        self._workers = workers
+        self._executor = None
+        self._thread = None
+        self._running = False
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    def load_pending(self, missed_grace: int = MISSED_GRACE, shard=None) -> int:
+        """
+        Загружает из базы неотправленные напоминания; возвращает их количество
+
+        shard=(номер, всего) загружает только пользователей своего шарда,
+        когда напоминания рассылают несколько процессов.
+        """
+        rows = get_pending_reminders(int(time.time()) - missed_grace, shard)
+        entries = [(due_at, task_id, user_id, description, time_text, due_at)
+                   for task_id, user_id, description, time_text, due_at in rows]
+        with self._cond:
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(entries)
+
+    def schedule(self, task_id: int, user_id: int, description: str, time_text: str, due_at: int) -> bool:
+        """Добавляет напоминание о новой задаче; прошедшее время не планируется"""
+        if due_at is None or due_at <= time.time():
+            return False
+        with self._cond:
+            heapq.heappush(self._heap, (due_at, task_id, user_id, description, time_text, due_at))
+            # Будим поток, только если новое напоминание стало ближайшим
+            if self._heap[0][1] == task_id:
+                self._cond.notify()
+        return True
+
+    def start(self):
+        """Запускает поток планировщика"""
+        if self._running:
+            return
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="reminder")
+        self._thread = threading.Thread(target=self._run, name="reminder-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Останавливает планировщик и дожидается отправки уже взятых напоминаний"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _next_due(self):
+        """Ждет наступления ближайшего напоминания и забирает все наступившие; None при остановке"""
+        with self._cond:
+            while self._running:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                now = time.time()
+                delay = self._heap[0][0] - now
+                if delay <= 0:
+                    due = []
+                    while self._heap and self._heap[0][0] <= now:
+                        due.append(heapq.heappop(self._heap))
+                    return due
+                self._cond.wait(delay)
+            return None
+
+    def _run(self):
+        while True:
+            due = self._next_due()
+            if due is None:
+                return
+
+            deferred = []
+            for entry in due:
+                if not self._running:
+                    # Неотправленные напоминания остаются в базе и загрузятся при запуске
+                    return
+                _, task_id, user_id, description, time_text, due_at = entry
+                now = time.time()
+                next_allowed = self._chat_next.get(user_id, 0)
+                if next_allowed > now:
+                    # В этот чат недавно писали - откладываем, не задерживая остальные чаты
+                    deferred.append((next_allowed, task_id, user_id, description, time_text, due_at))
+                    continue
+
+                self._chat_next[user_id] = now + self._chat_interval
+                self._executor.submit(self._deliver, task_id, user_id, description, time_text, due_at)
+
+            if deferred:
+                with self._cond:
+                    for entry in deferred:
+                        heapq.heappush(self._heap, entry)
+            if len(self._chat_next) > CHAT_LIMITS_PRUNE_SIZE:
+                now = time.time()
+                self._chat_next = {chat_id: moment for chat_id, moment in self._chat_next.items()
+                                   if moment > now}
+
+    def _deliver(self, task_id: int, user_id: int, description: str, time_text: str, due_at: int):
+        # Сначала атомарно отмечаем задачу: удаленные и перенесенные задачи и
+        # напоминания, уже отправленные другим процессом, пропускаются
+        if not mark_reminded(task_id, due_at):
+            return
+        try:
+            self._send(user_id, reminder_text(description, time_text), task_id)
+        except Exception as e:
+            print(f"❌ Ошибка отправки напоминания: {e}")
@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import logic
+from storage import get_connection
+
+# Сколько секунд живет брошенный диалог (пользователь начал добавление и ушел)
+STATE_TTL = 24 * 3600
+# Сколько состояний держать в памяти; самые давние вытесняются
+STATE_MAX_ENTRIES = 100000
+# Как часто удалять просроченные состояния из таблицы
+STATE_PURGE_INTERVAL = 3600
+
+_MISSING = object()
+
+
+class MemoryStateStore:
+    """
+    Состояния диалогов в памяти с TTL и вытеснением по LRU
+
+    Интерфейс как у dict (get, pop, in, [], del), поэтому хранилище
+    подставляется вместо прежнего user_states = {}. Память ограничена
+    max_entries независимо от числа пользователей.
+    """
+
+    def __init__(self, ttl: int = STATE_TTL, max_entries: int = STATE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._states)
+
+    def get(self, user_id: int, default=None):
+        with self._lock:
+            entry = self._states.get(user_id)
+            if entry is None:
+                return default
+            expires_at, state = entry
+            if expires_at <= time.time():
+                del self._states[user_id]
+                return default
+            self._states.move_to_end(user_id)
+            return state
+
+    def __getitem__(self, user_id: int):
+        state = self.get(user_id, _MISSING)
+        if state is _MISSING:
+            raise KeyError(user_id)
+        return state
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id, _MISSING) is not _MISSING
+
+    def __setitem__(self, user_id: int, state):
+        with self._lock:
+            self._states[user_id] = (time.time() + self.ttl, state)
+            self._states.move_to_end(user_id)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+
+    def __delitem__(self, user_id: int):
+        with self._lock:
+            del self._states[user_id]
+
+    def pop(self, user_id: int, default=None):
+        state = self.get(user_id, _MISSING)
+        if state is _MISSING:
+            return default
+        with self._lock:
+            self._states.pop(user_id, None)
+        return state
+
+
+class SQLiteStateStore:
+    """
+    Состояния диалогов в таблице user_states
+
+    Переживают перезапуск и общие для нескольких процессов бота с одной
+    базой. Состояние хранится как JSON, просроченные строки не читаются
+    и периодически удаляются, поэтому таблица не растет бесконечно.
+    """
+
+    def __init__(self, ttl: int = STATE_TTL):
+        self.ttl = ttl
+        self._last_purge = 0.0
+
+    def _connect(self):
+        return get_connection(logic.DB_PATH)
+
+    def __len__(self):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM user_states WHERE expires_at > ?", (int(time.time()),)
+        ).fetchone()[0]
+
+    def get(self, user_id: int, default=None):
+        try:
+            row = self._connect().execute(
+                "SELECT state FROM user_states WHERE user_id = ? AND expires_at > ?",
+                (user_id, int(time.time()))
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка чтения состояния: {e}")
+            return default
+        return json.loads(row[0]) if row else default
+
+    def __getitem__(self, user_id: int):
+        state = self.get(user_id, _MISSING)
+        if state is _MISSING:
+            raise KeyError(user_id)
+        return state
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id, _MISSING) is not _MISSING
+
+    def __setitem__(self, user_id: int, state):
+        now = int(time.time())
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO user_states (user_id, state, expires_at) VALUES (?, ?, ?)",
+                    (user_id, json.dumps(state, ensure_ascii=False), now + self.ttl)
+                )
+                if now - self._last_purge > STATE_PURGE_INTERVAL:
+                    self._last_purge = now
+                    conn.execute("DELETE FROM user_states WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка сохранения состояния: {e}")
+
+    def __delitem__(self, user_id: int):
+        if self.pop(user_id, _MISSING) is _MISSING:
+            raise KeyError(user_id)
+
+    def pop(self, user_id: int, default=None):
+        state = self.get(user_id, _MISSING)
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM user_states WHERE user_id = ?", (user_id,))
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка удаления состояния: {e}")
+        return default if state is _MISSING else state
+
+
+def create_state_store(kind: str = None):
+    """
+    Создает хранилище состояний по имени: "sqlite" (по умолчанию) или "memory"
+
+    Имя берется из переменной окружения STATE_STORE, если не передано явно.
+    """
+    kind = (kind or os.getenv("STATE_STORE", "sqlite")).lower()
+    if kind == "memory":
+        return MemoryStateStore()
+    if kind == "sqlite":
+        return SQLiteStateStore()
+    raise ValueError(f"Неизвестное хранилище состояний: {kind}")
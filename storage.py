@@ -0,0 +1,95 @@
+import sqlite3
+import threading
+
+# Настройки соединений SQLite
+PRAGMAS = (
+    # До создания таблиц: новая база сразу отдает свободные страницы
+    # по PRAGMA incremental_vacuum; существующую переводит archive.py
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",       # читатели не блокируют писателя
+    "PRAGMA synchronous=NORMAL",     # в режиме WAL fsync только на checkpoint
+    "PRAGMA cache_size=-16000",      # ~16 МБ кэша страниц на соединение
+    "PRAGMA mmap_size=268435456",    # до 256 МБ файла читаются через mmap
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Сколько подготовленных выражений держит каждое соединение
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+# Увеличивается при close_all(), чтобы потоки переоткрыли свои соединения
+_generation = 0
+
+
+def _open_connection(db_path: str) -> sqlite3.Connection:
+    """Открывает соединение и применяет к нему PRAGMA-настройки"""
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+def get_connection(db_path: str) -> sqlite3.Connection:
+    """
+    Возвращает соединение текущего потока для указанной базы
+
+    Соединение открывается один раз на поток и переиспользуется, поэтому
+    подготовленные выражения sqlite3 остаются в кэше между вызовами.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and _local.path == db_path and _local.generation == _generation:
+        return conn
+
+    if conn is not None:
+        _forget(conn)
+
+    conn = _open_connection(db_path)
+    _local.conn = conn
+    _local.path = db_path
+    _local.generation = _generation
+    with _connections_lock:
+        _connections.append(conn)
+    return conn
+
+
+def _forget(conn: sqlite3.Connection):
+    """Закрывает соединение и убирает его из реестра"""
+    with _connections_lock:
+        if conn in _connections:
+            _connections.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def close_connection():
+    """Закрывает соединение текущего потока"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        _forget(conn)
+        _local.conn = None
+        _local.path = None
+
+
+def close_all():
+    """Закрывает все открытые соединения (вызывается при остановке)"""
+    global _generation
+    with _connections_lock:
+        _generation += 1
+        connections = list(_connections)
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.conn = None
+    _local.path = None
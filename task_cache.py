@@ -0,0 +1,172 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Сколько памяти (оценка по размеру строк) может занимать кэш
+TASK_CACHE_MAX_BYTES = 16 * 1024 * 1024
+# Накладные расходы на одну запись пользователя (объект, ключ, место в OrderedDict)
+ENTRY_OVERHEAD = 200
+
+
+class _UserEntry:
+    __slots__ = ('count', 'first_page', 'size', 'version')
+
+    def __init__(self):
+        self.count = None
+        self.first_page = None
+        self.size = ENTRY_OVERHEAD
+        self.version = 0
+
+
+def _page_size(page) -> int:
+    """Оценка памяти, занимаемой страницей (список models.Task, has_more)"""
+    tasks, _ = page
+    size = sys.getsizeof(tasks)
+    for task in tasks:
+        size += sys.getsizeof(task) + sum(sys.getsizeof(getattr(task, name)) for name in task.__slots__)
+    return size
+
+
+class TaskCache:
+    """
+    Кэш чтений задач по пользователям: количество и первая страница списка
+
+    LRU по пользователям с ограничением памяти. Записи обновляются при
+    изменении задач (logic.py вызывает added/removed/cleared/changed).
+    Чтение из базы, начатое до изменения, не попадает в кэш: перед
+    запросом берется token(), и put_* проверяет, что запись пользователя
+    с тех пор не менялась.
+    """
+
+    def __init__(self, max_bytes: int = TASK_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._users = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, user_id: int, field: str):
+        with self._lock:
+            entry = self._users.get(user_id)
+            value = getattr(entry, field) if entry is not None else None
+            if value is None:
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return value
+
+    def get_count(self, user_id: int) -> Optional[int]:
+        return self._lookup(user_id, 'count')
+
+    def get_first_page(self, user_id: int):
+        """Первая страница (rows, has_more) или None"""
+        return self._lookup(user_id, 'first_page')
+
+    def token(self, user_id: int):
+        """Отметка состояния записи пользователя перед чтением из базы"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                entry = self._users[user_id] = _UserEntry()
+                self._bytes += entry.size
+                self._evict()
+            return entry, entry.version
+
+    def put_count(self, user_id: int, token, count: int):
+        entry, version = token
+        with self._lock:
+            if self._users.get(user_id) is entry and entry.version == version:
+                entry.count = count
+
+    def put_first_page(self, user_id: int, token, page):
+        entry, version = token
+        size = _page_size(page)
+        with self._lock:
+            if self._users.get(user_id) is entry and entry.version == version:
+                self._resize(entry, ENTRY_OVERHEAD + size)
+                entry.first_page = page
+                self._evict()
+
+    def added(self, user_id: int, count: int = 1):
+        """Добавлены задачи: количество увеличивается, первая страница перечитывается"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            entry.version += 1
+            if entry.count is not None:
+                entry.count += count
+            # Список упорядочен по времени задач: новая задача может попасть
+            # на любую страницу, в том числе первую
+            self._drop_page(entry)
+
+    def changed(self, user_id: int):
+        """Изменены поля задач: первая страница перечитывается"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is not None:
+                entry.version += 1
+                self._drop_page(entry)
+
+    def removed(self, user_id: int):
+        """Удалена задача: запись пользователя сбрасывается"""
+        with self._lock:
+            entry = self._users.pop(user_id, None)
+            if entry is not None:
+                entry.version += 1
+                self._bytes -= entry.size
+
+    def cleared(self, user_id: int):
+        """Удалены все задачи пользователя"""
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return
+            entry.version += 1
+            self._drop_page(entry)
+            entry.count = 0
+            entry.first_page = ([], False)
+
+    def clear(self):
+        with self._lock:
+            for entry in self._users.values():
+                entry.version += 1
+            self._users.clear()
+            self._bytes = 0
+
+    def _drop_page(self, entry: _UserEntry):
+        entry.first_page = None
+        self._resize(entry, ENTRY_OVERHEAD)
+
+    def _resize(self, entry: _UserEntry, size: int):
+        self._bytes += size - entry.size
+        entry.size = size
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._users) > 1:
+            _, evicted = self._users.popitem(last=False)
+            evicted.version += 1
+            self._bytes -= evicted.size
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика кэша: попадания, промахи, пользователи и память"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'users': len(self._users),
+                'memory_bytes': self._bytes
+            }
+
+
+task_cache = TaskCache()
+
+
+def get_task_cache_stats() -> Dict[str, Any]:
+    """Статистика кэша задач"""
+    return task_cache.get_stats()
@@ -0,0 +1,85 @@
+import re
+from typing import List, Optional
+
+# Сколько слов запроса учитывать
+MAX_QUERY_TERMS = 8
+# Короче этого слова не обрезаются: "чай", "код"
+MIN_STEM_LENGTH = 3
+# Слова до этой длины ("в", "с", "по") ищутся целиком: префикс "с*" совпал бы почти со всем
+MAX_EXACT_LENGTH = 2
+
+# Окончания и суффиксы словоизменения, от длинных к коротким. Отрезается одно,
+# остаток ищется как префикс: "молока" -> "молок*" найдет "молоко" и "молоком"
+RUSSIAN_ENDINGS = sorted((
+    # прилагательные и причастия
+    'ыми', 'ими', 'ого', 'его', 'ому', 'ему', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ый', 'ий', 'ой', 'ую', 'юю', 'ых', 'их', 'ым', 'им', 'ом', 'ем',
+    # существительные
+    'иями', 'ами', 'ями', 'иях', 'ах', 'ях', 'ов', 'ев', 'ей', 'ам', 'ям', 'ью',
+    'ия', 'ии', 'ию', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+    # глаголы
+    'ать', 'ять', 'ить', 'еть', 'уть', 'ешь', 'ете', 'ите', 'ет', 'ут', 'ют', 'ит',
+    'ат', 'ят', 'ала', 'али', 'ало', 'ила', 'или', 'ал', 'ил',
+), key=len, reverse=True)
+
+_WORD_RE = re.compile(r'\w+')
+_REFLEXIVE_RE = re.compile(r'(?:ся|сь)$')
+
+
+def normalize_word(word: str) -> str:
+    """Нижний регистр и ё -> е, как в индексе tasks_fts"""
+    return word.lower().replace('ё', 'е')
+
+
+def stem(word: str) -> str:
+    """Грубый стеммер: отрезает возвратную частицу и одно окончание"""
+    word = normalize_word(word)
+    if len(word) <= MIN_STEM_LENGTH or not re.search('[а-я]', word):
+        return word
+    word = _REFLEXIVE_RE.sub('', word) if len(word) - 2 >= MIN_STEM_LENGTH else word
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def query_terms(text: str) -> List[str]:
+    """Основы слов запроса (не больше MAX_QUERY_TERMS)"""
+    terms = []
+    for word in _WORD_RE.findall(text)[:MAX_QUERY_TERMS]:
+        base = stem(word).replace('"', '')
+        if base:
+            terms.append(base)
+    return terms
+
+
+def build_match_query(terms: List[str], user_id: int) -> Optional[str]:
+    """
+    Строит выражение FTS5 MATCH для поиска задач пользователя
+
+    Каждая основа превращается в префиксный терм, все термы обязательны.
+    Пользователь отбирается по колонке user_id индекса, поэтому поиск не
+    касается чужих задач.
+
+    Returns:
+        Выражение для MATCH или None, если в запросе нет слов
+    """
+    if not terms:
+        return None
+    phrases = [f'"{base}"' if len(base) <= MAX_EXACT_LENGTH else f'"{base}"*' for base in terms]
+    return f'user_id : "{int(user_id)}" AND description : ({" ".join(phrases)})'
+
+
+def relevance(description: str, terms: List[str]) -> float:
+    """
+    Релевантность задачи запросу
+
+    Все найденные задачи содержат все термы, поэтому важны только частота
+    совпадений и длина описания (как tf и нормировка длины в bm25).
+    Считаются вхождения основ в начале слов; строка обрабатывается
+    целиком, без разбиения на слова, чтобы ранжирование сотен строк
+    занимало доли миллисекунды.
+    """
+    text = " " + normalize_word(description)
+    score = sum(text.count(" " + base) for base in terms)
+    return score / (1 + 0.05 * text.count(" "))
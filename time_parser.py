@@ -0,0 +1,311 @@
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+# Час по умолчанию для частей суток
+PART_OF_DAY_HOURS = {
+    'утром': 9, 'утро': 9,
+    'днем': 13, 'днём': 13, 'день': 13,
+    'вечером': 19, 'вечер': 19,
+    'ночью': 23, 'ночь': 23,
+}
+
+# Основы названий дней недели (покрывают все падежи: "в пятницу", "к пятнице")
+WEEKDAY_STEMS = {
+    'понедельник': 0, 'вторник': 1, 'сред': 2, 'четверг': 3,
+    'пятниц': 4, 'суббот': 5, 'воскресень': 6
+}
+
+# Если указан только день, напоминаем в это время
+DEFAULT_HOUR = 9
+
+# Точность времени задачи
+PRECISION_EXACT = 'exact'              # известны день и время
+PRECISION_PART_OF_DAY = 'part_of_day'  # "вечером": час выбран по части суток
+PRECISION_DAY = 'day'                  # известен только день
+PRECISION_WEEK = 'week'                # "на следующей неделе", "через неделю"
+
+CLOCK_RE = re.compile(r'\b([01]?\d|2[0-3]):([0-5]\d)\b')
+HOUR_WITH_PART_RE = re.compile(r'\bв (\d{1,2})\s*(?:ч(?:ас(?:а|ов)?)?\s*)?(утра|дня|вечера|ночи)\b')
+DATE_RE = re.compile(r'\b(\d{1,2})\.(\d{1,2})(?:\.(\d{2,4}))?\b')
+RELATIVE_RE = re.compile(r'\bчерез (\d+|пол)?\s*(минут[уы]?|час(?:а|ов)?|д(?:ень|ня|ней))\b')
+WEEKDAY_RE = re.compile(r'\b(?:в|во|к|ко|до|на)\s+(' + '|'.join(WEEKDAY_STEMS) + r')[а-я]*\b')
+PART_OF_DAY_RE = re.compile(r'\b(' + '|'.join(PART_OF_DAY_HOURS) + r')\b')
+
+
+def _resolve_date(text: str, now: datetime, clock=None):
+    """
+    Возвращает (дата, явное_время, точность) для даты в тексте
+
+    Явное время есть только у "через N часов/минут"; если даты в тексте
+    нет, возвращается (None, None, None). clock - время из текста
+    (_resolve_clock): по нему сегодняшний день недели, час которого уже
+    прошел, переносится на неделю вперед.
+    """
+    if 'послезавтра' in text:
+        return (now + timedelta(days=2)).date(), None, PRECISION_DAY
+    if 'завтра' in text:
+        return (now + timedelta(days=1)).date(), None, PRECISION_DAY
+    if 'сегодня' in text:
+        return now.date(), None, PRECISION_DAY
+
+    relative = RELATIVE_RE.search(text)
+    if relative:
+        amount = relative.group(1)
+        unit = relative.group(2)
+        count = 0.5 if amount == 'пол' else int(amount or 1)
+        if unit.startswith('минут'):
+            moment = now + timedelta(minutes=count)
+        elif unit.startswith('час'):
+            moment = now + timedelta(hours=count)
+        else:
+            return (now + timedelta(days=count)).date(), None, PRECISION_DAY
+        return moment.date(), moment.time().replace(second=0, microsecond=0), PRECISION_EXACT
+
+    if 'через неделю' in text:
+        return (now + timedelta(weeks=1)).date(), None, PRECISION_WEEK
+    if 'на следующей неделе' in text:
+        return (now + timedelta(days=7 - now.weekday())).date(), None, PRECISION_WEEK
+
+    weekday = WEEKDAY_RE.search(text)
+    if weekday:
+        target = WEEKDAY_STEMS[weekday.group(1)]
+        days_ahead = (target - now.weekday()) % 7
+        hour, minute = clock[:2] if clock else (DEFAULT_HOUR, 0)
+        if days_ahead == 0 and now.replace(hour=hour, minute=minute, second=0, microsecond=0) <= now:
+            # "В пятницу" в пятницу после назначенного часа - следующая пятница
+            days_ahead = 7
+        return (now + timedelta(days=days_ahead)).date(), None, PRECISION_DAY
+
+    date = DATE_RE.search(text)
+    if date:
+        day, month, year = int(date.group(1)), int(date.group(2)), date.group(3)
+        if year:
+            year = int(year) + (2000 if len(year) == 2 else 0)
+        else:
+            year = now.year
+        try:
+            resolved = datetime(year, month, day).date()
+        except ValueError:
+            return None, None, None
+        if not date.group(3) and resolved < now.date():
+            resolved = resolved.replace(year=year + 1)
+        return resolved, None, PRECISION_DAY
+
+    return None, None, None
+
+
+def _resolve_clock(text: str):
+    """Возвращает (час, минута, точность) из текста или None"""
+    clock = CLOCK_RE.search(text)
+    if clock:
+        return int(clock.group(1)), int(clock.group(2)), PRECISION_EXACT
+
+    hour_with_part = HOUR_WITH_PART_RE.search(text)
+    if hour_with_part:
+        hour = int(hour_with_part.group(1)) % 12
+        part = hour_with_part.group(2)
+        if part in ('дня', 'вечера'):
+            hour += 12
+        elif part == 'ночи' and hour >= 6:
+            hour += 12
+        if hour < 24:
+            return hour, 0, PRECISION_EXACT
+
+    part_of_day = PART_OF_DAY_RE.search(text)
+    if part_of_day:
+        return PART_OF_DAY_HOURS[part_of_day.group(1)], 0, PRECISION_PART_OF_DAY
+
+    return None
+
+
+def resolve_due(time_text: str, now: datetime = None) -> Tuple[Optional[datetime], Optional[str]]:
+    """
+    Переводит текстовое время задачи в абсолютный момент и его точность
+
+    Args:
+        time_text: Время задачи как его ввел пользователь или вернул ИИ
+        now: Момент, относительно которого считаются "завтра", "вечером" и т.п.
+
+    Returns:
+        (локальное datetime без tzinfo, точность PRECISION_*) или (None, None),
+        если время не распознано
+    """
+    if not time_text:
+        return None, None
+    if now is None:
+        now = datetime.now()
+
+    text = time_text.lower().replace('ё', 'е')
+    clock = _resolve_clock(text)
+    date, exact_time, date_precision = _resolve_date(text, now, clock)
+    if exact_time is not None:
+        return datetime.combine(date, exact_time), PRECISION_EXACT
+
+    if date is None and clock is None:
+        return None, None
+
+    hour, minute, precision = clock if clock else (DEFAULT_HOUR, 0, date_precision)
+    if date is None:
+        due = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        # Время без даты, которое уже прошло сегодня, относится к завтра
+        if due <= now:
+            due += timedelta(days=1)
+        return due, precision
+
+    return datetime.combine(date, datetime.min.time()).replace(hour=hour, minute=minute), precision
+
+
+def parse_due_at(time_text: str, now: datetime = None) -> Optional[datetime]:
+    """Абсолютный момент времени задачи (локальное datetime без tzinfo) или None"""
+    return resolve_due(time_text, now)[0]
+
+
+def due_timestamp(time_text: str, now: datetime = None) -> Optional[int]:
+    """Возвращает время задачи как UTC epoch (секунды) или None"""
+    due = parse_due_at(time_text, now)
+    return int(due.timestamp()) if due else None
+
+
+def local_timezone_name() -> str:
+    """
+    Имя часового пояса сервера (IANA), в котором разбирается время задач
+
+    Берется из TZ или ссылки /etc/localtime; если имя не определить -
+    смещение от UTC вида "+03:00".
+    """
+    name = os.getenv("TZ", "").lstrip(":")
+    if name:
+        return name
+    target = os.path.realpath("/etc/localtime")
+    if "zoneinfo/" in target:
+        return target.split("zoneinfo/", 1)[1]
+    offset = datetime.now().astimezone().strftime("%z")
+    return f"{offset[:3]}:{offset[3:]}"
+
+
+# Фрагменты времени, которые локальный разбор вырезает из текста задачи
+_WEEKDAY_WORDS = '|'.join(WEEKDAY_STEMS)
+# День и месяц, которые могут быть датой (1..31 и 1..12)
+_DAY_MONTH = r'(?:0?[1-9]|[12]\d|3[01])\.(?:0?[1-9]|1[0-2])'
+# Единица измерения после числа: "на 2.5 часа", "на 1.5 кг" - количество, а не дата
+_NOT_QUANTITY = (
+    r'(?!\s*(?:кг|г|гр|л|мл|м|км|см|мм|шт|р|руб|%)(?![а-я])'
+    r'|\s*(?:литр|метр|час|минут|секунд|рубл|доллар|евро|штук|раз|процент|килограмм|грамм)[а-я]*)'
+)
+TIME_FRAGMENT_PATTERN = (
+    r'\b(?:сегодня|послезавтра|завтра)\b'
+    r'|\bчерез (?:\d+\s*|пол)?(?:минут[уы]?|час(?:а|ов)?|д(?:ень|ня|ней)|недел[юи])\b'
+    r'|\bна следующей неделе\b'
+    r'|\b(?:в|во|к|ко|до|на)\s+(?:' + _WEEKDAY_WORDS + r')[а-я]*\b'
+    r'|(?:\b(?:в|к|до|на)\s+)?\b(?:[01]?\d|2[0-3]):[0-5]\d\b'
+    r'|\bв \d{1,2}\s*(?:ч(?:ас(?:а|ов)?)?\s*)?(?:утра|дня|вечера|ночи)\b'
+    r'|\b(?:утром|днем|днём|вечером|ночью)\b'
+    # Дата без года - только после предлога: "2.5 кг" - количество, а не 2 мая
+    r'|\b(?:к|до|на)\s+' + _DAY_MONTH + r'(?:\.\d{2,4})?\b' + _NOT_QUANTITY +
+    r'|(?:\b(?:к|до|на)\s+)?\b' + _DAY_MONTH + r'\.\d{2,4}\b'
+)
+# Служебные слова, которые не относятся к описанию задачи
+FILLER_PATTERN = r'\b(?:напомни(?:ть)?|напоминай|мне|я должен|нужно|надо)\b'
+# Буквы, с которых начинаются фрагменты времени и служебные слова
+_FRAGMENT_FIRST_CHARS = r'[вдзкмнпсуяч\d]'
+# Предлог, оставшийся в конце описания после вырезания времени ("Сдать отчет до")
+_DANGLING_WORDS = frozenset(('в', 'во', 'на', 'к', 'ко', 'до', 'после', 'и'))
+_DESCRIPTION_PUNCTUATION = ' ,.;:-'
+
+
+class FallbackParser:
+    """
+    Разбор задачи на описание и фрагменты времени за один проход
+
+    Шаблоны времени и служебных слов собраны в одно регулярное выражение,
+    которое компилируется один раз при создании парсера. Один finditer
+    находит все фрагменты ("завтра", "в 14:00", "вечером") и служебные
+    слова и тут же вырезает их из описания. Парсер не хранит состояния
+    между вызовами, поэтому один объект можно использовать из любых потоков.
+    """
+
+    def __init__(self):
+        # Опережающая проверка первой буквы отсекает почти все позиции текста
+        # до перебора ветвей альтернативы
+        self._pattern = re.compile(
+            rf'\b(?={_FRAGMENT_FIRST_CHARS})(?:({TIME_FRAGMENT_PATTERN})|{FILLER_PATTERN})', re.IGNORECASE
+        )
+
+    def split(self, text: str) -> Tuple[str, List[str]]:
+        """
+        Returns:
+            (описание без времени и служебных слов, список фрагментов времени)
+        """
+        fragments = []
+        parts = []
+        position = 0
+        for match in self._pattern.finditer(text):
+            fragment = match.group(1)
+            if fragment:
+                fragments.append(fragment.strip())
+            parts.append(text[position:match.start()])
+            position = match.end()
+        parts.append(text[position:])
+
+        description = ' '.join(' '.join(parts).split()).strip(_DESCRIPTION_PUNCTUATION)
+        head, _, last = description.rpartition(' ')
+        if last.lower() in _DANGLING_WORDS:
+            description = head.strip(_DESCRIPTION_PUNCTUATION)
+        return description, fragments
+
+
+fallback_parser = FallbackParser()
+
+# Основы слов, указывающие на время, которое локальный разбор не понял
+# ("до конца месяца", "в выходные", "после отпуска") - такие тексты отдаем ИИ
+_UNRESOLVED_TIME_RE = re.compile(
+    r'\b(?:месяц|недел|выходн|год|утр|вечер|ноч|час|минут|после|праздник|отпуск|когда|числ|'
+    r'январ|феврал|март|апрел|ма[йя]|июн|июл|август|сентябр|октябр|ноябр|декабр)',
+    re.IGNORECASE
+)
+
+# Уверенность локального разбора, начиная с которой ИИ не вызывается
+FAST_PATH_CONFIDENCE = 0.75
+
+
+def parse_task(text: str, now: datetime = None) -> Dict[str, Any]:
+    """
+    Быстрый локальный разбор задачи без обращения к ИИ
+
+    Вырезает из текста все фрагменты времени (дата, часы, часть суток),
+    собирает из них текст времени и вычисляет абсолютный момент.
+
+    Args:
+        text: Текст пользователя
+        now: Текущий момент (по умолчанию datetime.now())
+
+    Returns:
+        Dict с ключами: description, time, due_at (datetime или None),
+        precision (PRECISION_* или None), confidence (0..1)
+    """
+    if now is None:
+        now = datetime.now()
+
+    description, fragments = fallback_parser.split(text)
+    time_text = ' '.join(fragments)
+    due_at, precision = resolve_due(time_text, now) if fragments else (None, None)
+
+    if not fragments or due_at is None or len(description) < 2:
+        confidence = 0.0
+    elif _UNRESOLVED_TIME_RE.search(description):
+        confidence = 0.4
+    elif len(fragments) == 1 and fragments[0].lower() in PART_OF_DAY_HOURS:
+        # "вечером" без даты - понятно, но час выбран по умолчанию
+        confidence = 0.8
+    else:
+        confidence = 0.95
+
+    return {
+        'description': description[:1].upper() + description[1:] if description else description,
+        'time': time_text or 'не указано',
+        'due_at': due_at,
+        'precision': precision,
+        'confidence': confidence
+    }
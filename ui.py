@@ -0,0 +1,433 @@
+from telebot import types
+import re
+
+from logic import TASKS_PAGE_SIZE, SEARCH_PAGE_SIZE
+from models import wall_clock
+from user_settings import RUSSIAN_TIMEZONES
+
+# Тексты и клавиатуры, общие для синхронной и асинхронной версий бота
+
+BUTTON_ADD = "➕ Добавить задачу"
+BUTTON_LIST = "📋 Мои задачи"
+BUTTON_SMART_ADD = "🤖 Умное добавление"
+BUTTON_CLEAR = "🗑️ Очистить все"
+BUTTON_HELP = "ℹ️ Помощь"
+BUTTON_CANCEL = "❌ Отмена"
+
+MENU_BUTTONS = [BUTTON_ADD, BUTTON_LIST, BUTTON_SMART_ADD, BUTTON_CLEAR, BUTTON_HELP]
+
+HELP_TEXT = (
+    "🤖 Как пользоваться умным ботом:\n\n"
+    "➕ Добавить задачу - классическое добавление с указанием времени\n"
+    "🤖 Умное добавление - опишите задачу естественным языком\n"
+    "📋 Мои задачи - посмотреть все ваши задачи\n"
+    "🗑️ Очистить все - удалить все задачи\n"
+    "ℹ️ Помощь - показать это сообщение\n\n"
+    "🧠 Примеры умного добавления:\n"
+    "• 'Встреча с клиентом завтра в 15:30'\n"
+    "• 'Купить молоко по дороге домой'\n"
+    "• 'Позвонить маме в выходные'\n"
+    "• 'Подготовить презентацию к понедельнику'\n"
+    "• 'Записаться к стоматологу через неделю'\n\n"
+    "ИИ автоматически определит описание задачи и время!\n\n"
+    "📥 Чтобы добавить много задач сразу, пришлите список (каждая задача с новой строки) "
+    "или файл .txt, .csv или .ics\n\n"
+    "🔎 /find слова - найти задачи, например: /find молоко\n"
+    "🌍 /timezone - выбрать часовой пояс, например: /timezone Новосибирск"
+)
+
+TASK_DESCRIPTION_PROMPT = "📝 Введите описание задачи:"
+
+SMART_ADD_PROMPT = (
+    "🧠 Опишите задачу естественным языком!\n\n"
+    "Примеры:\n"
+    "• 'Встреча с Петром завтра в 10 утра'\n"
+    "• 'Купить продукты вечером'\n"
+    "• 'Позвонить в банк на следующей неделе'\n"
+    "• 'Подготовить отчет к пятнице'\n\n"
+    "Напишите свою задачу:"
+)
+
+TASK_TIME_PROMPT = "🕐 Введите время для задачи (например: 14:30, утром, вечером):"
+
+INVALID_TIME_TEXT = (
+    "❌ Неверный формат времени. Попробуйте еще раз:\n"
+    "Примеры: 14:30, 9:00, утром, днем, вечером"
+)
+
+NO_TASKS_TEXT = (
+    "📭 У вас пока нет задач.\n"
+    "Попробуйте умное добавление! 🤖"
+)
+
+NO_TASKS_TO_CLEAR_TEXT = "📭 У вас нет задач для удаления."
+
+MEDIA_NOT_SUPPORTED_TEXT = (
+    "Я работаю только с текстовыми сообщениями и файлами .txt, .csv, .ics. 📝\n"
+    "Попробуйте описать задачу текстом - я пойму! 🤖\n"
+    "Выберите действие из меню:"
+)
+
+SEARCH_PROMPT = "🔎 Введите слова для поиска по задачам:"
+
+NO_SEARCH_RESULTS_TEXT = "🔎 Ничего не найдено. Попробуйте другие слова."
+
+# Ограничение Telegram на длину callback_data в байтах
+MAX_CALLBACK_DATA_LENGTH = 64
+
+INVALID_TIMEZONE_TEXT = (
+    "❌ Не понял часовой пояс. Укажите город, смещение или имя пояса:\n"
+    "/timezone Екатеринбург, /timezone +5, /timezone МСК+2, /timezone Asia/Yekaterinburg"
+)
+
+SETTINGS_ERROR_TEXT = "❌ Не удалось сохранить настройку. Попробуйте еще раз."
+
+DUPLICATE_EXPIRED_TEXT = "⌛ Предложение устарело. Добавьте задачу заново."
+
+TASK_DONE_TEXT = "✅ Выполнено"
+
+TASK_NOT_FOUND_TEXT = "Задача уже выполнена или удалена"
+
+SAVE_ERROR_TEXT = "❌ Ошибка при сохранении задачи. Попробуйте еще раз."
+
+IMPORT_TOO_LARGE_TEXT = "❌ Файл слишком большой для импорта (максимум 1 МБ)."
+
+IMPORT_EMPTY_TEXT = "📭 Не нашел в файле ни одной задачи."
+
+IMPORT_SOURCE_LABELS = {
+    'local': "⚡ локально",
+    'cache': "💾 из кэша",
+    'ai': "🤖 ИИ",
+    'fallback': "🔧 базовый анализатор",
+    'file': "📅 из календаря",
+}
+
+# Ограничения Telegram на длину сообщения и наша длина описания в списке
+MAX_MESSAGE_LENGTH = 4096
+MAX_DESCRIPTION_LENGTH = 200
+
+AI_ERROR_TEXT = "❌ Произошла ошибка при обработке. Попробуйте еще раз или воспользуйтесь обычным режимом."
+
+
+def main_keyboard():
+    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    keyboard.row(BUTTON_ADD, BUTTON_LIST)
+    keyboard.row(BUTTON_SMART_ADD, BUTTON_CLEAR)
+    keyboard.row(BUTTON_HELP)
+    return keyboard
+
+
+def cancel_keyboard():
+    keyboard = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    keyboard.row(BUTTON_CANCEL)
+    return keyboard
+
+
+def clear_confirm_keyboard():
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(
+        types.InlineKeyboardButton("✅ Да, удалить все", callback_data="confirm_clear"),
+        types.InlineKeyboardButton("❌ Отмена", callback_data="cancel_clear")
+    )
+    return keyboard
+
+
+def duplicate_keyboard():
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(
+        types.InlineKeyboardButton("🔗 Объединить", callback_data="dup:merge"),
+        types.InlineKeyboardButton("➕ Добавить отдельно", callback_data="dup:keep")
+    )
+    return keyboard
+
+
+def reminder_keyboard(task_id: int):
+    """Кнопка под напоминанием: отметить задачу выполненной"""
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(types.InlineKeyboardButton(TASK_DONE_TEXT, callback_data=f"done:{task_id}"))
+    return keyboard
+
+
+def timezone_keyboard():
+    """Кнопки часовых поясов России"""
+    keyboard = types.InlineKeyboardMarkup(row_width=3)
+    keyboard.add(*[types.InlineKeyboardButton(city, callback_data=f"tz:{name}")
+                   for city, name in RUSSIAN_TIMEZONES])
+    return keyboard
+
+
+def welcome_text(user_name: str) -> str:
+    welcome = f"Привет, {user_name}! 👋\n\n"
+    welcome += "Я умный бот-ежедневник с поддержкой ИИ! 🤖\n"
+    welcome += "Я могу понимать естественный язык и автоматически создавать задачи.\n\n"
+    welcome += "Попробуйте написать что-то вроде:\n"
+    welcome += "• 'Напомни встретиться с Иваном завтра в 14:00'\n"
+    welcome += "• 'Позвони врачу на следующей неделе'\n"
+    welcome += "• 'Купить продукты вечером'\n\n"
+    welcome += "Выберите действие из меню:"
+    return welcome
+
+
+def tasks_page_text(tasks, first_number: int = 1, header: str = "📋 Ваши задачи:\n"):
+    """
+    Собирает текст страницы списка задач, не превышая лимит Telegram
+
+    Args:
+        tasks: Задачи (models.Task)
+        first_number: Номер первой задачи на странице
+        header: Первая строка сообщения
+
+    Returns:
+        (текст, сколько задач поместилось)
+    """
+    lines = [header]
+    length = len(lines[0])
+    rendered = 0
+    for number, task in enumerate(tasks, first_number):
+        description = task.description
+        if len(description) > MAX_DESCRIPTION_LENGTH:
+            description = description[:MAX_DESCRIPTION_LENGTH - 1] + "…"
+        line = f"{number}. 🕐 {task.display_time()} - {description}"
+        if length + len(line) + 1 > MAX_MESSAGE_LENGTH and rendered:
+            break
+        lines.append(line)
+        length += len(line) + 1
+        rendered += 1
+    return "\n".join(lines), rendered
+
+
+def tasks_page_keyboard(page: int, first_task, last_task, has_prev: bool, has_next: bool):
+    """
+    Кнопки листания списка задач
+
+    В callback_data лежит курсор (id, ключ времени) крайней задачи страницы,
+    поэтому соседняя страница читается из базы без OFFSET.
+    """
+    buttons = []
+    if has_prev:
+        buttons.append(types.InlineKeyboardButton(
+            "⬅️ Назад", callback_data=f"tasks:p:{page - 1}:{first_task.id}:{first_task.sort_key}"))
+    if has_next:
+        buttons.append(types.InlineKeyboardButton(
+            "Вперед ➡️", callback_data=f"tasks:n:{page + 1}:{last_task.id}:{last_task.sort_key}"))
+    if not buttons:
+        return None
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(*buttons)
+    return keyboard
+
+
+def tasks_page_view(rows, has_more: bool, page: int, backwards: bool = False):
+    """
+    Текст и кнопки страницы списка задач
+
+    Args:
+        rows: Результат logic.get_tasks_page
+        has_more: Есть ли задачи дальше в направлении чтения
+        page: Номер страницы (с нуля)
+        backwards: Страница прочитана при листании назад
+
+    Returns:
+        (текст, клавиатура или None)
+    """
+    text, rendered = tasks_page_text(rows, page * TASKS_PAGE_SIZE + 1)
+    shown = rows[:rendered]
+    if backwards:
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = page > 0, has_more or rendered < len(rows)
+    return text, tasks_page_keyboard(page, shown[0], shown[-1], has_prev, has_next)
+
+
+def parse_tasks_page_callback(data: str):
+    """
+    Разбирает callback_data кнопок листания: (направление, страница, курсор (ключ времени, id))
+
+    У кнопок из старых сообщений (курсор по created_at) курсор None -
+    список показывается с первой страницы.
+    """
+    parts = data.split(":", 4)
+    direction = parts[1] if len(parts) > 1 else None
+    try:
+        _, direction, page, task_id, sort_key = parts
+        return direction, int(page), (int(sort_key), int(task_id))
+    except ValueError:
+        return direction or 'next', 0, None
+
+
+def search_results_view(query: str, rows, has_more: bool, page: int):
+    """
+    Текст и кнопки страницы результатов поиска
+
+    Запрос передается в callback_data кнопок; если он не помещается в
+    лимит Telegram, показывается только первая страница.
+    """
+    header = f"🔎 Найдено по запросу «{query[:100]}»:\n"
+    text, _ = tasks_page_text(rows, page * SEARCH_PAGE_SIZE + 1, header)
+
+    buttons = []
+    if page > 0:
+        buttons.append(("⬅️ Назад", f"find:{page - 1}:{query}"))
+    if has_more:
+        buttons.append(("Вперед ➡️", f"find:{page + 1}:{query}"))
+    buttons = [(label, data) for label, data in buttons
+               if len(data.encode('utf-8')) <= MAX_CALLBACK_DATA_LENGTH]
+    if not buttons:
+        return text, None
+
+    keyboard = types.InlineKeyboardMarkup()
+    keyboard.row(*[types.InlineKeyboardButton(label, callback_data=data) for label, data in buttons])
+    return text, keyboard
+
+
+def parse_search_callback(data: str):
+    """Разбирает callback_data кнопок поиска: (страница, запрос)"""
+    _, page, query = data.split(":", 2)
+    return int(page), query
+
+
+def parse_done_callback(data: str):
+    """ID задачи из callback_data кнопки "Выполнено" или None"""
+    try:
+        return int(data.split(":", 1)[1])
+    except ValueError:
+        return None
+
+
+def timezone_text(timezone: str) -> str:
+    text = f"🌍 Ваш часовой пояс: {timezone} (сейчас {wall_clock(timezone):%H:%M})\n\n"
+    text += "Выберите город или укажите пояс командой, например: /timezone +7"
+    return text
+
+
+def timezone_set_text(timezone: str, moved: int) -> str:
+    text = f"🌍 Часовой пояс: {timezone} (сейчас {wall_clock(timezone):%H:%M})"
+    if moved:
+        text += f"\n\n🕐 Время предстоящих задач ({moved}) пересчитано для нового пояса"
+    return text
+
+
+def clear_confirm_text(count: int) -> str:
+    return f"🗑️ Вы уверены, что хотите удалить все {count} задач(и)?"
+
+
+def _time_text(task) -> str:
+    """Время задачи как его ввели и, если оно разобрано, конкретная дата"""
+    shown = task.display_time()
+    return task.time if shown == task.time else f"{task.time} ({shown})"
+
+
+def duplicate_text(duplicate, task) -> str:
+    """Предложение объединить новую задачу с похожей (duplicate - строка find_duplicate)"""
+    text = f"🔁 Похожая задача уже есть:\n\n"
+    text += f"📝 {duplicate[1]}\n"
+    text += f"🕐 {duplicate[2]}\n\n"
+    text += f"Новая задача: {task.description}\n"
+    text += f"🕐 {_time_text(task)}\n\n"
+    text += "Объединить их? Останется одна задача с новым временем."
+    return text
+
+
+def task_merged_text(task) -> str:
+    text = f"🔗 Задачи объединены!\n\n"
+    text += f"📝 Описание: {task.description}\n"
+    text += f"🕐 Время: {_time_text(task)}"
+    return text
+
+
+def task_added_text(task) -> str:
+    text = f"✅ Задача добавлена!\n\n"
+    text += f"📝 Описание: {task.description}\n"
+    text += f"🕐 Время: {_time_text(task)}"
+    return text
+
+
+def ai_success_text(ai_result) -> str:
+    text = f"🤖 ИИ успешно обработал вашу задачу!\n\n"
+    text += f"📝 Описание: {ai_result['description']}\n"
+    text += f"🕐 Время: {_time_text(ai_result['task'])}\n\n"
+
+    if ai_result.get('explanation'):
+        text += f"💡 Пояснение: {ai_result['explanation']}"
+    return text
+
+
+def ai_failure_text(ai_result) -> str:
+    text = f"❌ Не удалось обработать задачу: {ai_result.get('error', 'Неизвестная ошибка')}\n\n"
+    text += "Попробуйте переформулировать или воспользуйтесь обычным добавлением задачи."
+    return text
+
+
+def import_result_text(result) -> str:
+    text = f"📥 Импортировано задач: {len(result['tasks'])}\n"
+    sources = [f"{IMPORT_SOURCE_LABELS.get(source, source)}: {count}"
+               for source, count in result['sources'].items()]
+    if sources:
+        text += "\n".join(sources) + "\n"
+    if result['failed']:
+        text += f"\n⚠️ Не удалось разобрать строк: {len(result['failed'])}\n"
+        for line in result['failed'][:5]:
+            text += f"• {line[:100]}\n"
+    return text
+
+
+def _format_seconds(seconds: float) -> str:
+    if seconds == float('inf'):
+        return ">30 с"
+    if seconds < 1:
+        return f"{seconds * 1000:.1f} мс"
+    return f"{seconds:.2f} с"
+
+
+def stats_text(summary, db_stats, cache_stats, task_cache_stats=None, ai_usage=None, limit: int = 20) -> str:
+    """Текст команды /stats: база, кэши, расход ИИ, счетчики и самые затратные операции"""
+    counters = summary['counters']
+    text = "📊 Статистика бота\n\n"
+    text += f"🗄️ Задач: {db_stats.get('total_tasks', 0)}, пользователей: {db_stats.get('unique_users', 0)}\n"
+    if 'archived_tasks' in db_stats:
+        text += (f"🗃️ Выполнено и ждут архива: {db_stats['done_tasks']}, в архиве: {db_stats['archived_tasks']} "
+                 f"({db_stats['archived_bytes'] / 1024:.0f} КБ сжато)\n")
+        text += f"📁 Файл базы: {db_stats['db_bytes'] / 1048576:.1f} МБ"
+        if db_stats['hot_bytes'] is not None:
+            text += (f", задачи {db_stats['hot_bytes'] / 1048576:.1f} МБ, "
+                     f"архив {db_stats['archive_bytes'] / 1048576:.1f} МБ")
+        text += f", свободно {db_stats['free_bytes'] / 1048576:.1f} МБ\n"
+    text += (f"💾 Кэш ИИ: попаданий {cache_stats['hits']} ({cache_stats['hit_rate']:.0%}), "
+             f"сэкономлено {cache_stats['latency_saved']:.1f} с\n")
+    if task_cache_stats is not None:
+        text += (f"📋 Кэш задач: попаданий {task_cache_stats['hits']} ({task_cache_stats['hit_rate']:.0%}), "
+                 f"пользователей {task_cache_stats['users']}, "
+                 f"{task_cache_stats['memory_bytes'] / 1024:.0f} КБ\n")
+    text += (f"🔧 Базовый анализатор: {counters.get('fallback_parser_total', 0)}, "
+             f"ошибок ИИ: {counters.get('ai_failures_total', 0)}\n")
+    if ai_usage is not None:
+        prompt_tokens = ai_usage['prompt_tokens']
+        cached_share = ai_usage['cached_tokens'] / prompt_tokens if prompt_tokens else 0
+        text += (f"🤖 ИИ за сутки: запросов {ai_usage['requests']} (сообщений {ai_usage['items']}), "
+                 f"токенов {prompt_tokens} + {ai_usage['completion_tokens']} "
+                 f"(из кэша {cached_share:.0%}), ${ai_usage['cost']:.4f}\n")
+        for user_id, items, tokens, cost in ai_usage['top_users']:
+            text += f"• {user_id}: сообщений {items}, токенов {tokens}, ${cost:.4f}\n"
+
+    if summary['histograms']:
+        text += "\n⏱️ Время (вызовов: среднее / p50 / p99):\n"
+        for name, label, count, mean, p50, p99 in summary['histograms'][:limit]:
+            kind = name.split('_', 1)[0]
+            text += (f"• {kind} {label} ({count}): {_format_seconds(mean)} / "
+                     f"{_format_seconds(p50)} / {_format_seconds(p99)}\n")
+    return text
+
+
+def validate_time(time_str):
+    time_pattern = r'^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$'
+    if re.match(time_pattern, time_str):
+        return True
+
+    time_words = ['утром', 'утро', 'днем', 'день', 'вечером', 'вечер', 'ночью', 'ночь']
+    if time_str.lower() in time_words:
+        return True
+
+    if len(time_str) > 0 and len(time_str) < 50:
+        return True
+
+    return False
@@ -0,0 +1,160 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import logic
+from models import is_valid_timezone
+from storage import get_connection
+from time_parser import local_timezone_name
+
+# Пояс пользователей, не выбравших свой
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE") or local_timezone_name()
+# Сколько поясов пользователей держать в памяти
+SETTINGS_CACHE_SIZE = 100000
+
+# Часовые пояса России: (город для кнопки, имя IANA)
+RUSSIAN_TIMEZONES = (
+    ("Калининград", "Europe/Kaliningrad"),
+    ("Москва", "Europe/Moscow"),
+    ("Самара", "Europe/Samara"),
+    ("Екатеринбург", "Asia/Yekaterinburg"),
+    ("Омск", "Asia/Omsk"),
+    ("Новосибирск", "Asia/Novosibirsk"),
+    ("Красноярск", "Asia/Krasnoyarsk"),
+    ("Иркутск", "Asia/Irkutsk"),
+    ("Якутск", "Asia/Yakutsk"),
+    ("Владивосток", "Asia/Vladivostok"),
+    ("Магадан", "Asia/Magadan"),
+    ("Камчатка", "Asia/Kamchatka"),
+)
+_CITY_TIMEZONES = {city.lower(): name for city, name in RUSSIAN_TIMEZONES}
+_CITY_TIMEZONES.update({
+    "санкт-петербург": "Europe/Moscow",
+    "петербург": "Europe/Moscow",
+    "спб": "Europe/Moscow",
+    "мск": "Europe/Moscow",
+    "петропавловск-камчатский": "Asia/Kamchatka",
+})
+# "+3", "UTC+5:30", "GMT-4", "МСК+4"
+_OFFSET_RE = re.compile(r'^(utc|gmt|мск)?\s*([+-])\s*(\d{1,2})(?::?(\d{2}))?$')
+MOSCOW_OFFSET_HOURS = 3
+
+SQL_SELECT_TIMEZONE = "SELECT timezone FROM user_settings WHERE user_id = ?"
+SQL_SET_TIMEZONE = (
+    "INSERT INTO user_settings (user_id, timezone, updated_at) VALUES (?, ?, ?) "
+    "ON CONFLICT(user_id) DO UPDATE SET timezone = excluded.timezone, updated_at = excluded.updated_at"
+)
+
+
+def parse_timezone(text: str) -> Optional[str]:
+    """
+    Переводит ввод пользователя в имя пояса
+
+    Понимает города России ("Новосибирск"), смещения ("+7", "UTC+5:30",
+    "МСК+4") и имена IANA ("Asia/Yakutsk").
+
+    Returns:
+        Имя IANA или смещение вида "+07:00"; None, если пояс не распознан
+    """
+    text = text.strip()
+    lowered = text.lower().replace('ё', 'е')
+    if lowered in _CITY_TIMEZONES:
+        return _CITY_TIMEZONES[lowered]
+
+    offset = _OFFSET_RE.match(lowered.replace(' ', ''))
+    if offset:
+        base, sign, hours, minutes = offset.groups()
+        total = int(hours) * 60 + int(minutes or 0)
+        if sign == '-':
+            total = -total
+        if base == 'мск':
+            total += MOSCOW_OFFSET_HOURS * 60
+        if abs(total) > 14 * 60:
+            return None
+        sign = '-' if total < 0 else '+'
+        return f"{sign}{abs(total) // 60:02d}:{abs(total) % 60:02d}"
+
+    return text if '/' in text and is_valid_timezone(text) else None
+
+
+class UserSettings:
+    """
+    Часовые пояса пользователей (таблица user_settings) с кэшем в памяти
+
+    Пояс нужен при разборе каждого сообщения с временем, поэтому чтения
+    идут из LRU-кэша; пользователи без настройки тоже кэшируются (как
+    DEFAULT_TIMEZONE), чтобы не запрашивать базу каждый раз.
+    """
+
+    def __init__(self, max_entries: int = SETTINGS_CACHE_SIZE, default_timezone: str = DEFAULT_TIMEZONE):
+        self.max_entries = max_entries
+        self.default_timezone = default_timezone
+        self._timezones = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        return get_connection(logic.DB_PATH)
+
+    def _remember(self, user_id: int, timezone: str):
+        with self._lock:
+            self._timezones[user_id] = timezone
+            self._timezones.move_to_end(user_id)
+            while len(self._timezones) > self.max_entries:
+                self._timezones.popitem(last=False)
+
+    def get_timezone(self, user_id: int) -> str:
+        """Пояс пользователя или пояс по умолчанию"""
+        with self._lock:
+            timezone = self._timezones.get(user_id)
+            if timezone is not None:
+                self._timezones.move_to_end(user_id)
+                return timezone
+        try:
+            row = self._connect().execute(SQL_SELECT_TIMEZONE, (user_id,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка чтения настроек пользователя: {e}")
+            return self.default_timezone
+        timezone = row[0] if row else self.default_timezone
+        self._remember(user_id, timezone)
+        return timezone
+
+    def set_timezone(self, user_id: int, timezone: str) -> bool:
+        """Сохраняет пояс пользователя; False при ошибке базы"""
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute(SQL_SET_TIMEZONE, (user_id, timezone, int(time.time())))
+        except sqlite3.Error as e:
+            print(f"❌ Ошибка сохранения настроек пользователя: {e}")
+            return False
+        self._remember(user_id, timezone)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._timezones.clear()
+
+
+user_settings = UserSettings()
+
+
+def get_user_timezone(user_id: int) -> str:
+    """Часовой пояс пользователя, в котором разбирается время его задач"""
+    return user_settings.get_timezone(user_id)
+
+
+def set_user_timezone(user_id: int, timezone: str):
+    """
+    Сохраняет пояс пользователя и переводит в него его будущие задачи
+
+    Returns:
+        Список перенесенных задач (их напоминания нужно перепланировать)
+        или None, если настройку сохранить не удалось
+    """
+    if not user_settings.set_timezone(user_id, timezone):
+        return None
+    return logic.move_tasks_to_timezone(user_id, timezone)
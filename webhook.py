@@ -0,0 +1,211 @@
+"""
+Режим webhook: HTTP-сервер принимает обновления Telegram и раздает их
+пулу процессов-обработчиков
+
+Обновления одного пользователя всегда попадают в один процесс
+(user_id % количество_процессов) и обрабатываются по порядку, а разные
+пользователи обрабатываются параллельно на разных ядрах. Состояния
+диалогов и задачи лежат в общей базе SQLite (WAL), напоминания каждого
+пользователя рассылает процесс его шарда.
+
+Запуск:
+    python webhook.py
+"""
+import hmac
+import json
+import multiprocessing
+import os
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telebot
+from telebot import apihelper
+from dotenv import load_dotenv
+
+from logic import init_db
+
+load_dotenv()
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+# Публичный адрес, который регистрируется в Telegram (если не задан - не регистрируем)
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", str(os.cpu_count() or 1)))
+# Сколько обновлений может ждать в очереди одного процесса; при переполнении
+# отвечаем 503, и Telegram повторит доставку позже
+WORKER_QUEUE_SIZE = 1000
+QUEUE_PUT_TIMEOUT = 1.0
+
+# Разделы обновления, в которых есть автор (поле from)
+_UPDATE_SECTIONS = ('message', 'edited_message', 'callback_query', 'inline_query',
+                    'chosen_inline_result', 'my_chat_member', 'pre_checkout_query', 'shipping_query')
+
+
+class _WebhookServer(ThreadingHTTPServer):
+    # Telegram открывает до 40 параллельных соединений (max_connections)
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def shard_key(update: dict) -> int:
+    """ID пользователя, по которому обновление закрепляется за процессом"""
+    for section in _UPDATE_SECTIONS:
+        user = (update.get(section) or {}).get('from')
+        if user:
+            return user['id']
+    return update.get('update_id', 0)
+
+
+def _worker(index: int, count: int, updates):
+    """Процесс-обработчик: выполняет обработчики bot.py для своего шарда"""
+    import bot as app
+    from reminders import ReminderScheduler
+    from archive import Compactor
+    from outbox import Outbox, GLOBAL_SEND_RATE
+    from storage import close_all
+    from metrics import start_metrics_server
+
+    app.create_app()
+    # Обновления шарда обрабатываются строго по одному, чтобы не нарушать порядок
+    app.bot.threaded = False
+    # Общий лимит Telegram делится между процессами; напоминания идут через ту же очередь
+    app.outbox = Outbox(app.bot, global_rate=GLOBAL_SEND_RATE / count)
+    app.outbox.start()
+    app.reminder_scheduler = ReminderScheduler(
+        lambda chat_id, text, task_id: app.outbox.send_message(
+            chat_id, text, reply_markup=app.reminder_keyboard(task_id)
+        )
+    )
+    app.reminder_scheduler.load_pending(shard=(index, count))
+    app.reminder_scheduler.start()
+    # Архивирует только пользователей своего шарда: их кэши задач в этом процессе
+    app.compactor = Compactor(shard=(index, count))
+    app.compactor.start()
+    if app.METRICS_PORT:
+        # У каждого процесса свои метрики: порт METRICS_PORT + номер процесса
+        start_metrics_server(int(app.METRICS_PORT) + index)
+
+    try:
+        while True:
+            raw = updates.get()
+            if raw is None:
+                break
+            try:
+                app.bot.process_new_updates([telebot.types.Update.de_json(raw)])
+            except Exception as e:
+                print(f"❌ Ошибка обработки обновления в процессе {index}: {e}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.reminder_scheduler.stop()
+        app.compactor.stop()
+        app.outbox.stop()
+        close_all()
+
+
+class WebhookDispatcher:
+    """
+    HTTP-сервер webhook с пулом процессов-обработчиков
+
+    Сервер только разбирает update_id/from и кладет исходный JSON в
+    очередь процесса шарда, поэтому ответ Telegram не ждет обработки.
+    """
+
+    def __init__(self, workers: int = WEBHOOK_WORKERS, host: str = WEBHOOK_HOST,
+                 port: int = WEBHOOK_PORT, secret: str = WEBHOOK_SECRET):
+        self.workers = max(1, workers)
+        self.secret = secret
+        # spawn: обработчики открывают свои соединения с базой и HTTP-сессии
+        context = multiprocessing.get_context("spawn")
+        self._queues = [context.Queue(WORKER_QUEUE_SIZE) for _ in range(self.workers)]
+        self._processes = [
+            context.Process(target=_worker, args=(index, self.workers, self._queues[index]),
+                            name=f"webhook-worker-{index}")
+            for index in range(self.workers)
+        ]
+        self._httpd = _WebhookServer((host, port), self._handler_class())
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    def _handler_class(self):
+        dispatcher = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int):
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                # Сравнение за постоянное время: по задержке ответа секрет не подобрать
+                token = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+                if dispatcher.secret and not hmac.compare_digest(token.encode(), dispatcher.secret.encode()):
+                    self._reply(403)
+                    return
+                try:
+                    update = json.loads(raw)
+                except json.JSONDecodeError:
+                    self._reply(400)
+                    return
+                self._reply(200 if dispatcher.dispatch(update, raw.decode('utf-8')) else 503)
+
+        return Handler
+
+    def dispatch(self, update: dict, raw: str) -> bool:
+        """Кладет обновление в очередь процесса его пользователя"""
+        try:
+            self._queues[shard_key(update) % self.workers].put(raw, timeout=QUEUE_PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            return False
+
+    def start(self):
+        """Запускает процессы-обработчики (сервер запускается в serve_forever)"""
+        # Схему обновляет один процесс до запуска обработчиков
+        init_db()
+        for process in self._processes:
+            process.start()
+
+    def serve_forever(self):
+        self._httpd.serve_forever()
+
+    def stop(self):
+        """Останавливает сервер и дожидается, пока процессы обработают очереди"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for updates in self._queues:
+            updates.put(None)
+        for process in self._processes:
+            process.join()
+
+
+def run():
+    if TELEGRAM_API_URL:
+        apihelper.API_URL = TELEGRAM_API_URL.rstrip("/") + "/bot{0}/{1}"
+
+    dispatcher = WebhookDispatcher()
+    dispatcher.start()
+    if WEBHOOK_URL:
+        telebot.TeleBot(BOT_TOKEN).set_webhook(url=WEBHOOK_URL, secret_token=WEBHOOK_SECRET)
+    print(f"🌐 Webhook слушает порт {dispatcher.port}, процессов: {dispatcher.workers}")
+    try:
+        dispatcher.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,170 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Optional
+
+import logic
+from storage import get_connection, close_connection
+from metrics import observe, DB_QUERY_SECONDS
+
+# Сколько секунд собирать вставки после первой, прежде чем записать пачку.
+# 0: пачку составляют вставки, пришедшие, пока писатель записывал предыдущую,
+# поэтому одиночная вставка не ждет, а под нагрузкой пачки растут сами
+WRITE_FLUSH_INTERVAL = 0.0
+# Больше строк в одну транзакцию не берется
+WRITE_MAX_BATCH = 256
+# Надежность записи соединения писателя (PRAGMA synchronous):
+# NORMAL - fsync только на checkpoint WAL, FULL - fsync на каждую пачку, OFF - без fsync
+WRITE_SYNCHRONOUS = os.getenv("WRITE_SYNCHRONOUS", "NORMAL").upper()
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+class _Write:
+    __slots__ = ('sql', 'params', 'future')
+
+    def __init__(self, sql: str, params):
+        self.sql = sql
+        self.params = params
+        self.future = Future()
+
+
+class WriteBuffer:
+    """
+    Отложенная запись с групповым коммитом
+
+    Вставки из всех потоков попадают в очередь, один поток-писатель
+    записывает их пачками: одна транзакция и один коммит (и fsync при
+    synchronous=FULL) на пачку вместо одного на строку, и никакой борьбы
+    потоков за блокировку записи. Пачка закрывается через
+    WRITE_FLUSH_INTERVAL после первой вставки или по достижении
+    WRITE_MAX_BATCH строк. Future каждой вставки получает lastrowid
+    только после коммита, так что подтвержденная запись уже в базе.
+    """
+
+    def __init__(self, db_path: str = None, interval: float = WRITE_FLUSH_INTERVAL,
+                 max_batch: int = WRITE_MAX_BATCH, synchronous: str = WRITE_SYNCHRONOUS):
+        if synchronous not in SYNCHRONOUS_MODES:
+            raise ValueError(f"Неизвестный режим synchronous: {synchronous}")
+        self.db_path = db_path
+        self.interval = interval
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.stats = {'batches': 0, 'rows': 0, 'errors': 0}
+
+    def start(self):
+        """Запускает поток-писатель"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Записывает все, что осталось в очереди, и останавливает поток-писатель"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __len__(self):
+        with self._cond:
+            return len(self._queue)
+
+    def submit(self, sql: str, params) -> Future:
+        """
+        Ставит запись в очередь
+
+        Returns:
+            Future с lastrowid после коммита или с исключением sqlite3.Error.
+            После остановки буфера запись выполняется сразу в текущем потоке.
+        """
+        item = _Write(sql, params)
+        with self._cond:
+            if self._running:
+                self._queue.append(item)
+                if len(self._queue) == 1 or len(self._queue) >= self.max_batch:
+                    self._cond.notify()
+                return item.future
+
+        self._flush(get_connection(self._path()), [item])
+        return item.future
+
+    def _path(self) -> str:
+        return self.db_path or logic.DB_PATH
+
+    def _next_batch(self) -> Optional[List[_Write]]:
+        """Ждет первую запись и добирает пачку; None, когда буфер остановлен и пуст"""
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait()
+            if not self._queue:
+                return None
+            deadline = time.monotonic() + self.interval
+            while self._running and len(self._queue) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+
+    def _run(self):
+        conn = get_connection(self._path())
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    return
+                self._flush(conn, batch)
+        finally:
+            close_connection()
+
+    def _flush(self, conn: sqlite3.Connection, batch: List[_Write]):
+        """Записывает пачку одной транзакцией; при ошибке - каждую запись отдельно"""
+        started = time.perf_counter()
+        try:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                results = [conn.execute(item.sql, item.params).lastrowid for item in batch]
+        except sqlite3.Error as e:
+            if len(batch) == 1:
+                with self._cond:
+                    self.stats['errors'] += 1
+                batch[0].future.set_exception(e)
+                return
+            # Одна неудачная запись не должна отменять остальные
+            for item in batch:
+                self._flush(conn, [item])
+            return
+        finally:
+            observe(DB_QUERY_SECONDS, "write_buffer_flush", time.perf_counter() - started)
+
+        with self._cond:
+            self.stats['batches'] += 1
+            self.stats['rows'] += len(batch)
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+
+def start_write_buffer(**kwargs) -> WriteBuffer:
+    """Запускает буфер и направляет через него вставки add_task"""
+    buffer = WriteBuffer(**kwargs)
+    buffer.start()
+    logic.write_buffer = buffer
+    return buffer
+
+
+def stop_write_buffer():
+    """Возвращает прямую запись и дописывает очередь буфера"""
+    buffer, logic.write_buffer = logic.write_buffer, None
+    if buffer is not None:
+        buffer.stop()